@@ -1,3 +1,4 @@
+from .sliceCache import *
 from .metricBundle import *
 from .metricBundleGroup import *
 from .moMetricBundle import *
@@ -1,6 +1,7 @@
 from builtins import zip
 from builtins import object
 import os
+import hashlib
 from copy import deepcopy
 import numpy as np
 import numpy.ma as ma
@@ -13,6 +14,7 @@ import rubin_sim.maf.maps as maps
 import rubin_sim.maf.plots as plots
 from rubin_sim.maf.stackers import ColInfo
 import rubin_sim.maf.utils as utils
+from rubin_sim.utils import updateHash
 
 __all__ = ["MetricBundle", "createEmptyMetricBundle"]
 
@@ -188,6 +190,8 @@ class MetricBundle(object):
         # This is where we store the metric values and summary stats.
         self.metricValues = None
         self.summaryValues = None
+        # Hash of the inputs for the metric values (set when calculated by a MetricBundleGroup).
+        self.provenance = None
 
     def _resetMetricBundle(self):
         """Reset all properties of MetricBundle."""
@@ -206,6 +210,7 @@ class MetricBundle(object):
         self.displayDict = {}
         self.metricValues = None
         self.summaryValues = None
+        self.provenance = None
 
     def _setupMetricValues(self):
         """Set up the numpy masked array to store the metric value data."""
@@ -262,6 +267,37 @@ class MetricBundle(object):
         # Sanitize output name if needed.
         self.fileRoot = utils.nameSanitize(self.fileRoot)
 
+    def provenanceHash(self, dbChecksum=""):
+        """Return a hash identifying everything which goes into calculating the metric values.
+
+        The hash includes the metric class and constructor arguments, the slicer class and
+        init parameters, the constraint, the stackers (class and constructor arguments), the maps,
+        the run name and a checksum of the opsim database.
+
+        Parameters
+        ----------
+        dbChecksum : `str`, optional
+            A checksum of the opsim database the metric values are calculated from.
+
+        Returns
+        -------
+        provenance : `str`
+        """
+        h = hashlib.sha1()
+        for value in [
+            type(self.metric),
+            self.metric,
+            type(self.slicer),
+            self.slicer.slicer_init,
+            self.constraint,
+            self.stackerList,
+            self.mapsList,
+            self.runName,
+            dbChecksum,
+        ]:
+            updateHash(h, value)
+        return h.hexdigest()
+
     def _findReqCols(self):
         """Find the columns needed by the metrics, slicers, and stackers.
         If there are any additional stackers required, instatiate them and add them to
@@ -515,6 +551,7 @@ class MetricBundle(object):
             info_label=self.info_label + comment,
             displayDict=self.displayDict,
             plotDict=self.plotDict,
+            provenance=self.provenance,
         )
         if resultsDb is not None:
             self.writeDb(resultsDb=resultsDb)
@@ -1,21 +1,66 @@
 from __future__ import print_function
 from builtins import object
 import os
+import hashlib
+import zipfile
 import numpy as np
 import numpy.ma as ma
+import numpy.lib.recfunctions as rfn
+import pandas as pd
 import matplotlib.pyplot as plt
-from collections import OrderedDict
 
 import rubin_sim.maf.utils as utils
 from rubin_sim.maf.plots import PlotHandler
 import rubin_sim.maf.maps as maps
 import rubin_sim.maf.db as db
-from rubin_sim.maf.stackers import BaseDitherStacker
+from rubin_sim.maf.stackers import orderStackers, StackerCache
+from rubin_sim.maf.slicers import BaseSpatialSlicer, OverlapIndex
 from .metricBundle import MetricBundle, createEmptyMetricBundle
+from .sliceCache import SliceCache
+import multiprocessing
 import warnings
 
 __all__ = ["makeBundlesDictFromList", "MetricBundleGroup"]
 
+# The state shared with the forked worker processes of MetricBundleGroup._runSlicePointsParallel.
+_parallelState = None
+
+
+def _runSlicePointChunk(sids):
+    """Calculate metric values for a chunk of slicePoints, in a forked worker process.
+
+    Parameters
+    ----------
+    sids : `np.ndarray`
+        The indexes of the slicePoints to evaluate.
+
+    Returns
+    -------
+    filled, results, indexMap, cacheCounts : `np.ndarray`, `dict`, `dict` or None, `tuple`
+        The slicePoint ids which were filled, a dictionary (keyed by bundleDict key)
+        of the (data, mask) metricValues at those slicePoint ids, (if requested)
+        the simData indexes at each of those slicePoints, and the slice cache (hits, misses).
+    """
+    group, bDict, slicer, mapIndexes = _parallelState
+    if mapIndexes:
+        indexMap = {}
+    else:
+        indexMap = None
+    hits, misses = group.sliceCacheHits, group.sliceCacheMisses
+    filled = group._runSlicePoints(bDict, slicer, sids, indexMap=indexMap)
+    cacheCounts = (group.sliceCacheHits - hits, group.sliceCacheMisses - misses)
+    results = {}
+    for k, b in bDict.items():
+        data = b.metricValues.data[filled]
+        mask = b.metricValues.mask[filled]
+        if data.dtype.name == "object":
+            # The identity of the badval does not survive pickling, so flag badvals here.
+            for ind, val in enumerate(data):
+                if val is b.metric.badval:
+                    mask[ind] = True
+        results[k] = (data, mask)
+    return filled, results, indexMap, cacheCounts
+
 
 def makeBundlesDictFromList(bundleList):
     """Utility to convert a list of MetricBundles into a dictionary, keyed by the fileRoot names.
@@ -80,6 +125,29 @@ class MetricBundleGroup(object):
         If False, metric values will only be saved after summary statistics are calculated.
     dbTable : `str`, optional
         The name of the table in the dbObj to query for data.
+    overlapIndexDir : `str`, optional
+        If set, spatial slicers use a precomputed index of which visits overlap each slicePoint,
+        calculated once on all visits in the database and saved in (or loaded from) this directory.
+        The index is then subset for each constraint, instead of querying the kdtree and
+        camera footprint again. Requires the observationId column in the database. Default None.
+    incremental : `bool`, optional
+        If True, a hash of the inputs of each MetricBundle (see `MetricBundle.provenanceHash`,
+        including a checksum of the opsim database, or of the columns of simData when it is
+        passed to runCurrent) is saved with its metric values. MetricBundles
+        with an up-to-date output file in outDir (and registered in the resultsDb, if used)
+        are then read from disk instead of being calculated again, and their reduce functions
+        and summary statistics are not rerun. Default False.
+    indexMemoryBudget : `float`, optional
+        If set, run in a streaming mode, aiming to use about indexMemoryBudget MB for the
+        per-slicePoint visit indexes. Each set of compatible MetricBundles is reduced,
+        summarized (and plotted, if plotNow) and written to disk as soon as it is calculated,
+        and its metric values are then released from memory (use readAll to get them back).
+        Columns of the simData which are not needed by the remaining MetricBundles are dropped,
+        stacker columns are not cached (see `StackerCache`), and the slicePoints are evaluated
+        in tiles of consecutive slicePoints (bands of sky, for healpix slicers) sized so that
+        their visit indexes fit in the budget. Note that this does not bound the total memory:
+        all of the visits matching a constraint (and their stacker columns) are still read
+        into memory at once, in addition to the budget. Default None.
     """
 
     def __init__(
@@ -91,6 +159,9 @@ class MetricBundleGroup(object):
         verbose=True,
         saveEarly=True,
         dbTable=None,
+        overlapIndexDir=None,
+        incremental=False,
+        indexMemoryBudget=None,
     ):
         """Set up the MetricBundleGroup."""
         if type(bundleDict) is list:
@@ -120,6 +191,33 @@ class MetricBundleGroup(object):
         self.dbObj = dbCon
         # Set the table we're going to be querying.
         self.dbTable = dbTable
+        # Directory for precomputed slicer overlap indexes (and those already loaded).
+        self.overlapIndexDir = overlapIndexDir
+        self.overlapIndexes = {}
+        self._overlapPointings = {}
+        # Cache of stacker columns, shared between compatible groups and constraints.
+        # The cached columns would not count against the memory budget, so it is off in streaming mode.
+        if indexMemoryBudget is not None:
+            self.stackerCache = StackerCache(maxSize=0)
+        else:
+            self.stackerCache = StackerCache()
+        # Identifies the visits of the database for the stacker cache (see _databaseKey).
+        self._dbKey = None
+        self._simDataKey = None
+        # Reuse up-to-date metric values from outDir (and keep track of the bundles read back).
+        self.incremental = incremental
+        self.skipped = set()
+        self._dbChecksum = None
+        # Memory budget (MB) for the visit indexes in the streaming mode.
+        self.indexMemoryBudget = indexMemoryBudget
+        # Number of slicePoints where metric values were copied from (or calculated and added to)
+        # the slice cache, for slicers with cacheSize > 0.
+        self.sliceCacheHits = 0
+        self.sliceCacheMisses = 0
+        # Pool of forked processes for parallel slicePoint calculations (see _getPool),
+        # and the state it was forked with.
+        self._pool = None
+        self._poolState = None
 
         # Check the resultsDb (optional).
         if resultsDb is not None:
@@ -171,6 +269,9 @@ class MetricBundleGroup(object):
         #
         compatibleLists = []
         for k, b in self.currentBundleDict.items():
+            # Bundles read back from disk (in incremental mode) do not need to be run.
+            if k in self.skipped:
+                continue
             foundCompatible = False
             for compatibleList in compatibleLists:
                 comparisonMetricBundleKey = compatibleList[0]
@@ -201,7 +302,7 @@ class MetricBundleGroup(object):
                 )
         self.compatibleLists = compatibleLists
 
-    def runAll(self, clearMemory=False, plotNow=False, plotKwargs=None):
+    def runAll(self, clearMemory=False, plotNow=False, plotKwargs=None, nProcesses=1):
         """Runs all the metricBundles in the metricBundleGroup, over all constraints.
 
         Calculates metric values, then runs reduce functions and summary statistics for
@@ -215,6 +316,10 @@ class MetricBundleGroup(object):
             If True, plots the metric values immediately after calculation.
         plotKwargs : `bool`, optional
             kwargs to pass to plotCurrent.
+        nProcesses : `int`, optional
+            The number of processes to use when calculating metric values at the slicePoints.
+            If greater than 1, the slicePoints are split into chunks which are run on a pool of
+            forked processes. The results are identical to a serial run. Default 1.
         """
         for constraint in self.constraints:
             # Set the 'currentBundleDict' which is a dictionary of the metricBundles which match this
@@ -224,6 +329,7 @@ class MetricBundleGroup(object):
                 clearMemory=clearMemory,
                 plotNow=plotNow,
                 plotKwargs=plotKwargs,
+                nProcesses=nProcesses,
             )
 
     def setCurrent(self, constraint):
@@ -246,6 +352,16 @@ class MetricBundleGroup(object):
         self.dbCols = []
         for b in self.currentBundleDict.values():
             self.dbCols.extend(b.dbCols)
+        # The visit ids are needed to subset the slicer overlap indexes,
+        # and to reuse stacker columns between constraints.
+        if self.overlapIndexDir is not None:
+            self.dbCols.append("observationId")
+        if (
+            self.stackerCache.maxSize > 0
+            and any(len(b.stackerList) > 0 for b in self.currentBundleDict.values())
+            and self._databaseKey() is not None
+        ):
+            self.dbCols.append("observationId")
         self.dbCols = list(set(self.dbCols))
 
     def runCurrent(
@@ -255,6 +371,7 @@ class MetricBundleGroup(object):
         clearMemory=False,
         plotNow=False,
         plotKwargs=None,
+        nProcesses=1,
     ):
         """Run all the metricBundles which match this constraint in the metricBundleGroup.
 
@@ -275,15 +392,29 @@ class MetricBundleGroup(object):
            is to plot after metric values are calculated for all constraints).
         plotKwargs : kwargs, optional
            Plotting kwargs to pass to plotCurrent.
+        nProcesses : `int`, optional
+           The number of processes to use when calculating metric values at the slicePoints.
+           Default 1 (run serially).
         """
         self.setCurrent(constraint)
+        if self.incremental:
+            if simData is not None:
+                self._readUnchanged(dbChecksum=self._simDataChecksum(simData))
+            else:
+                self._readUnchanged()
 
         # Can pass simData directly (if had other method for getting data)
         if simData is not None:
             self.simData = simData
+            self._simDataKey = None
+
+        elif set(self.currentBundleDict).issubset(self.skipped):
+            # All of the bundles were read from disk, so there is no need to query the data.
+            self.simData = None
 
         else:
             self.simData = None
+            self._simDataKey = self._databaseKey()
             # Query for the data.
             try:
                 self.getData(constraint)
@@ -314,15 +445,29 @@ class MetricBundleGroup(object):
         # Find compatible subsets of the MetricBundle dictionary,
         # which can be run/metrics calculated/ together.
         self._findCompatibleLists()
+        # The bundles which were read from disk (the reduced bundles are added later).
+        computed = set(k for c in self.compatibleLists for k in c)
+        readKeys = [k for k in self.currentBundleDict if k not in computed]
 
-        for compatibleList in self.compatibleLists:
-            if self.verbose:
-                print("Running: ", compatibleList)
-            self._runCompatible(compatibleList)
-            if self.verbose:
-                print("Completed metric generation.")
-            for key in compatibleList:
-                self.hasRun[key] = True
+        try:
+            for i, compatibleList in enumerate(self.compatibleLists):
+                if self.verbose:
+                    print("Running: ", compatibleList)
+                self._runCompatible(compatibleList, nProcesses=nProcesses)
+                if self.verbose:
+                    print("Completed metric generation.")
+                for key in compatibleList:
+                    self.hasRun[key] = True
+                if self.indexMemoryBudget is not None:
+                    self._finishBundles(compatibleList, plotNow, plotKwargs)
+                    self._releaseColumns(self.compatibleLists[i + 1 :])
+        finally:
+            self._closePool()
+        if self.indexMemoryBudget is not None:
+            # Finish the bundles which were read from disk, too.
+            self._finishBundles(readKeys, plotNow, plotKwargs)
+            self.simData = None
+            return
         # Run the reduce methods.
         if self.verbose:
             print("Running reduce methods.")
@@ -345,6 +490,161 @@ class MetricBundleGroup(object):
             if self.verbose:
                 print("Deleted metricValues from memory.")
 
+    def _finishBundles(self, keys, plotNow=False, plotKwargs=None):
+        """Reduce, summarize, plot and save the bundles in keys, then release their metric values.
+
+        Used in the streaming mode (see indexMemoryBudget).
+        """
+        currentBundleDict = self.currentBundleDict
+        self.currentBundleDict = {k: currentBundleDict[k] for k in keys}
+        try:
+            self.reduceCurrent()
+            self.summaryCurrent()
+            if plotNow:
+                if plotKwargs is None:
+                    self.plotCurrent()
+                else:
+                    self.plotCurrent(**plotKwargs)
+            for k, b in self.currentBundleDict.items():
+                # With saveEarly, the metric values were already saved.
+                if not self.saveEarly and k not in self.skipped:
+                    b.write(outDir=self.outDir, resultsDb=self.resultsDb)
+                b.metricValues = None
+        finally:
+            # Keep track of the reduced bundles.
+            currentBundleDict.update(self.currentBundleDict)
+            self.currentBundleDict = currentBundleDict
+
+    def _releaseColumns(self, remainingLists):
+        """Drop the simData columns which are not needed by the bundles in remainingLists.
+
+        The database columns are always kept; stacker columns are recalculated if needed.
+        """
+        if self.simData is None:
+            return
+        needed = set(self.dbCols)
+        for compatibleList in remainingLists:
+            for k in compatibleList:
+                b = self.currentBundleDict[k]
+                needed.update(b.slicer.columnsNeeded)
+                needed.update(b.metric.colNameArr)
+                for stacker in b.stackerList:
+                    needed.update(stacker.colsReq)
+        keep = [name for name in self.simData.dtype.names if name in needed]
+        if len(keep) < len(self.simData.dtype.names):
+            self.simData = rfn.repack_fields(self.simData[keep])
+
+    def _databaseKey(self):
+        """Return a key identifying the visits in the database (its file, table, size and
+        modification time), for the stacker cache.
+
+        Returns None if the database is not a sqlite file with an observationId column;
+        the stacker cache then hashes the input columns of the stackers instead.
+        """
+        if self._dbKey is None:
+            dbFile = self.dbObj
+            tableName = self.dbTable
+            if isinstance(dbFile, utils.OpsimColumnCache):
+                dbFile, tableName = dbFile.dbFile, dbFile.tableName
+            self._dbKey = ""
+            if isinstance(dbFile, str) and os.path.isfile(dbFile):
+                try:
+                    columns = utils.getColumnNames(dbFile, tableName=tableName)
+                except ValueError:
+                    columns = []
+                if "observationId" in columns:
+                    stat = os.stat(dbFile)
+                    self._dbKey = "%s %s %i %f" % (
+                        os.path.abspath(dbFile),
+                        tableName,
+                        stat.st_size,
+                        stat.st_mtime,
+                    )
+        if len(self._dbKey) == 0:
+            return None
+        return self._dbKey
+
+    def _dbFileChecksum(self):
+        """Return a checksum of the opsim database file and the queried table
+        (or its name, if it is not a file)."""
+        if self._dbChecksum is None:
+            dbFile = self.dbObj
+            tableName = self.dbTable
+            if isinstance(dbFile, utils.OpsimColumnCache):
+                dbFile, tableName = dbFile.dbFile, dbFile.tableName
+            if isinstance(dbFile, str) and os.path.isfile(dbFile):
+                h = hashlib.sha1()
+                with open(dbFile, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        h.update(block)
+                if tableName is not None:
+                    h.update(tableName.encode())
+                self._dbChecksum = h.hexdigest()
+            else:
+                self._dbChecksum = str(dbFile)
+        return self._dbChecksum
+
+    def _simDataChecksum(self, simData):
+        """Return a checksum of the columns of simData (used instead of the database checksum
+        when simData is passed directly to runCurrent)."""
+        h = hashlib.sha1()
+        h.update(str(simData.dtype.descr).encode())
+        for name in simData.dtype.names:
+            h.update(np.ascontiguousarray(simData[name]).tobytes())
+        return h.hexdigest()
+
+    def _isUpToDate(self, bundle, filename):
+        """Check if filename holds metric values calculated with the same inputs as bundle."""
+        if not os.path.isfile(filename):
+            return False
+        try:
+            with np.load(filename, allow_pickle=True) as data:
+                header = data["header"][()]
+        except (IOError, ValueError, KeyError, zipfile.BadZipFile):
+            return False
+        if header.get("provenance") != bundle.provenance:
+            return False
+        if self.resultsDb is not None:
+            metricIds = self.resultsDb.getMetricId(
+                bundle.metric.name,
+                slicerName=bundle.slicer.slicerName,
+                metricInfoLabel=bundle.info_label,
+                simDataName=bundle.runName,
+            )
+            if len(metricIds) == 0:
+                return False
+        return True
+
+    def _readUnchanged(self, dbChecksum=None):
+        """Read the metric values of the current bundles which have not changed since they were saved.
+
+        Sets the provenance hash of each bundle in the currentBundleDict. Bundles with an
+        up-to-date output file are read from disk and added to self.skipped.
+
+        Parameters
+        ----------
+        dbChecksum : `str`, optional
+            The checksum of the input data. Default None uses the checksum of the opsim database.
+        """
+        if dbChecksum is None:
+            dbChecksum = self._dbFileChecksum()
+        for k, b in self.currentBundleDict.items():
+            if k in self.skipped:
+                continue
+            b.provenance = b.provenanceHash(dbChecksum=dbChecksum)
+            filename = os.path.join(self.outDir, b.fileRoot + ".npz")
+            if not self._isUpToDate(b, filename):
+                continue
+            # Read into a temporary metricBundle, so we don't override the plotDict/etc.
+            tmpBundle = createEmptyMetricBundle()
+            tmpBundle.read(filename)
+            b.metricValues = tmpBundle.metricValues
+            b.slicer = tmpBundle.slicer
+            self.skipped.add(k)
+            self.hasRun[k] = True
+            if self.verbose:
+                print("Read unchanged %s from disk." % (b.fileRoot))
+
     def getData(self, constraint):
         """Query the data from the database.
 
@@ -377,7 +677,7 @@ class MetricBundleGroup(object):
         if self.verbose:
             print("Found %i visits" % (self.simData.size))
 
-    def _runCompatible(self, compatibleList):
+    def _runCompatible(self, compatibleList, nProcesses=1):
         """Runs a set of 'compatible' metricbundles in the MetricBundleGroup dictionary,
         identified by 'compatibleList' keys.
 
@@ -387,6 +687,7 @@ class MetricBundleGroup(object):
         slicer, the same maps applied to the slicer, and stackers which do not clobber each other's data.
 
         This is where the work of calculating the metric values is done.
+        If nProcesses > 1, the slicePoints are evaluated in parallel (see _runSlicePointsParallel).
         """
 
         if len(self.simData) == 0:
@@ -410,25 +711,27 @@ class MetricBundleGroup(object):
             if m not in uniqMaps:
                 uniqMaps.append(m)
 
-        # Run stackers.
-        # Run dither stackers first. (this is a bit of a hack -- we should probably figure out
-        # proper hierarchy and DAG so that stackers run in the order they need to. This will catch 90%).
-        ditherStackers = []
-        for s in uniqStackers:
-            if isinstance(s, BaseDitherStacker):
-                ditherStackers.append(s)
-        for stacker in ditherStackers:
-            self.simData = stacker.run(self.simData, override=True)
-            uniqStackers.remove(stacker)
-
-        for stacker in uniqStackers:
+        # Run stackers, in order of their dependencies on each other's columns.
+        # Stacker columns already calculated for the same visits (in an earlier compatible group
+        # or constraint) are reused from the stacker cache.
+        uniqStackers = orderStackers(uniqStackers)
+        dataKeys = self.stackerCache.dataKeys(uniqStackers, self._simDataKey)
+        for stacker, dataKey in zip(uniqStackers, dataKeys):
             # Note that stackers will clobber previously existing rows with the same name.
-            self.simData = stacker.run(self.simData, override=True)
+            self.simData = self.stackerCache.run(
+                stacker, self.simData, dataKey=dataKey, idCol="observationId"
+            )
 
         # Pull out one of the slicers to use as our 'slicer'.
         # This will be forced back into all of the metricBundles at the end (so that they track
         #  the same info_label such as the slicePoints, in case the same actual object wasn't used).
         slicer = list(bDict.values())[0].slicer
+        if (
+            self.overlapIndexDir is not None
+            and isinstance(slicer, BaseSpatialSlicer)
+            and slicer.useOverlapIndex
+        ):
+            slicer.overlapIndex = self._getOverlapIndex(slicer)
         slicer.setupSlicer(self.simData, maps=uniqMaps)
         # Copy the slicer (after setup) back into the individual metricBundles.
         if slicer.slicerName != "HealpixSlicer" or slicer.slicerName != "UniSlicer":
@@ -439,55 +742,33 @@ class MetricBundleGroup(object):
         for b in bDict.values():
             b._setupMetricValues()
 
-        # Set up an ordered dictionary to be the cache if needed:
-        # (Currently using OrderedDict, it might be faster to use 2 regular Dicts instead)
-        if slicer.cacheSize > 0:
-            cacheDict = OrderedDict()
-            cache = True
+        # Metrics which implement runBatch calculate the values at all slicePoints at once,
+        # using the indexes of the visits at each slicePoint collected while stepping through the slicer.
+        # The other metrics are calculated one slicePoint at a time.
+        batchDict = {}
+        loopDict = {}
+        for k, b in bDict.items():
+            if b.metric.canRunBatch() and b.metric.shape == 1:
+                batchDict[k] = b
+            else:
+                loopDict[k] = b
+        if self.indexMemoryBudget is not None:
+            self._runTiles(loopDict, batchDict, slicer, nProcesses)
         else:
-            cache = False
-        # Run through all slicepoints and calculate metrics.
-        for slice_i in slicer:
-            i = slice_i["slicePoint"]["sid"]
-            slicedata = self.simData[slice_i["idxs"]]
-            if len(slicedata) == 0:
-                # No data at this slicepoint. Mask data values.
-                for b in bDict.values():
-                    b.metricValues.mask[i] = True
+            if len(batchDict) > 0:
+                indexMap = {}
             else:
-                # There is data! Should we use our data cache?
-                if cache:
-                    # Make the data idxs hashable.
-                    cacheKey = frozenset(slice_i["idxs"])
-                    # If key exists, set flag to use it, otherwise add it
-                    if cacheKey in cacheDict:
-                        useCache = True
-                        cacheVal = cacheDict[cacheKey]
-                        # Move this value to the end of the OrderedDict
-                        del cacheDict[cacheKey]
-                        cacheDict[cacheKey] = cacheVal
-                    else:
-                        cacheDict[cacheKey] = i
-                        useCache = False
-                    for b in bDict.values():
-                        if useCache:
-                            b.metricValues.data[i] = b.metricValues.data[
-                                cacheDict[cacheKey]
-                            ]
-                        else:
-                            b.metricValues.data[i] = b.metric.run(
-                                slicedata, slicePoint=slice_i["slicePoint"]
-                            )
-                    # If we are above the cache size, drop the oldest element from the cache dict.
-                    if len(cacheDict) > slicer.cacheSize:
-                        del cacheDict[list(cacheDict.keys())[0]]
-
-                # Not using memoize, just calculate things normally
-                else:
-                    for b in bDict.values():
-                        b.metricValues.data[i] = b.metric.run(
-                            slicedata, slicePoint=slice_i["slicePoint"]
-                        )
+                indexMap = None
+            if nProcesses > 1 and slicer.nslice > 1:
+                self._runSlicePointsParallel(
+                    loopDict, slicer, nProcesses, indexMap=indexMap
+                )
+            else:
+                self._runSlicePoints(
+                    loopDict, slicer, range(slicer.nslice), indexMap=indexMap
+                )
+            if indexMap is not None:
+                self._runBatch(batchDict, slicer, indexMap)
         # Mask data where metrics could not be computed (according to metric bad value).
         for b in bDict.values():
             if b.metricValues.dtype.name == "object":
@@ -509,6 +790,267 @@ class MetricBundleGroup(object):
             for b in bDict.values():
                 b.writeDb(resultsDb=self.resultsDb)
 
+    def _getOverlapIndex(self, slicer, idCol="observationId"):
+        """Get the overlap index for slicer, calculated on all visits in the database.
+
+        The index is loaded from self.overlapIndexDir if it was calculated before
+        (for the same pointings and slicer configuration), otherwise it is calculated and saved.
+
+        Parameters
+        ----------
+        slicer : `rubin_sim.maf.slicers.BaseSpatialSlicer`
+            The spatial slicer.
+        idCol : `str`, optional
+            The name of the visit id column. Default observationId.
+
+        Returns
+        -------
+        overlapIndex : `rubin_sim.maf.slicers.OverlapIndex` or None
+            None if the pointing columns could not be queried from the database
+            (for example, if they are generated by stackers) or there is no database.
+        """
+        if self.dbObj is None:
+            return None
+        cols = [idCol, slicer.lonCol, slicer.latCol]
+        if slicer.useCamera:
+            cols.append(slicer.rotSkyPosColName)
+        if tuple(cols) not in self._overlapPointings:
+            try:
+                self._overlapPointings[tuple(cols)] = utils.getSimData(
+                    self.dbObj, "", cols, tableName=self.dbTable
+                )
+            except (pd.errors.DatabaseError, UserWarning):
+                # Most likely the columns are not in the database (but added by stackers).
+                self._overlapPointings[tuple(cols)] = None
+        pointings = self._overlapPointings[tuple(cols)]
+        if pointings is None:
+            return None
+        key = OverlapIndex.makeKey(slicer, pointings, idCol=idCol)
+        if key not in self.overlapIndexes:
+            if self.verbose:
+                print("Loading overlap index for %s" % (slicer.slicerName))
+            self.overlapIndexes[key] = OverlapIndex.fromCache(
+                slicer, pointings, self.overlapIndexDir, idCol=idCol
+            )
+        return self.overlapIndexes[key]
+
+    def _runSlicePoints(self, bDict, slicer, sids, indexMap=None):
+        """Calculate the metric values for the compatible bundles in bDict at the slicePoints in sids.
+
+        The results are stored into the (already set up) metricValues of each bundle.
+        If slicer.cacheSize > 0, the metric values are copied from an earlier slicePoint
+        with exactly the same visits, if there is one in the `SliceCache`
+        (the hits and misses are added to self.sliceCacheHits and self.sliceCacheMisses).
+
+        Parameters
+        ----------
+        bDict : `dict` of `MetricBundle`
+            The compatible metricBundles to calculate.
+        slicer : `rubin_sim.maf.slicers.BaseSlicer`
+            The (set up) slicer shared by the bundles in bDict.
+        sids : iterable of `int`
+            The indexes of the slicePoints to evaluate.
+        indexMap : `dict`, optional
+            If not None, the simData indexes at each slicePoint are stored in indexMap (keyed by sid).
+
+        Returns
+        -------
+        filled : `np.ndarray`
+            The slicePoint ids ('sid') of the metricValues which were filled.
+        """
+        filled = []
+        # Set up the cache of metric values, if the slicer will see the same visits at many slicePoints.
+        if slicer.cacheSize > 0:
+            cache = SliceCache(slicer.cacheSize)
+        else:
+            cache = None
+        # Run through all slicepoints and calculate metrics.
+        for islice in sids:
+            slice_i = slicer[islice]
+            i = slice_i["slicePoint"]["sid"]
+            filled.append(i)
+            if indexMap is not None:
+                indexMap[i] = slice_i["idxs"]
+            if len(bDict) == 0:
+                continue
+            slicedata = self.simData[slice_i["idxs"]]
+            if len(slicedata) == 0:
+                # No data at this slicepoint. Mask data values.
+                for b in bDict.values():
+                    b.metricValues.mask[i] = True
+                continue
+            # There is data! Should we use our data cache?
+            cachedSid = None
+            if cache is not None:
+                cacheKey = cache.key(slice_i["idxs"])
+                cachedSid = cache.get(cacheKey)
+                if cachedSid is None:
+                    cache.add(cacheKey, i)
+            for b in bDict.values():
+                if cachedSid is not None:
+                    b.metricValues.data[i] = b.metricValues.data[cachedSid]
+                else:
+                    b.metricValues.data[i] = b.metric.run(
+                        slicedata, slicePoint=slice_i["slicePoint"]
+                    )
+        if cache is not None:
+            self.sliceCacheHits += cache.hits
+            self.sliceCacheMisses += cache.misses
+        return np.array(filled, int)
+
+    def _runTiles(self, loopDict, batchDict, slicer, nProcesses=1):
+        """Calculate the metric values in tiles of consecutive slicePoints.
+
+        For healpix slicers (in RING order) a tile is a band of the sky. The visit indexes
+        collected for the runBatch metrics are released after each tile, and the size of the
+        next tile is set so that these indexes fit in the memory budget.
+
+        Parameters
+        ----------
+        loopDict : `dict` of `MetricBundle`
+            The compatible metricBundles to calculate one slicePoint at a time.
+        batchDict : `dict` of `MetricBundle`
+            The compatible metricBundles to calculate with runBatch.
+        slicer : `rubin_sim.maf.slicers.BaseSlicer`
+            The (set up) slicer shared by the bundles.
+        nProcesses : `int`, optional
+            The number of processes to use for each tile. Default 1.
+        """
+        budget = self.indexMemoryBudget * 1024**2
+        tileSize = min(slicer.nslice, 1024)
+        start = 0
+        while start < slicer.nslice:
+            sids = np.arange(start, min(start + tileSize, slicer.nslice))
+            if len(batchDict) > 0:
+                indexMap = {}
+            else:
+                indexMap = None
+            if nProcesses > 1 and len(sids) > 1:
+                self._runSlicePointsParallel(
+                    loopDict, slicer, nProcesses, indexMap=indexMap, sids=sids
+                )
+            else:
+                self._runSlicePoints(loopDict, slicer, sids, indexMap=indexMap)
+            if indexMap is not None:
+                self._runBatch(batchDict, slicer, indexMap)
+                nbytes = sum(np.asarray(idxs).nbytes for idxs in indexMap.values())
+                # Leave room for the CSR copy of the indexes made by _runBatch.
+                perPoint = max(nbytes / len(sids), 1.0)
+                tileSize = int(min(max(budget / 2.0 / perPoint, 1), slicer.nslice))
+            start = sids[-1] + 1
+
+    def _runSlicePointsParallel(
+        self, bDict, slicer, nProcesses, indexMap=None, sids=None
+    ):
+        """Calculate the metric values for the compatible bundles in bDict, splitting
+        the slicePoints into chunks which are evaluated on a pool of nProcesses processes.
+
+        The worker processes are forked from this process, so they share (copy-on-write)
+        the simData, the set-up slicer and the metrics, without pickling them.
+        The metric values calculated at each chunk of slicePoints are merged back into
+        the metricValues of each bundle, giving the same result as a serial run.
+        If forking processes is not available on this platform, falls back to a serial run.
+
+        Parameters
+        ----------
+        bDict : `dict` of `MetricBundle`
+            The compatible metricBundles to calculate.
+        slicer : `rubin_sim.maf.slicers.BaseSlicer`
+            The (set up) slicer shared by the bundles in bDict.
+        nProcesses : `int`
+            The number of processes to use.
+        indexMap : `dict`, optional
+            If not None, the simData indexes at each slicePoint are stored in indexMap (keyed by sid).
+        sids : `numpy.ndarray`, optional
+            The slicePoints to calculate. Default None (all of the slicePoints).
+        """
+        if sids is None:
+            sids = np.arange(slicer.nslice)
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            warnings.warn(
+                "Cannot fork processes on this platform; running slicePoints serially."
+            )
+            self._runSlicePoints(bDict, slicer, sids, indexMap=indexMap)
+            return
+        # Use several chunks per process, so that slow regions of the sky are balanced over the pool.
+        nChunks = min(len(sids), nProcesses * 4)
+        chunks = np.array_split(sids, nChunks)
+        pool = self._getPool(context, nProcesses, bDict, slicer, indexMap is not None)
+        for filled, results, chunkIndexMap, cacheCounts in pool.imap_unordered(
+            _runSlicePointChunk, chunks
+        ):
+            self.sliceCacheHits += cacheCounts[0]
+            self.sliceCacheMisses += cacheCounts[1]
+            for k, (data, mask) in results.items():
+                bDict[k].metricValues.data[filled] = data
+                bDict[k].metricValues.mask[filled] = mask
+            if indexMap is not None:
+                indexMap.update(chunkIndexMap)
+
+    def _getPool(self, context, nProcesses, bDict, slicer, mapIndexes):
+        """Return a pool of processes forked with the state needed to calculate bDict.
+
+        The pool is kept, and reused for all of the tiles (or chunks) of slicePoints of the
+        same bundles, until runCurrent finishes. The forked workers only see the state of this
+        process when they were forked, so a new pool is started when the bundles, slicer or
+        simData change (for the next set of compatible bundles).
+        """
+        global _parallelState
+        state = (bDict, slicer, self.simData, mapIndexes, nProcesses)
+        if self._pool is not None:
+            sameObjects = all(a is b for a, b in zip(state[:3], self._poolState[:3]))
+            if not sameObjects or state[3:] != self._poolState[3:]:
+                self._closePool()
+        if self._pool is None:
+            _parallelState = (self, bDict, slicer, mapIndexes)
+            try:
+                self._pool = context.Pool(processes=nProcesses)
+            finally:
+                _parallelState = None
+            self._poolState = state
+        return self._pool
+
+    def _closePool(self):
+        """Shut down the pool of forked processes, if there is one."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._poolState = None
+
+    def _runBatch(self, bDict, slicer, indexMap):
+        """Calculate the metric values for bundles whose metrics implement runBatch.
+
+        Parameters
+        ----------
+        bDict : `dict` of `MetricBundle`
+            The compatible metricBundles to calculate.
+        slicer : `rubin_sim.maf.slicers.BaseSlicer`
+            The (set up) slicer shared by the bundles in bDict.
+        indexMap : `dict`
+            The simData indexes at each slicePoint (keyed by sid).
+        """
+        # Build the visit -> slicePoint map in compressed sparse row format.
+        sids = np.array(sorted(indexMap.keys()), int)
+        idxList = []
+        for sid in sids:
+            idxs = np.asarray(indexMap[sid])
+            if idxs.dtype == bool:
+                idxs = np.flatnonzero(idxs)
+            idxList.append(idxs.astype(int, copy=False))
+        counts = np.array([len(idxs) for idxs in idxList], int)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        if len(idxList) > 0:
+            indices = np.concatenate(idxList)
+        else:
+            indices = np.array([], int)
+        for b in bDict.values():
+            b.metricValues.data[sids] = b.metric.runBatch(self.simData, indptr, indices)
+            # No data at these slicepoints. Mask data values.
+            b.metricValues.mask[sids[counts == 0]] = True
+
     def reduceAll(self, updateSummaries=True):
         """Run the reduce methods for all metrics in bundleDict.
 
@@ -537,7 +1079,7 @@ class MetricBundleGroup(object):
         """
         # Create a temporary dictionary to hold the reduced metricbundles.
         reduceBundleDict = {}
-        for b in self.currentBundleDict.values():
+        for k, b in self.currentBundleDict.items():
             # If there are no reduce functions associated with the metric, skip this metricBundle.
             if len(b.metric.reduceFuncs) > 0:
                 # Apply reduce functions, creating a new metricBundle in the process (new metric values).
@@ -550,7 +1092,10 @@ class MetricBundleGroup(object):
                     if name in self.bundleDict:
                         name = newmetricbundle.fileRoot
                     reduceBundleDict[name] = newmetricbundle
-                    if self.saveEarly:
+                    # The reduced values of unchanged bundles were already saved.
+                    if k in self.skipped:
+                        self.skipped.add(name)
+                    elif self.saveEarly:
                         newmetricbundle.write(
                             outDir=self.outDir, resultsDb=self.resultsDb
                         )
@@ -576,7 +1121,10 @@ class MetricBundleGroup(object):
 
     def summaryCurrent(self):
         """Run summary statistics on all the metricBundles in the currently active set of MetricBundles."""
-        for b in self.currentBundleDict.values():
+        for k, b in self.currentBundleDict.items():
+            # The summary statistics of unchanged bundles are already in the resultsDb.
+            if k in self.skipped:
+                continue
             b.computeSummaryStats(self.resultsDb)
 
     def plotAll(
@@ -0,0 +1,76 @@
+# A least-recently-used cache of the slicePoints where metric values were calculated,
+#  keyed by the set of visits at each slicePoint. Neighbouring slicePoints of dense spatial slicers
+#  often see exactly the same visits; the metric values calculated at the first of these
+#  slicePoints can then be copied to the others instead of being calculated again.
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+__all__ = ["SliceCache"]
+
+
+class SliceCache(object):
+    """LRU cache mapping the set of simData indexes at a slicePoint to the slicePoint
+    where the metric values for that set of indexes were calculated.
+
+    The key is a digest of the sorted indexes, so lookups and insertions only hash the index
+    array, and the least recently used entry is evicted in constant time.
+
+    Parameters
+    ----------
+    maxSize : `int`
+        The maximum number of entries to keep.
+    """
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        """Empty the cache (the hit and miss counters are kept)."""
+        self._cache.clear()
+
+    @staticmethod
+    def key(idxs):
+        """Return the cache key for the simData indexes idxs.
+
+        Parameters
+        ----------
+        idxs : `numpy.ndarray` or `list`
+            The simData indexes (or a boolean mask of simData) at a slicePoint.
+
+        Returns
+        -------
+        key : `bytes`
+        """
+        idxs = np.asarray(idxs)
+        if idxs.dtype == bool:
+            idxs = np.flatnonzero(idxs)
+        else:
+            idxs = np.unique(idxs)
+        return hashlib.blake2b(
+            idxs.astype(np.int64, copy=False).tobytes(), digest_size=16
+        ).digest()
+
+    def get(self, key):
+        """Return the slicePoint cached under key (marking it as recently used), or None."""
+        sid = self._cache.get(key)
+        if sid is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return sid
+
+    def add(self, key, sid):
+        """Cache slicePoint sid under key, evicting the least recently used entry if full."""
+        self._cache[key] = sid
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.maxSize:
+            self._cache.popitem(last=False)
@@ -10,6 +10,7 @@ import numpy as np
 import inspect
 from rubin_sim.maf.stackers.getColInfo import ColInfo
 from six import with_metaclass
+from rubin_sim.maf.utils import bindInitArgs
 import warnings
 
 __all__ = ["MetricRegistry", "BaseMetric", "ColRegistry"]
@@ -41,6 +42,12 @@ class MetricRegistry(type):
         if metricname not in ["BaseMetric", "SimpleScalarMetric"]:
             cls.registry[metricname] = cls
 
+    def __call__(cls, *args, **kwargs):
+        # Record the constructor arguments, which identify the object in provenance hashes.
+        obj = super(MetricRegistry, cls).__call__(*args, **kwargs)
+        obj._initArgs = bindInitArgs(cls, args, kwargs)
+        return obj
+
     def getClass(cls, metricname):
         return cls.registry[metricname]
 
@@ -214,3 +221,41 @@ class BaseMetric(with_metaclass(MetricRegistry, object)):
             The metric value at each slicePoint.
         """
         raise NotImplementedError("Please implement your metric calculation.")
+
+    def runBatch(self, simData, indptr, indices):
+        """Calculate metric values at all slicePoints at once (optional).
+
+        Metrics which are simple reductions over the visits at each slicePoint can
+        implement this method, to calculate the values at all slicePoints in a few
+        numpy calls instead of calling `run` once per slicePoint.
+        The MetricBundleGroup uses this method automatically when it is available
+        (see `canRunBatch`), and falls back to `run` otherwise.
+
+        Parameters
+        ----------
+        simData : `numpy.recarray`
+           The simulated data for all slicePoints.
+        indptr : `numpy.ndarray`
+           The visit -> slicePoint map, in compressed sparse row format:
+           simData[indices[indptr[i]:indptr[i+1]]] is the dataSlice at slicePoint i.
+           len(indptr) is the number of slicePoints + 1.
+        indices : `numpy.ndarray`
+           The indexes of simData at each slicePoint (see indptr).
+
+        Returns
+        -------
+        metricValues: `numpy.ndarray`
+            The metric value at each slicePoint. Values at slicePoints with no visits are ignored.
+        """
+        raise NotImplementedError("This metric does not implement runBatch.")
+
+    def canRunBatch(self):
+        """Return True if runBatch is implemented for the same calculation as run.
+
+        runBatch is considered unavailable if a subclass overrides `run` without
+        also overriding `runBatch`.
+        """
+        mro = type(self).__mro__
+        runOwner = next(c for c in mro if "run" in c.__dict__)
+        batchOwner = next(c for c in mro if "runBatch" in c.__dict__)
+        return batchOwner is not BaseMetric and issubclass(batchOwner, runOwner)
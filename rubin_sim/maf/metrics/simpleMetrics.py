@@ -41,6 +41,23 @@ __all__ = [
 twopi = 2.0 * np.pi
 
 
+def _segmentIds(indptr):
+    """Return the slicePoint id of each entry in the indices of a CSR visit -> slicePoint map."""
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def _segmentReduce(ufunc, values, indptr):
+    """Apply ufunc.reduceat over each (non-empty) slicePoint of a CSR visit -> slicePoint map.
+
+    Values at empty slicePoints are set to 0 (these are masked by the MetricBundleGroup).
+    """
+    result = np.zeros(len(indptr) - 1, dtype=values.dtype)
+    nonempty = np.where(np.diff(indptr) > 0)[0]
+    if len(nonempty) > 0:
+        result[nonempty] = ufunc.reduceat(values, indptr[nonempty])
+    return result
+
+
 class PassMetric(BaseMetric):
     """
     Just pass the entire array through
@@ -72,6 +89,15 @@ class Coaddm5Metric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return 1.25 * np.log10(np.sum(10.0 ** (0.8 * dataSlice[self.colname])))
 
+    def runBatch(self, simData, indptr, indices):
+        flux = np.bincount(
+            _segmentIds(indptr),
+            weights=10.0 ** (0.8 * simData[self.colname][indices]),
+            minlength=len(indptr) - 1,
+        )
+        with np.errstate(divide="ignore"):
+            return 1.25 * np.log10(flux)
+
 
 class MaxMetric(BaseMetric):
     """Calculate the maximum of a simData column slice."""
@@ -79,6 +105,9 @@ class MaxMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return np.max(dataSlice[self.colname])
 
+    def runBatch(self, simData, indptr, indices):
+        return _segmentReduce(np.maximum, simData[self.colname][indices], indptr)
+
 
 class AbsMaxMetric(BaseMetric):
     """Calculate the max of the absolute value of a simData column slice."""
@@ -93,6 +122,16 @@ class MeanMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return np.mean(dataSlice[self.colname])
 
+    def runBatch(self, simData, indptr, indices):
+        nslice = len(indptr) - 1
+        total = np.bincount(
+            _segmentIds(indptr),
+            weights=simData[self.colname][indices],
+            minlength=nslice,
+        )
+        counts = np.diff(indptr)
+        return np.divide(total, counts, out=np.zeros(nslice), where=counts > 0)
+
 
 class AbsMeanMetric(BaseMetric):
     """Calculate the mean of the absolute value of a simData column slice."""
@@ -107,6 +146,22 @@ class MedianMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return np.median(dataSlice[self.colname])
 
+    def runBatch(self, simData, indptr, indices):
+        # Sort the values within each slicePoint, then pick out the middle value(s).
+        segments = _segmentIds(indptr)
+        values = simData[self.colname][indices]
+        values = values[np.lexsort((values, segments))]
+        counts = np.diff(indptr)
+        nonempty = np.where(counts > 0)[0]
+        upper = indptr[nonempty] + counts[nonempty] // 2
+        lower = np.where(counts[nonempty] % 2 == 1, upper, upper - 1)
+        result = np.zeros(len(counts))
+        result[nonempty] = (values[lower] + values[upper]) / 2.0
+        # As for np.median, any nan in a slicePoint makes its median nan
+        # (sorting puts the nans at the end of each slicePoint, so they would be skipped).
+        result[np.unique(segments[np.isnan(values)])] = np.nan
+        return result
+
 
 class AbsMedianMetric(BaseMetric):
     """Calculate the median of the absolute value of a simData column slice."""
@@ -121,6 +176,9 @@ class MinMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return np.min(dataSlice[self.colname])
 
+    def runBatch(self, simData, indptr, indices):
+        return _segmentReduce(np.minimum, simData[self.colname][indices], indptr)
+
 
 class FullRangeMetric(BaseMetric):
     """Calculate the range of a simData column slice."""
@@ -149,6 +207,9 @@ class SumMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return np.sum(dataSlice[self.colname])
 
+    def runBatch(self, simData, indptr, indices):
+        return _segmentReduce(np.add, simData[self.colname][indices], indptr)
+
 
 class CountUniqueMetric(BaseMetric):
     """Return the number of unique values."""
@@ -176,6 +237,9 @@ class CountMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return len(dataSlice[self.colname])
 
+    def runBatch(self, simData, indptr, indices):
+        return np.diff(indptr)
+
 
 class CountExplimMetric(BaseMetric):
     """Count the number of x second visits.  Useful for rejecting very short exposures
@@ -214,6 +278,9 @@ class CountRatioMetric(BaseMetric):
     def run(self, dataSlice, slicePoint=None):
         return len(dataSlice[self.colname]) / self.normVal
 
+    def runBatch(self, simData, indptr, indices):
+        return np.diff(indptr) / self.normVal
+
 
 class CountSubsetMetric(BaseMetric):
     """Count the length of a simData column slice which matches 'subset'."""
@@ -5,6 +5,7 @@ from .nDSlicer import *
 from .movieSlicer import *
 from .hourglassSlicer import *
 from .baseSpatialSlicer import *
+from .overlapIndex import *
 from .healpixSlicer import *
 from .healpixSubsetSlicer import *
 from .healpixSDSSSlicer import *
@@ -179,6 +179,7 @@ class BaseSlicer(with_metaclass(SlicerRegistry, object)):
         info_label="",
         plotDict=None,
         displayDict=None,
+        provenance=None,
     ):
         """
         Save metric values along with the information required to re-build the slicer.
@@ -189,6 +190,9 @@ class BaseSlicer(with_metaclass(SlicerRegistry, object)):
             The output file name.
         metricValues : `np.ma.MaskedArray` or `np.ndarray`
             The metric values to save to disk.
+        provenance : `str`, optional
+            A hash identifying the inputs used to calculate the metric values, saved in the header
+            (see `rubin_sim.maf.metricBundles.MetricBundle.provenanceHash`).
         """
         header = {}
         header["metricName"] = metricName
@@ -201,6 +205,8 @@ class BaseSlicer(with_metaclass(SlicerRegistry, object)):
             displayDict = {"group": "Ungrouped"}
         header["displayDict"] = displayDict
         header["plotDict"] = plotDict
+        if provenance is not None:
+            header["provenance"] = provenance
         for key in versionInfo:
             header[key] = versionInfo[key]
         if hasattr(metricValues, "mask"):  # If it is a masked array
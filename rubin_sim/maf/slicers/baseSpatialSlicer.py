@@ -60,6 +60,10 @@ class BaseSpatialSlicer(BaseSlicer):
         Default rotSkyPos.
     """
 
+    # Whether setupSlicer can use a precomputed OverlapIndex (set in self.overlapIndex).
+    # Subclasses with their own setupSlicer, which never looks at it, set this to False.
+    useOverlapIndex = True
+
     def __init__(
         self,
         lonCol="fieldRA",
@@ -93,6 +97,8 @@ class BaseSpatialSlicer(BaseSlicer):
         self.radius = radius
         self.leafsize = leafsize
         self.useCamera = useCamera
+        # A precomputed OverlapIndex can be set here, to avoid querying the kdtree in setupSlicer.
+        self.overlapIndex = None
         # RA and Dec are required slicePoint info for any spatial slicer. Slicepoint RA/Dec are in radians.
         self.slicePoints["sid"] = None
         self.slicePoints["ra"] = None
@@ -104,6 +110,9 @@ class BaseSpatialSlicer(BaseSlicer):
     def setupSlicer(self, simData, maps=None):
         """Use simData[self.lonCol] and simData[self.latCol] (in radians) to set up KDTree.
 
+        If self.overlapIndex is set (see `rubin_sim.maf.slicers.OverlapIndex`) and covers
+        all of the visits in simData, the slicePoint indexes are taken from the overlap index instead.
+
         Parameters
         -----------
         simData : `numpy.ndarray`
@@ -120,24 +129,12 @@ class BaseSpatialSlicer(BaseSlicer):
                     "Should probably set useCache=False in slicer."
                 )
             self._runMaps(maps)
-        self._setRad(self.radius)
-        if self.useCamera:
-            self.data_ra = simData[self.lonCol]
-            self.data_dec = simData[self.latCol]
-            self.data_rot = simData[self.rotSkyPosColName]
-            if self.latLonDeg:
-                self.data_ra = np.radians(self.data_ra)
-                self.data_dec = np.radians(self.data_dec)
-                self.data_rot = np.radians(self.data_rot)
-            self._setupLSSTCamera()
-        if self.latLonDeg:
-            self._buildTree(
-                np.radians(simData[self.lonCol]),
-                np.radians(simData[self.latCol]),
-                self.leafsize,
-            )
-        else:
-            self._buildTree(simData[self.lonCol], simData[self.latCol], self.leafsize)
+        # Use the precomputed overlap index, if available and covering all of the visits in simData.
+        self._overlap = None
+        if self.overlapIndex is not None:
+            self._overlap = self.overlapIndex.subset(simData)
+        if self._overlap is None:
+            self._setupTree(simData)
 
         @wraps(self._sliceSimData)
         def _sliceSimData(islice):
@@ -146,22 +143,11 @@ class BaseSpatialSlicer(BaseSlicer):
 
             # Build dict for slicePoint info
             slicePoint = {"sid": islice}
-            sx, sy, sz = simsUtils._xyz_from_ra_dec(
-                self.slicePoints["ra"][islice], self.slicePoints["dec"][islice]
-            )
-            # Query against tree.
-            indices = self.opsimtree.query_ball_point((sx, sy, sz), self.rad)
-
-            if (self.useCamera) & (len(indices) > 0):
-                # Find the indices *of those indices* which fall in the camera footprint
-                camera_idx = self.camera(
-                    self.slicePoints["ra"][islice],
-                    self.slicePoints["dec"][islice],
-                    self.data_ra[indices],
-                    self.data_dec[indices],
-                    self.data_rot[indices],
-                )
-                indices = np.array(indices)[camera_idx]
+            if self._overlap is not None:
+                indptr, overlapIndices = self._overlap
+                indices = overlapIndices[indptr[islice] : indptr[islice + 1]]
+            else:
+                indices = self._queryIndices(islice)
 
             # Loop through all the slicePoint keys. If the first dimension of slicepoint[key] has
             # the same shape as the slicer, assume it is information per slicepoint.
@@ -180,6 +166,99 @@ class BaseSpatialSlicer(BaseSlicer):
 
         setattr(self, "_sliceSimData", _sliceSimData)
 
+    def _setupTree(self, simData):
+        """Build the KD-tree (and camera footprint, if used) on the pointings in simData."""
+        self._setRad(self.radius)
+        if self.useCamera:
+            self.data_ra = simData[self.lonCol]
+            self.data_dec = simData[self.latCol]
+            self.data_rot = simData[self.rotSkyPosColName]
+            if self.latLonDeg:
+                self.data_ra = np.radians(self.data_ra)
+                self.data_dec = np.radians(self.data_dec)
+                self.data_rot = np.radians(self.data_rot)
+            self._setupLSSTCamera()
+        if self.latLonDeg:
+            self._buildTree(
+                np.radians(simData[self.lonCol]),
+                np.radians(simData[self.latCol]),
+                self.leafsize,
+            )
+        else:
+            self._buildTree(simData[self.lonCol], simData[self.latCol], self.leafsize)
+
+    def _queryIndices(self, islice):
+        """Return the indexes of the pointings (set up in _setupTree) which overlap slicePoint islice."""
+        sx, sy, sz = simsUtils._xyz_from_ra_dec(
+            self.slicePoints["ra"][islice], self.slicePoints["dec"][islice]
+        )
+        # Query against tree.
+        indices = self.opsimtree.query_ball_point((sx, sy, sz), self.rad)
+
+        if (self.useCamera) & (len(indices) > 0):
+            # Find the indices *of those indices* which fall in the camera footprint
+            indices = np.array(indices)
+            onSilicon = self.camera.on_silicon(
+                self.slicePoints["ra"][islice],
+                self.slicePoints["dec"][islice],
+                self.data_ra[indices],
+                self.data_dec[indices],
+                self.data_rot[indices],
+            )
+            indices = indices[onSilicon]
+        return indices
+
+    def overlapIndices(self, simData, chunkSize=1000, nThreads=1):
+        """Find the pointings in simData which overlap each slicePoint.
+
+        The kdtree is queried for a chunk of slicePoints at a time, and the camera footprint
+        (if used) is then checked for all of the (slicePoint, pointing) pairs in the chunk at once.
+
+        Parameters
+        ----------
+        simData : `numpy.ndarray`
+            The simulated data, including the location of each pointing.
+        chunkSize : `int`, optional
+            The number of slicePoints to evaluate at once. Default 1000.
+        nThreads : `int`, optional
+            The number of threads to use for the camera footprint check. Default 1.
+
+        Returns
+        -------
+        indptr, indices : `numpy.ndarray`, `numpy.ndarray`
+            The slicePoint -> simData index map, in compressed sparse row format:
+            indices[indptr[i]:indptr[i+1]] are the indexes of simData which overlap slicePoint i.
+        """
+        self._setupTree(simData)
+        counts = np.zeros(self.nslice, int)
+        indices = []
+        for start in range(0, self.nslice, chunkSize):
+            sids = np.arange(start, min(start + chunkSize, self.nslice))
+            sx, sy, sz = simsUtils._xyz_from_ra_dec(
+                self.slicePoints["ra"][sids], self.slicePoints["dec"][sids]
+            )
+            found = self.opsimtree.query_ball_point(np.array([sx, sy, sz]).T, self.rad)
+            nfound = np.array([len(f) for f in found], int)
+            pairSids = np.repeat(sids, nfound)
+            pairIdxs = np.zeros(nfound.sum(), int)
+            if len(pairIdxs) > 0:
+                pairIdxs = np.concatenate(found).astype(int)
+            if self.useCamera and len(pairIdxs) > 0:
+                onSilicon = self.camera.on_silicon(
+                    self.slicePoints["ra"][pairSids],
+                    self.slicePoints["dec"][pairSids],
+                    self.data_ra[pairIdxs],
+                    self.data_dec[pairIdxs],
+                    self.data_rot[pairIdxs],
+                    n_threads=nThreads,
+                )
+                pairSids = pairSids[onSilicon]
+                pairIdxs = pairIdxs[onSilicon]
+            counts[sids] = np.bincount(pairSids - start, minlength=len(sids))
+            indices.append(pairIdxs)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return indptr, np.concatenate(indices)
+
     def _setupLSSTCamera(self):
         """If we want to include the camera chip gaps, etc"""
         self.camera = LsstCameraFootprint(
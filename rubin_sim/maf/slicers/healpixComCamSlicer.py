@@ -27,6 +27,8 @@ center_raft_chips = [
 class HealpixComCamSlicer(HealpixSlicer):
     """Slicer that uses the ComCam footprint to decide if observations overlap a healpixel center"""
 
+    useOverlapIndex = False
+
     def __init__(
         self,
         nside=128,
@@ -11,6 +11,8 @@ __all__ = ["HealpixSDSSSlicer"]
 class HealpixSDSSSlicer(HealpixSlicer):
     """For use with SDSS stripe 82 square images"""
 
+    useOverlapIndex = False
+
     def __init__(
         self,
         nside=128,
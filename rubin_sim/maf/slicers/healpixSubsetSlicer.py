@@ -4,7 +4,6 @@ from functools import wraps
 import numpy as np
 import healpy as hp
 import warnings
-import rubin_sim.utils as simsUtils
 
 from rubin_sim.maf.plots.spatialPlotters import (
     HealpixSkyMap,
@@ -179,21 +178,11 @@ class HealpixSubsetSlicer(HealpixSlicer):
             if islice not in self.hpid:
                 indices = []
             else:
-                sx, sy, sz = simsUtils._xyz_from_ra_dec(
-                    self.slicePoints["ra"][islice], self.slicePoints["dec"][islice]
-                )
-                # Query against tree.
-                indices = self.opsimtree.query_ball_point((sx, sy, sz), self.rad)
-                if (self.useCamera) & (len(indices) > 0):
-                    # Find the indices *of those indices* which fall in the camera footprint
-                    camera_idx = self.camera(
-                        self.slicePoints["ra"][islice],
-                        self.slicePoints["dec"][islice],
-                        self.data_ra[indices],
-                        self.data_dec[indices],
-                        self.data_rot[indices],
-                    )
-                    indices = np.array(indices)[camera_idx]
+                if self._overlap is not None:
+                    indptr, overlapIndices = self._overlap
+                    indices = overlapIndices[indptr[islice] : indptr[islice + 1]]
+                else:
+                    indices = self._queryIndices(islice)
                 # Loop through all the slicePoint keys. If the first dimension of slicepoint[key] has
                 # the same shape as the slicer, assume it is information per slicepoint.
                 # Otherwise, pass the whole slicePoint[key] information. Useful for stellar LF maps
@@ -0,0 +1,193 @@
+# A precomputed index of which visits overlap which slicePoints of a spatial slicer.
+# Finding the visits at each slicePoint (kdtree query + camera footprint) is the most
+#  expensive part of setting up a spatial slicer. The overlap index is calculated once for
+#  all of the visits in an opsim run, saved to disk, and then subset for each sql constraint.
+
+import os
+import hashlib
+import numpy as np
+
+__all__ = ["OverlapIndex"]
+
+
+class OverlapIndex(object):
+    """A visit -> slicePoint overlap index for a spatial slicer, calculated on all the visits of a run.
+
+    The index is stored as a sparse (compressed sparse row) matrix:
+    the visits at slicePoint i are visitIds[indices[indptr[i]:indptr[i+1]]].
+
+    Parameters
+    ----------
+    visitIds : `numpy.ndarray`
+        The (unique) ids of all of the visits in the index.
+    indptr : `numpy.ndarray`
+        The CSR index pointer (one entry per slicePoint + 1).
+    indices : `numpy.ndarray`
+        The CSR indexes (into visitIds) of the visits overlapping each slicePoint.
+    idCol : `str`, optional
+        The name of the visit id column in the simData. Default observationId.
+    key : `str`, optional
+        The hash identifying the pointings and slicer used to build the index.
+    """
+
+    def __init__(self, visitIds, indptr, indices, idCol="observationId", key=None):
+        self.visitIds = np.asarray(visitIds)
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.idCol = idCol
+        self.key = key
+        # Sort the visit ids, so that simData visits can be matched with a binary search.
+        self._order = np.argsort(self.visitIds)
+        self._sortedIds = self.visitIds[self._order]
+        self._segments = np.repeat(
+            np.arange(len(self.indptr) - 1), np.diff(self.indptr)
+        )
+
+    @staticmethod
+    def makeKey(slicer, pointings, idCol="observationId"):
+        """Hash the slicer configuration and pointing columns to identify an overlap index.
+
+        Parameters
+        ----------
+        slicer : `rubin_sim.maf.slicers.BaseSpatialSlicer`
+            The spatial slicer.
+        pointings : `numpy.ndarray`
+            The visit ids, lon, lat and (if the camera footprint is used) rotSkyPos columns of all visits.
+        idCol : `str`, optional
+            The name of the visit id column. Default observationId.
+
+        Returns
+        -------
+        key : `str`
+        """
+        h = hashlib.sha1()
+        config = [
+            slicer.__class__.__name__,
+            slicer.lonCol,
+            slicer.latCol,
+            slicer.latLonDeg,
+            slicer.radius,
+            slicer.useCamera,
+            slicer.cameraFootprintFile,
+            idCol,
+        ]
+        if slicer.useCamera:
+            config.append(slicer.rotSkyPosColName)
+        h.update(repr(config).encode())
+        h.update(np.ascontiguousarray(slicer.slicePoints["ra"]).tobytes())
+        h.update(np.ascontiguousarray(slicer.slicePoints["dec"]).tobytes())
+        cols = [idCol, slicer.lonCol, slicer.latCol]
+        if slicer.useCamera:
+            cols.append(slicer.rotSkyPosColName)
+        for col in cols:
+            h.update(np.ascontiguousarray(pointings[col]).tobytes())
+        return h.hexdigest()
+
+    @classmethod
+    def build(cls, slicer, pointings, idCol="observationId"):
+        """Calculate the overlap index for all pointings, using the kdtree and camera footprint of slicer.
+
+        Parameters
+        ----------
+        slicer : `rubin_sim.maf.slicers.BaseSpatialSlicer`
+            The spatial slicer.
+        pointings : `numpy.ndarray`
+            The visit ids, lon, lat and (if the camera footprint is used) rotSkyPos columns of all visits.
+        idCol : `str`, optional
+            The name of the visit id column. Default observationId.
+
+        Returns
+        -------
+        overlapIndex : `OverlapIndex`
+        """
+        indptr, indices = slicer.overlapIndices(pointings)
+        return cls(
+            pointings[idCol],
+            indptr,
+            indices.astype(np.int32),
+            idCol=idCol,
+            key=cls.makeKey(slicer, pointings, idCol=idCol),
+        )
+
+    @classmethod
+    def fromCache(cls, slicer, pointings, cacheDir, idCol="observationId"):
+        """Load the overlap index for slicer and pointings from cacheDir, or build and save it.
+
+        Parameters
+        ----------
+        slicer : `rubin_sim.maf.slicers.BaseSpatialSlicer`
+            The spatial slicer.
+        pointings : `numpy.ndarray`
+            The visit ids, lon, lat and (if the camera footprint is used) rotSkyPos columns of all visits.
+        cacheDir : `str`
+            The directory where overlap index files are kept.
+        idCol : `str`, optional
+            The name of the visit id column. Default observationId.
+
+        Returns
+        -------
+        overlapIndex : `OverlapIndex`
+        """
+        key = cls.makeKey(slicer, pointings, idCol=idCol)
+        filename = os.path.join(cacheDir, "overlap_%s.npz" % key)
+        if os.path.isfile(filename):
+            return cls.read(filename)
+        overlapIndex = cls.build(slicer, pointings, idCol=idCol)
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        overlapIndex.write(filename)
+        return overlapIndex
+
+    def write(self, filename):
+        """Save the overlap index to an npz file."""
+        np.savez(
+            filename,
+            visitIds=self.visitIds,
+            indptr=self.indptr,
+            indices=self.indices,
+            idCol=self.idCol,
+            key=str(self.key),
+        )
+
+    @classmethod
+    def read(cls, filename):
+        """Read an overlap index from an npz file."""
+        with np.load(filename) as data:
+            return cls(
+                data["visitIds"],
+                data["indptr"],
+                data["indices"],
+                idCol=str(data["idCol"]),
+                key=str(data["key"]),
+            )
+
+    def subset(self, simData):
+        """Subset the overlap index to the visits in simData.
+
+        Parameters
+        ----------
+        simData : `numpy.ndarray`
+            The simulated data (for example, the visits matching a sql constraint).
+            Must contain the idCol column.
+
+        Returns
+        -------
+        indptr, indices : `numpy.ndarray`, `numpy.ndarray` or None
+            The slicePoint -> simData index map, in compressed sparse row format.
+            None if simData does not contain idCol or contains visits which are not in the index.
+        """
+        if self.idCol not in simData.dtype.names:
+            return None
+        ids = simData[self.idCol]
+        loc = np.searchsorted(self._sortedIds, ids)
+        loc = np.clip(loc, 0, len(self._sortedIds) - 1)
+        if len(ids) == 0 or not np.all(self._sortedIds[loc] == ids):
+            return None
+        # Map the position of each visit in the full index to its position in simData (or -1).
+        position = np.full(len(self.visitIds), -1, int)
+        position[self._order[loc]] = np.arange(len(ids))
+        subIndices = position[self.indices]
+        keep = subIndices >= 0
+        counts = np.bincount(self._segments[keep], minlength=len(self.indptr) - 1)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return indptr, subIndices[keep]
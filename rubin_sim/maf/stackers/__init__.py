@@ -11,3 +11,4 @@ from .m5OptimalStacker import *
 from .nFollowStacker import *
 from .snStacker import *
 from .labelStackers import *
+from .stackerCache import *
@@ -2,6 +2,7 @@ import inspect
 import warnings
 import numpy as np
 from six import with_metaclass
+from rubin_sim.maf.utils import bindInitArgs
 
 __all__ = ["StackerRegistry", "BaseStacker"]
 
@@ -37,6 +38,12 @@ class StackerRegistry(type):
         for col in colsAdded:
             cls.sourceDict[col] = cls
 
+    def __call__(cls, *args, **kwargs):
+        # Record the constructor arguments, which identify the object in provenance hashes.
+        obj = super(StackerRegistry, cls).__call__(*args, **kwargs)
+        obj._initArgs = bindInitArgs(cls, args, kwargs)
+        return obj
+
     def getClass(cls, stackername):
         return cls.registry[stackername]
 
@@ -0,0 +1,262 @@
+# Utilities for running a set of stackers efficiently:
+#  orderStackers sorts stackers so that stackers providing columns run before the stackers which use them,
+#  and StackerCache memoizes the columns added by each stacker, so that identical stackers running on
+#  the same visits (e.g. in different compatible groups or constraints of a MetricBundleGroup)
+#  are only calculated once.
+
+import hashlib
+import warnings
+from collections import OrderedDict
+import numpy as np
+from rubin_sim.utils import updateHash
+from .ditherStackers import BaseDitherStacker
+
+__all__ = ["orderStackers", "StackerCache"]
+
+
+def orderStackers(stackers):
+    """Order stackers so that each stacker runs after the stackers which add the columns it requires.
+
+    The dependency graph is built from the colsReq and colsAdded of each stacker, and then
+    sorted topologically. Stackers which do not depend on each other keep their input order,
+    except that dither stackers are placed first (as they generally change the pointing columns).
+
+    Parameters
+    ----------
+    stackers : `list` [`rubin_sim.maf.stackers.BaseStacker`]
+        The stackers to order.
+
+    Returns
+    -------
+    stackers : `list` [`rubin_sim.maf.stackers.BaseStacker`]
+        The stackers, in the order in which they should be run.
+    """
+    stackers = [s for s in stackers if isinstance(s, BaseDitherStacker)] + [
+        s for s in stackers if not isinstance(s, BaseDitherStacker)
+    ]
+    # Find which stackers provide the columns required by each stacker.
+    requires = []
+    for s in stackers:
+        colsReq = set(getattr(s, "colsReq", []))
+        requires.append(
+            set(
+                j
+                for j, other in enumerate(stackers)
+                if other is not s and len(colsReq.intersection(other.colsAdded)) > 0
+            )
+        )
+    ordered = []
+    done = set()
+    while len(ordered) < len(stackers):
+        ready = [
+            i
+            for i in range(len(stackers))
+            if i not in done and requires[i].issubset(done)
+        ]
+        if len(ready) == 0:
+            warnings.warn(
+                "Found a cycle in the stacker dependencies; running remaining stackers in input order."
+            )
+            ready = [i for i in range(len(stackers)) if i not in done]
+        # Take the first ready stacker, to keep the input order where possible.
+        ordered.append(ready[0])
+        done.add(ready[0])
+    return [stackers[i] for i in ordered]
+
+
+class StackerCache(object):
+    """Memoize the columns added by stackers.
+
+    When the data come from an identified database (dataKey) and carry the visit ids (idCol),
+    the cache key is the stacker (its class and init parameters) plus the database, and the
+    stacker columns are kept per visit. Visits which were already calculated (for example, for
+    another constraint) are then sliced out of the cache by their ids, and the stacker only runs
+    on the new visits. The values of dither stackers depend on the whole set of visits (e.g. the
+    offsets per night), so they are only reused for exactly the same visits.
+
+    Without a dataKey, the cache key also includes a hash of the values of the stacker's
+    required columns, so the columns are only reused for identical input data.
+
+    Parameters
+    ----------
+    maxSize : `int`, optional
+        The maximum number of stacker results to keep. The least recently used are dropped first.
+        A maxSize of 0 turns the cache off (the stackers are always run). Default 20.
+    """
+
+    def __init__(self, maxSize=20):
+        self.maxSize = maxSize
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        """Empty the cache."""
+        self._cache.clear()
+
+    def key(self, stacker, simData, dataKey=None):
+        """Return the cache key for running stacker on simData.
+
+        Parameters
+        ----------
+        stacker : `rubin_sim.maf.stackers.BaseStacker`
+            The stacker.
+        simData : `numpy.ndarray`
+            The data the stacker will run on.
+        dataKey : `str`, optional
+            Identifies the database the visits of simData come from. Default None uses
+            a hash of the stacker's required columns instead.
+
+        Returns
+        -------
+        key : `str`
+        """
+        h = hashlib.sha1()
+        # The stacker class and its init parameters.
+        updateHash(h, stacker)
+        h.update(repr(list(stacker.colsAdded)).encode())
+        if dataKey is not None:
+            h.update(dataKey.encode())
+            return h.hexdigest()
+        h.update(str(len(simData)).encode())
+        for col in getattr(stacker, "colsReq", []):
+            if col in simData.dtype.names:
+                h.update(col.encode())
+                updateHash(h, simData[col])
+        return h.hexdigest()
+
+    def dataKeys(self, stackers, dataKey):
+        """Return the dataKey to use for each of a list of stackers, run in order on the same data.
+
+        The columns added by the earlier stackers are part of the input data of a stacker, so
+        their cache keys are added to its dataKey. Stackers using the columns of a dither stacker
+        (which are not kept per visit) get a dataKey of None, so their input columns are hashed.
+
+        Parameters
+        ----------
+        stackers : `list` [`rubin_sim.maf.stackers.BaseStacker`]
+            The stackers, in the order in which they are run (see `orderStackers`).
+        dataKey : `str` or None
+            Identifies the database the visits come from.
+
+        Returns
+        -------
+        dataKeys : `list` [`str` or None]
+        """
+        dataKeys = []
+        for i, stacker in enumerate(stackers):
+            key = dataKey
+            if dataKey is not None:
+                h = hashlib.sha1(dataKey.encode())
+                colsReq = set(getattr(stacker, "colsReq", []))
+                for other, otherKey in zip(stackers[:i], dataKeys):
+                    if len(colsReq.intersection(other.colsAdded)) == 0:
+                        continue
+                    if otherKey is None or isinstance(other, BaseDitherStacker):
+                        key = None
+                        break
+                    h.update(self.key(other, None, dataKey=otherKey).encode())
+                else:
+                    key = h.hexdigest()
+            dataKeys.append(key)
+        return dataKeys
+
+    def run(self, stacker, simData, dataKey=None, idCol="observationId"):
+        """Run stacker on simData, using the cached columns if available.
+
+        Parameters
+        ----------
+        stacker : `rubin_sim.maf.stackers.BaseStacker`
+            The stacker.
+        simData : `numpy.ndarray`
+            The data the stacker will run on.
+        dataKey : `str`, optional
+            Identifies the database the visits of simData come from (for example, its
+            filename, table and modification time). Default None.
+        idCol : `str`, optional
+            The visit id column, used with dataKey. Default observationId.
+
+        Returns
+        -------
+        simData : `numpy.ndarray`
+            The simData, including the columns added by the stacker.
+        """
+        if self.maxSize <= 0 or len(simData) == 0:
+            self.misses += 1
+            return stacker.run(simData, override=True)
+        if dataKey is None or idCol not in simData.dtype.names:
+            return self._runSameVisits(stacker, simData, self.key(stacker, simData))
+        key = self.key(stacker, simData, dataKey=dataKey)
+        if isinstance(stacker, BaseDitherStacker):
+            return self._runSameVisits(stacker, simData, key, simData[idCol])
+        return self._runPerVisit(stacker, simData, key, simData[idCol])
+
+    def _store(self, key, entry):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.maxSize:
+            self._cache.popitem(last=False)
+
+    def _fill(self, stacker, simData, columns):
+        """Add the stacker columns to simData, with the values in columns."""
+        simData, cols_present = stacker._addStackerCols(simData)
+        for col, values in columns.items():
+            simData[col] = values
+        return simData
+
+    def _runSameVisits(self, stacker, simData, key, ids=None):
+        """Reuse the cached columns only if they were calculated for the same visits (ids)."""
+        entry = self._cache.get(key)
+        if entry is not None and (ids is None or np.array_equal(entry["ids"], ids)):
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._fill(stacker, simData, entry["cols"])
+        self.misses += 1
+        simData = stacker.run(simData, override=True)
+        cols = OrderedDict((col, np.array(simData[col])) for col in stacker.colsAdded)
+        self._store(key, {"ids": None if ids is None else np.array(ids), "cols": cols})
+        return simData
+
+    def _runPerVisit(self, stacker, simData, key, ids):
+        """Slice the cached columns by visit id, and run the stacker only on the visits not in the cache."""
+        entry = self._cache.get(key)
+        found = np.zeros(len(ids), dtype=bool)
+        if entry is not None:
+            pos = np.searchsorted(entry["ids"], ids)
+            inRange = pos < len(entry["ids"])
+            found[inRange] = entry["ids"][pos[inRange]] == ids[inRange]
+        if found.all():
+            self.hits += 1
+            self._cache.move_to_end(key)
+            cols = OrderedDict((col, v[pos]) for col, v in entry["cols"].items())
+            return self._fill(stacker, simData, cols)
+        self.misses += 1
+        missing = ~found
+        newData = stacker.run(simData[missing], override=True)
+        if len(newData) != np.sum(missing):
+            # The stacker changes the rows of simData, so its columns can not be kept per visit.
+            return stacker.run(simData, override=True)
+        cols = OrderedDict()
+        for col in stacker.colsAdded:
+            values = np.empty(len(simData), dtype=newData[col].dtype)
+            values[missing] = newData[col]
+            if entry is not None:
+                values[found] = entry["cols"][col][pos[found]]
+            cols[col] = values
+        # Add the new visits to the cache, keeping the ids sorted.
+        if entry is None:
+            allIds = ids[missing]
+            allCols = {col: cols[col][missing] for col in cols}
+        else:
+            allIds = np.concatenate([entry["ids"], ids[missing]])
+            allCols = {
+                col: np.concatenate([entry["cols"][col], cols[col][missing]])
+                for col in cols
+            }
+        allIds, order = np.unique(allIds, return_index=True)
+        allCols = OrderedDict((col, allCols[col][order]) for col in cols)
+        self._store(key, {"ids": allIds, "cols": allCols})
+        return self._fill(stacker, simData, cols)
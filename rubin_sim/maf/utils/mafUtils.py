@@ -1,3 +1,4 @@
+import inspect
 import numpy as np
 import healpy as hp
 import warnings
@@ -14,6 +15,7 @@ __all__ = [
     "radec2pix",
     "collapse_night",
     "load_inst_zeropoints",
+    "bindInitArgs",
 ]
 
 
@@ -204,3 +206,35 @@ def radec2pix(nside, ra, dec):
     lat = np.pi / 2.0 - dec
     hpid = hp.ang2pix(nside, lat, ra)
     return hpid
+
+
+def bindInitArgs(cls, args, kwargs):
+    """
+    Return the arguments of a call to the constructor of cls, keyed by parameter name.
+
+    Default values are filled in for the parameters which were not passed, so equivalent calls
+    give the same result. Used by the metric and stacker metaclasses to record the constructor
+    arguments of each object (as _initArgs), for `rubin_sim.utils.updateHash`.
+
+    Parameters
+    ----------
+    cls : class
+        The class being instantiated.
+    args : tuple
+        The positional arguments of the call.
+    kwargs : dict
+        The keyword arguments of the call.
+
+    Returns
+    -------
+    dict
+    """
+    try:
+        bound = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+    except (TypeError, ValueError):
+        return {"args": args, "kwargs": kwargs}
+    bound.apply_defaults()
+    initArgs = dict(bound.arguments)
+    # Drop self
+    initArgs.pop(next(iter(initArgs)))
+    return initArgs
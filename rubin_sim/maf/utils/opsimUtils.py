@@ -3,17 +3,226 @@
 import numpy as np
 import pandas as pd
 import os
+import json
+import shutil
 import sqlite3
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.engine import make_url
 
 __all__ = [
     "getSimData",
+    "getColumnNames",
+    "OpsimColumnCache",
     "scaleBenchmarks",
     "calcCoaddedDepth",
 ]
 
 
+def _guessTableName(db_file):
+    """Guess the name of the table of visits in an opsim sqlite file.
+
+    Parameters
+    ----------
+    db_file : `str`
+        Filename of the sqlite3 file.
+
+    Returns
+    -------
+    tableName : `str`
+        "observations", "SummaryAllProps" or "summary".
+
+    Raises
+    ------
+    ValueError
+        If none of these tables is in the file.
+    """
+    url = make_url("sqlite:///" + db_file)
+    eng = create_engine(url)
+    inspector = inspect(eng)
+    tables = [
+        inspector.get_table_names(schema=schema)
+        for schema in inspector.get_schema_names()
+    ]
+    if "observations" in tables[0]:
+        tableName = "observations"
+    elif "SummaryAllProps" in tables[0]:
+        tableName = "SummaryAllProps"
+    elif "summary" in tables[0]:
+        tableName = "summary"
+    else:
+        raise ValueError(
+            "Could not guess tableName, set with tableName or full_sql_query kwargs"
+        )
+    return tableName
+
+
+def getColumnNames(db_file, tableName=None):
+    """Return the names of the columns of the table of visits in an opsim sqlite file.
+
+    Parameters
+    ----------
+    db_file : `str`
+        Filename of the sqlite3 file.
+    tableName : `str`, optional
+        Name of the table. Default None will try "observations", "SummaryAllProps" and "summary".
+
+    Returns
+    -------
+    columns : `list` [`str`]
+    """
+    if tableName is None:
+        tableName = _guessTableName(db_file)
+    con = sqlite3.connect(db_file)
+    columns = [row[1] for row in con.execute("PRAGMA table_info(%s);" % tableName)]
+    con.close()
+    return columns
+
+
+class OpsimColumnCache(object):
+    """A columnar, memory-mapped cache of an opsim sqlite database.
+
+    Each column of the table of visits is read from the database once (the first time it is needed)
+    and saved as a numpy .npy file in a cache directory next to the database. Later queries
+    memory-map these files, so repeated queries for different sql constraints do not scan the
+    whole table and convert it through pandas again.
+    The sql constraint itself is still evaluated by sqlite (which then only returns the matching row ids),
+    so constraints have exactly the same meaning as with a direct query.
+    NULL values in text columns are returned as NaN.
+
+    An OpsimColumnCache can be passed anywhere getSimData accepts a database
+    (for example, as the dbCon of a MetricBundleGroup).
+
+    Parameters
+    ----------
+    dbFile : `str`
+        Filename of the opsim sqlite3 file.
+    tableName : `str`, optional
+        Name of the table to cache. Default None will try "observations" and "SummaryAllProps".
+    cacheDir : `str`, optional
+        Directory for the cached columns. Default None uses dbFile + ".columns".
+        The columns of each table are saved in a subdirectory named after the table,
+        which is cleared if the database file changes.
+    """
+
+    def __init__(self, dbFile, tableName=None, cacheDir=None):
+        if not os.path.isfile(dbFile):
+            raise FileNotFoundError("No file %s" % dbFile)
+        self.dbFile = dbFile
+        if tableName is None:
+            tableName = _guessTableName(dbFile)
+        self.tableName = tableName
+        if cacheDir is None:
+            cacheDir = dbFile + ".columns"
+        self.cacheDir = os.path.join(cacheDir, tableName)
+        self._columns = {}
+        # Positions of the NULL values of the text columns which have any.
+        self._nulls = {}
+        self._checkCache()
+        self.rowids = self._column("rowid")
+
+    def __repr__(self):
+        return "OpsimColumnCache(%s)" % (self.dbFile)
+
+    def _checkCache(self):
+        """Clear the cache directory if it was made from a different version of the database."""
+        stat = os.stat(self.dbFile)
+        manifest = {
+            "dbFile": os.path.abspath(self.dbFile),
+            "tableName": self.tableName,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+        manifestFile = os.path.join(self.cacheDir, "manifest.json")
+        if os.path.isfile(manifestFile):
+            with open(manifestFile, "r") as f:
+                if json.load(f) == manifest:
+                    return
+            shutil.rmtree(self.cacheDir)
+        os.makedirs(self.cacheDir, exist_ok=True)
+        with open(manifestFile, "w") as f:
+            json.dump(manifest, f)
+
+    def _column(self, colname):
+        """Return the (memory-mapped) values of colname for all visits, in rowid order."""
+        if colname not in self._columns:
+            filename = os.path.join(self.cacheDir, "%s.npy" % colname)
+            if not os.path.isfile(filename):
+                con = sqlite3.connect(self.dbFile)
+                query = "SELECT %s FROM %s ORDER BY rowid;" % (colname, self.tableName)
+                values = pd.read_sql(query, con).iloc[:, 0].values
+                con.close()
+                if values.dtype == object:
+                    nulls = pd.isna(values)
+                    values = values.astype(str)
+                    if np.any(nulls):
+                        self._save(self._nullsFile(colname), nulls)
+                self._save(filename, values)
+            self._columns[colname] = np.load(filename, mmap_mode="r")
+            if os.path.isfile(self._nullsFile(colname)):
+                self._nulls[colname] = np.load(self._nullsFile(colname), mmap_mode="r")
+        return self._columns[colname]
+
+    def _nullsFile(self, colname):
+        return os.path.join(self.cacheDir, "%s.nulls.npy" % colname)
+
+    def _save(self, filename, values):
+        # Write to a temporary file first, so other processes never see a partial column.
+        tmpfile = filename + ".%d.tmp" % os.getpid()
+        with open(tmpfile, "wb") as f:
+            np.save(f, values)
+        os.replace(tmpfile, filename)
+
+    def _values(self, colname, rows):
+        """Return the values of colname at rows, with NaN for NULL values."""
+        values = self._column(colname)[rows]
+        if colname in self._nulls:
+            values = values.astype(object)
+            values[self._nulls[colname][rows]] = np.nan
+        return values
+
+    def rows(self, sqlconstraint):
+        """Return the positions (in the cached columns) of the visits matching sqlconstraint.
+
+        Parameters
+        ----------
+        sqlconstraint : `str` or None
+            SQL constraint to apply to query for observations.
+
+        Returns
+        -------
+        rows : `np.ndarray` or `slice`
+        """
+        if sqlconstraint is None or len(sqlconstraint) == 0:
+            return slice(None)
+        con = sqlite3.connect(self.dbFile)
+        query = "SELECT rowid FROM %s WHERE %s ORDER BY rowid;" % (
+            self.tableName,
+            sqlconstraint,
+        )
+        rowids = pd.read_sql(query, con).iloc[:, 0].values
+        con.close()
+        return np.searchsorted(self.rowids, rowids)
+
+    def query(self, sqlconstraint, dbcols):
+        """Return the dbcols columns for the visits matching sqlconstraint.
+
+        Parameters
+        ----------
+        sqlconstraint : `str` or None
+            SQL constraint to apply to query for observations.
+        dbcols : `list` [`str`]
+            Columns required from the database.
+
+        Returns
+        -------
+        simData : `np.recarray`
+        """
+        rows = self.rows(sqlconstraint)
+        return np.rec.fromarrays(
+            [self._values(col, rows) for col in dbcols], names=list(dbcols)
+        )
+
+
 def getSimData(
     db_con,
     sqlconstraint,
@@ -56,28 +265,26 @@ def getSimData(
 
     # Check if table is "observations" or "SummaryAllProps"
     if (tableName is None) & (full_sql_query is None) & (type(db_con) == str):
-        url = make_url("sqlite:///" + db_con)
-        eng = create_engine(url)
-        inspector = inspect(eng)
-        tables = [
-            inspector.get_table_names(schema=schema)
-            for schema in inspector.get_schema_names()
-        ]
-        if "observations" in tables[0]:
-            tableName = "observations"
-        elif "SummaryAllProps" in tables[0]:
-            tableName = "SummaryAllProps"
-        elif "summary" in tables[0]:
-            tableName = "summary"
-        else:
-            ValueError(
-                "Could not guess tableName, set with tableName or full_sql_query kwargs"
-            )
+        tableName = _guessTableName(db_con)
     elif (tableName is None) & (full_sql_query is None):
         # If someone passes in a connection object with an old tableName things will fail
         # that's probably fine, keep people from getting fancy with old sims
         tableName = "observations"
 
+    # Columnar caches evaluate the constraint themselves.
+    if isinstance(db_con, OpsimColumnCache):
+        if full_sql_query is not None:
+            raise ValueError("full_sql_query is not supported with an OpsimColumnCache")
+        simData = db_con.query(sqlconstraint, dbcols)
+        if len(simData) == 0:
+            raise UserWarning(
+                "No data found matching sqlconstraint %s" % (sqlconstraint)
+            )
+        if stackers is not None:
+            for s in stackers:
+                simData = s.run(simData)
+        return simData
+
     if type(db_con) == str:
         con = sqlite3.connect(db_con)
     else:
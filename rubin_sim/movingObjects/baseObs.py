@@ -376,22 +376,18 @@ class BaseObs(object):
         if not hasattr(self, "camera"):
             self._setupCamera()
 
+        obsRA = obsData[self.obsRA]
+        obsDec = obsData[self.obsDec]
+        obsRotSkyPos = obsData[self.obsRotSkyPos]
         if not self.obsDegrees:
-            idx = self.camera(
-                ephems["ra"],
-                ephems["dec"],
-                np.degrees(obsData[self.obsRA]),
-                np.degrees(obsData[self.obsDec]),
-                np.degrees(obsData[self.obsRotSkyPos]),
-            )
-        else:
-            idx = self.camera(
-                ephems["ra"],
-                ephems["dec"],
-                obsData[self.obsRA],
-                obsData[self.obsDec],
-                obsData[self.obsRotSkyPos],
-            )
+            obsRA = np.degrees(obsRA)
+            obsDec = np.degrees(obsDec)
+            obsRotSkyPos = np.degrees(obsRotSkyPos)
+        # Check all of the (ephemeris, pointing) pairs at once.
+        onSilicon = self.camera.on_silicon(
+            ephems["ra"], ephems["dec"], obsRA, obsDec, obsRotSkyPos
+        )
+        idx = np.where(onSilicon)[0]
         return idx
 
     def ssoInFov(self, ephems, obsData):
@@ -1 +1,2 @@
 from .sim_runner import *
+from .sim_farm import *
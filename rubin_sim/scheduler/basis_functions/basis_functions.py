@@ -1,7 +1,7 @@
 import numpy as np
 from rubin_sim.scheduler import features
 from rubin_sim.scheduler import utils
-from rubin_sim.scheduler.utils import int_rounded
+from rubin_sim.scheduler.utils import int_rounded, rounded
 import healpy as hp
 import matplotlib.pylab as plt
 from rubin_sim.skybrightness_pre import M5percentiles
@@ -93,6 +93,31 @@ class Base_basis_function(object):
         if self.update_on_newobs:
             self.recalc = True
 
+    def add_observations_array(self, observations_array, indx_csr):
+        """
+        Parameters
+        ----------
+        observations_array : `np.array`
+            Many observations, in the order they were taken
+        indx_csr : `tuple` of `np.array`
+            The indices of the healpix map that the observations overlap with, as (indices, indptr),
+            so observation i overlaps indices[indptr[i]:indptr[i+1]]
+        """
+        if type(self).add_observation is not Base_basis_function.add_observation:
+            # Sub-classes with their own add_observation take the observations one at a time
+            indices, indptr = indx_csr
+            for i, observation in enumerate(observations_array):
+                self.add_observation(
+                    observation, indx=indices[indptr[i] : indptr[i + 1]]
+                )
+            return
+        for feature in self.survey_features:
+            self.survey_features[feature].add_observations_array(
+                observations_array, indx_csr
+            )
+        if self.update_on_newobs and np.size(observations_array) > 0:
+            self.recalc = True
+
     def check_feasibility(self, conditions):
         """If there is logic to decide if something is feasible (e.g., only if
         moon is down), it can be calculated here.
@@ -426,8 +451,8 @@ class N_obs_high_am_basis_function(Base_basis_function):
                 )
                 > int_rounded(self.season)
             )
-            & (int_rounded(conditions.airmass) > int_rounded(np.min(self.am_limits)))
-            & (int_rounded(conditions.airmass) < int_rounded(np.max(self.am_limits)))
+            & (conditions.rounded("airmass") > rounded(np.min(self.am_limits)))
+            & (conditions.rounded("airmass") < rounded(np.max(self.am_limits)))
         )
         result[behind_pix] = 1
         result[self.out_footprint] = self.out_of_bounds_val
@@ -792,8 +817,8 @@ class Near_sun_twilight_basis_function(Base_basis_function):
         result = self.result.copy()
         good_pix = np.where(
             (conditions.airmass >= 1.0)
-            & (int_rounded(conditions.airmass) < self.max_airmass)
-            & (int_rounded(np.abs(conditions.az_to_sun)) < int_rounded(np.pi / 2.0))
+            & (conditions.rounded("airmass") < self.max_airmass.value)
+            & (rounded(np.abs(conditions.az_to_sun)) < rounded(np.pi / 2.0))
         )
         result[good_pix] = conditions.airmass[good_pix] / self.max_airmass.initial
         return result
@@ -1174,6 +1199,7 @@ class Slewtime_basis_function(Base_basis_function):
         self.nside = nside
         self.filtername = filtername
         self.result = np.zeros(hp.nside2npix(nside), dtype=float)
+        self.update_on_newobs = False
 
     def add_observation(self, observation, indx=None):
         # No tracking of observations in this basis function. Purely based on conditions.
@@ -3,7 +3,7 @@ import healpy as hp
 from rubin_sim.utils import _hpid2RaDec, Site, _angularSeparation, _xyz_from_ra_dec
 import matplotlib.pylab as plt
 from rubin_sim.scheduler.basis_functions import Base_basis_function
-from rubin_sim.scheduler.utils import hp_in_lsst_fov, int_rounded
+from rubin_sim.scheduler.utils import hp_in_lsst_fov, int_rounded, rounded
 
 
 __all__ = [
@@ -102,8 +102,8 @@ class Solar_elongation_mask_basis_function(Base_basis_function):
     def _calc_value(self, conditions, indx=None):
         result = self.result.copy()
         in_range = np.where(
-            (int_rounded(conditions.solar_elongation) >= int_rounded(self.min_elong))
-            & (int_rounded(conditions.solar_elongation) <= int_rounded(self.max_elong))
+            (conditions.rounded("solar_elongation") >= rounded(self.min_elong))
+            & (conditions.rounded("solar_elongation") <= rounded(self.max_elong))
         )[0]
         result[in_range] = 1
         return result
@@ -133,8 +133,8 @@ class Zenith_mask_basis_function(Base_basis_function):
 
         result = self.result.copy()
         alt_limit = np.where(
-            (int_rounded(conditions.alt) > int_rounded(self.min_alt))
-            & (int_rounded(conditions.alt) < int_rounded(self.max_alt))
+            (conditions.rounded("alt") > rounded(self.min_alt))
+            & (conditions.rounded("alt") < rounded(self.max_alt))
         )[0]
         result[alt_limit] = 1
         return result
@@ -230,14 +230,14 @@ class Zenith_shadow_mask_basis_function(Base_basis_function):
 
         result = self.result.copy()
         alt_limit = np.where(
-            (int_rounded(conditions.alt) > int_rounded(self.min_alt))
-            & (int_rounded(conditions.alt) < int_rounded(self.max_alt))
+            (conditions.rounded("alt") > rounded(self.min_alt))
+            & (conditions.rounded("alt") < rounded(self.max_alt))
         )[0]
         result[alt_limit] = 1
         to_mask = np.where(
             (
-                int_rounded(conditions.HA)
-                > int_rounded(2.0 * np.pi - self.shadow_minutes - self.zenith_radius)
+                conditions.rounded("HA")
+                > rounded(2.0 * np.pi - self.shadow_minutes - self.zenith_radius)
             )
             & (self.decband == 1)
         )
@@ -266,11 +266,7 @@ class Moon_avoidance_basis_function(Base_basis_function):
     def _calc_value(self, conditions, indx=None):
         result = self.result.copy()
 
-        angular_distance = _angularSeparation(
-            conditions.az, conditions.alt, conditions.moonAz, conditions.moonAlt
-        )
-
-        result[int_rounded(angular_distance) < self.moon_distance] = np.nan
+        result[conditions.rounded("moon_distance") < self.moon_distance.value] = np.nan
 
         return result
 
@@ -384,8 +380,8 @@ class Mask_azimuth_basis_function(Base_basis_function):
 
     def _calc_value(self, conditions, indx=None):
         to_mask = np.where(
-            (int_rounded(conditions.az) > self.az_min)
-            & (int_rounded(conditions.az) < self.az_max)
+            (conditions.rounded("az") > self.az_min.value)
+            & (conditions.rounded("az") < self.az_max.value)
         )[0]
         result = self.result.copy()
         result[to_mask] = self.out_of_bounds_val
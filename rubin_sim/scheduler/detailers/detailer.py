@@ -51,6 +51,29 @@ class Base_detailer(object):
         for feature in self.survey_features:
             self.survey_features[feature].add_observation(observation, indx=indx)
 
+    def add_observations_array(self, observations_array, indx_csr):
+        """
+        Parameters
+        ----------
+        observations_array : `np.array`
+            Many observations, in the order they were taken
+        indx_csr : `tuple` of `np.array`
+            The indices of the healpix map that the observations overlap with, as (indices, indptr),
+            so observation i overlaps indices[indptr[i]:indptr[i+1]]
+        """
+        if type(self).add_observation is not Base_detailer.add_observation:
+            # Sub-classes with their own add_observation take the observations one at a time
+            indices, indptr = indx_csr
+            for i, observation in enumerate(observations_array):
+                self.add_observation(
+                    observation, indx=indices[indptr[i] : indptr[i + 1]]
+                )
+            return
+        for feature in self.survey_features:
+            self.survey_features[feature].add_observations_array(
+                observations_array, indx_csr
+            )
+
     def __call__(self, observation_list, conditions):
         """
         Parameters
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import numpy as np
 from rubin_sim.utils import (
     _approx_RaDec2AltAz,
@@ -13,6 +14,7 @@ from rubin_sim.scheduler.utils import (
     match_hp_resolution,
     season_calc,
     smallest_signed_angle,
+    rounded,
 )
 
 __all__ = ["Conditions"]
@@ -179,6 +181,24 @@ class Conditions(object):
             Healpix map of the azimuthal distance to the anit-sun for each healpixel (radians)
         solar_elongation : np.array
             Healpix map of the solar elongation (angular distance to the sun) for each healpixel (radians)
+        zenith_distance : np.array
+            Healpix map of the zenith distance of each healpixel (radians). Read-only.
+        moon_distance : np.array
+            Healpix map of the angular distance to the moon for each healpixel (radians), computed
+            from the alt,az positions. Read-only.
+
+        The read-only maps, and the distance maps returned by `distance_from_pixel`, are shared
+        by all of the surveys and basis functions using the conditions object, so they should
+        not be modified in place.
+
+        Attributes (lazy)
+        -----------------
+        Any attribute can be given a provider with `set_lazy`, rather than a value. The provider
+        is called the first time the attribute is accessed (if it is accessed at all) and the
+        result is kept until the attribute is set, or given a new provider.
+        lazy_stats : dict
+            Keyed by attribute name, with the number of times a provider was set and the number
+            of times it was actually evaluated.
 
         Attributes (set by the scheduler)
         -------------------------------
@@ -279,6 +299,68 @@ class Conditions(object):
         self.season_length = 365.25
         self.season_floor = True
 
+        self._zenith_distance = None
+        self._moon_distance = None
+        self._moon_distance_key = None
+        # Distances from a healpixel to all healpixels do not depend on time,
+        # so keep a small least recently used cache of them.
+        self._pixel_distances = OrderedDict()
+        self.pixel_distance_cache_size = 16
+        # Integer rounded copies of maps, keyed by (attribute name, scale)
+        self._rounded = {}
+        # Providers of attributes to compute on first access
+        self._lazy = {}
+        self.lazy_stats = {}
+
+    def set_lazy(self, name, provider):
+        """Set an attribute to be computed the first time it is accessed.
+
+        Parameters
+        ----------
+        name : str
+            The attribute name, e.g. 'skybrightness' or 'slewtime'.
+        provider : callable
+            Called with no arguments to compute the value of the attribute. Values which
+            depend on the time should be computed for the mjd at which the provider was set.
+        """
+        self._lazy[name] = provider
+        # Drop the old value of plain attributes, so accessing them falls back to __getattr__
+        self.__dict__.pop(name, None)
+        if name in ("airmass", "skybrightness", "FWHMeff"):
+            self._M5Depth = None
+        if name not in self.lazy_stats:
+            self.lazy_stats[name] = [0, 0]
+        self.lazy_stats[name][0] += 1
+
+    def _evaluate_lazy(self, name):
+        provider = self._lazy.pop(name)
+        self.lazy_stats[name][1] += 1
+        setattr(self, name, provider())
+
+    def evaluate_lazy(self, names=None):
+        """Compute any attributes which are waiting to be computed on first access.
+
+        Parameters
+        ----------
+        names : list of str (None)
+            The attributes to compute. Default of None computes all of them.
+        """
+        if names is None:
+            names = list(self._lazy.keys())
+        for name in names:
+            if name in self._lazy:
+                self._evaluate_lazy(name)
+
+    def __getattr__(self, name):
+        # Only called when normal attribute lookup fails, e.g. for lazy attributes not yet computed
+        lazy = self.__dict__.get("_lazy")
+        if lazy is not None and name in lazy:
+            self._evaluate_lazy(name)
+            return getattr(self, name)
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (type(self).__name__, name)
+        )
+
     @property
     def lmst(self):
         return self._lmst
@@ -308,6 +390,8 @@ class Conditions(object):
 
     @property
     def slewtime(self):
+        if "slewtime" in self._lazy:
+            self._evaluate_lazy("slewtime")
         return self._slewtime
 
     @slewtime.setter
@@ -320,6 +404,8 @@ class Conditions(object):
 
     @property
     def airmass(self):
+        if "airmass" in self._lazy:
+            self._evaluate_lazy("airmass")
         return self._airmass
 
     @airmass.setter
@@ -374,9 +460,13 @@ class Conditions(object):
         self._az_to_antisun = None
         self._season = None
         self._solar_elongation = None
+        self._zenith_distance = None
+        self._moon_distance = None
 
     @property
     def skybrightness(self):
+        if "skybrightness" in self._lazy:
+            self._evaluate_lazy("skybrightness")
         return self._skybrightness
 
     @skybrightness.setter
@@ -391,6 +481,8 @@ class Conditions(object):
 
     @property
     def FWHMeff(self):
+        if "FWHMeff" in self._lazy:
+            self._evaluate_lazy("FWHMeff")
         return self._FWHMeff
 
     @FWHMeff.setter
@@ -406,16 +498,20 @@ class Conditions(object):
         return self._M5Depth
 
     def calc_M5Depth(self):
+        # Compute any lazy inputs first, as setting them resets the depths
+        skybrightness = self.skybrightness
+        FWHMeff = self.FWHMeff
+        airmass = self.airmass
         self._M5Depth = {}
-        for filtername in self._skybrightness:
-            good = ~np.isnan(self._skybrightness[filtername])
+        for filtername in skybrightness:
+            good = ~np.isnan(skybrightness[filtername])
             self._M5Depth[filtername] = self.nan_map.copy()
             self._M5Depth[filtername][good] = m5_flat_sed(
                 filtername,
-                self._skybrightness[filtername][good],
-                self._FWHMeff[filtername][good],
+                skybrightness[filtername][good],
+                FWHMeff[filtername][good],
                 self.exptime,
-                self._airmass[good],
+                airmass[good],
             )
 
     def calc_solar_elongation(self):
@@ -429,6 +525,81 @@ class Conditions(object):
             self.calc_solar_elongation()
         return self._solar_elongation
 
+    @property
+    def zenith_distance(self):
+        if self._zenith_distance is None:
+            self._zenith_distance = np.pi / 2.0 - self.alt
+            self._zenith_distance.flags.writeable = False
+        return self._zenith_distance
+
+    @property
+    def moon_distance(self):
+        # The moon position can be set after the mjd, so check it has not changed
+        key = (self._mjd, self.moonAz, self.moonAlt)
+        if (self._moon_distance is None) | (key != self._moon_distance_key):
+            self._moon_distance = _angularSeparation(
+                self.az, self.alt, self.moonAz, self.moonAlt
+            )
+            self._moon_distance.flags.writeable = False
+            self._moon_distance_key = key
+        return self._moon_distance
+
+    def rounded(self, name, scale=1e5):
+        """Integer rounded version of an attribute, for precision-safe comparisons.
+
+        Equivalent to `rounded(getattr(self, name), scale)`, but the result is cached
+        until the attribute changes, so it can be shared by all the basis functions
+        and surveys that compare against the same map.
+
+        Parameters
+        ----------
+        name : str
+            The attribute name, e.g. 'alt', 'az', 'HA', 'airmass', 'moon_distance'.
+        scale : float (1e5)
+            How much to scale the values before rounding and converting to an int.
+
+        Returns
+        -------
+        result : np.array
+            Read-only array of ints.
+        """
+        value = getattr(self, name)
+        key = (name, scale)
+        if key in self._rounded:
+            source, result = self._rounded[key]
+            # The cached maps are replaced (rather than modified) when they change
+            if source is value:
+                return result
+        result = rounded(value, scale)
+        if isinstance(result, np.ndarray):
+            result.flags.writeable = False
+        self._rounded[key] = (value, result)
+        return result
+
+    def distance_from_pixel(self, hpid):
+        """Angular distance from healpixel hpid to every healpixel (radians).
+
+        Parameters
+        ----------
+        hpid : int
+            The healpix ID (at the resolution of the conditions) to measure distances from.
+
+        Returns
+        -------
+        distances : np.array
+            Read-only healpix map of the distances.
+        """
+        hpid = int(hpid)
+        if hpid in self._pixel_distances:
+            self._pixel_distances.move_to_end(hpid)
+            return self._pixel_distances[hpid]
+        distances = _angularSeparation(self.ra[hpid], self.dec[hpid], self.ra, self.dec)
+        distances.flags.writeable = False
+        self._pixel_distances[hpid] = distances
+        if len(self._pixel_distances) > self.pixel_distance_cache_size:
+            self._pixel_distances.popitem(last=False)
+        return distances
+
     def calc_az_to_sun(self):
         self._az_to_sun = smallest_signed_angle(self.ra, self.sunRA)
 
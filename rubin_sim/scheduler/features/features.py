@@ -5,7 +5,7 @@ import healpy as hp
 from rubin_sim.scheduler import utils
 from rubin_sim.utils import m5_flat_sed, _raDec2Hpid, calcSeason, _hpid2RaDec
 from rubin_sim.skybrightness_pre import M5percentiles
-from rubin_sim.scheduler.utils import int_rounded
+from rubin_sim.scheduler.utils import int_rounded, rounded
 
 
 __all__ = [
@@ -31,6 +31,39 @@ __all__ = [
 ]
 
 
+def _csr_rows(indptr):
+    """Return the observation number of each healpixel index in a CSR list of indices."""
+    return np.repeat(np.arange(np.size(indptr) - 1), np.diff(indptr))
+
+
+def _filter_match(observations_array, filtername):
+    """Vectorized `observation["filter"][0] in filtername` (True for all if filtername is None)."""
+    if filtername is None:
+        return np.ones(np.size(observations_array), dtype=bool)
+    return np.array(
+        [filt[0] in filtername for filt in observations_array["filter"]], dtype=bool
+    )
+
+
+def _note_match(observations_array, note):
+    """Vectorized `note in observation["note"]`."""
+    return np.array(
+        [note in obs_note for obs_note in observations_array["note"]], dtype=bool
+    )
+
+
+def _night_start(observations_array, night):
+    """Return the first observation of the last night in observations_array, or None if all
+    of the observations are on night."""
+    nights = observations_array["night"]
+    changed = np.zeros(nights.size, dtype=bool)
+    changed[0] = nights[0] != night
+    changed[1:] = nights[1:] != nights[:-1]
+    if not np.any(changed):
+        return None
+    return np.max(np.where(changed)[0])
+
+
 class BaseFeature(object):
     """
     Base class for features.
@@ -60,6 +93,25 @@ class BaseSurveyFeature(BaseFeature):
         """
         raise NotImplementedError
 
+    def add_observations_array(self, observations_array, indx_csr):
+        """Add many observations at once.
+
+        The default calls add_observation for each observation in turn. Sub-classes
+        can override it with an equivalent vectorized update (and should then also
+        override it if they change add_observation).
+
+        Parameters
+        ----------
+        observations_array : np.array
+            The observations, in the order they were taken.
+        indx_csr : tuple of np.array
+            The healpixel indices the observations overlap, as (indices, indptr):
+            observation i overlaps indices[indptr[i]:indptr[i+1]].
+        """
+        indices, indptr = indx_csr
+        for i, observation in enumerate(observations_array):
+            self.add_observation(observation, indx=indices[indptr[i] : indptr[i + 1]])
+
 
 class Survey_in_night(BaseSurveyFeature):
     """Keep track of how many times a survey has executed in a night."""
@@ -77,6 +129,16 @@ class Survey_in_night(BaseSurveyFeature):
         if self.survey_str in observation["note"]:
             self.feature += 1
 
+    def add_observations_array(self, observations_array, indx_csr):
+        if np.size(observations_array) == 0:
+            return
+        start = _night_start(observations_array, self.night)
+        if start is not None:
+            self.night = observations_array["night"][-1]
+            self.feature = 0
+            observations_array = observations_array[start:]
+        self.feature += np.sum(_note_match(observations_array, self.survey_str))
+
 
 class N_obs_count(BaseSurveyFeature):
     """Count the number of observations. Total number, not tracked over sky
@@ -121,6 +183,13 @@ class N_obs_count(BaseSurveyFeature):
         ):
             self.feature += 1
 
+    def add_observations_array(self, observations_array, indx_csr):
+        if self.tag is not None:
+            return super(N_obs_count, self).add_observations_array(
+                observations_array, indx_csr
+            )
+        self.feature += np.sum(_filter_match(observations_array, self.filtername))
+
 
 class N_obs_count_season(BaseSurveyFeature):
     """Count the number of observations.
@@ -191,6 +260,26 @@ class N_obs_count_season(BaseSurveyFeature):
             ):
                 self.feature += 1
 
+    def add_observations_array(self, observations_array, indx_csr):
+        if self.tag is not None:
+            return super(N_obs_count_season, self).add_observations_array(
+                observations_array, indx_csr
+            )
+        indices, indptr = indx_csr
+        rows = _csr_rows(indptr)
+        season = utils.season_calc(
+            observations_array["night"][rows],
+            modulo=self.season_modulo,
+            offset=self.offset[indices],
+            max_season=self.max_season,
+            season_length=self.season_length,
+        )
+        # An observation counts if any of its healpixels are in the season
+        in_season = np.zeros(np.size(observations_array), dtype=bool)
+        in_season[rows[season == self.season]] = True
+        good = in_season & _filter_match(observations_array, self.filtername)
+        self.feature += np.sum(good)
+
 
 class N_obs_survey(BaseSurveyFeature):
     """Count the number of observations.
@@ -213,6 +302,12 @@ class N_obs_survey(BaseSurveyFeature):
             if self.note in observation["note"]:
                 self.feature += 1
 
+    def add_observations_array(self, observations_array, indx_csr):
+        if self.note is None:
+            self.feature += np.size(observations_array)
+        else:
+            self.feature += np.sum(_note_match(observations_array, self.note))
+
 
 class Last_observation(BaseSurveyFeature):
     """Track the last observation. Useful if you want to see when the
@@ -236,6 +331,14 @@ class Last_observation(BaseSurveyFeature):
         else:
             self.feature = observation
 
+    def add_observations_array(self, observations_array, indx_csr):
+        if self.survey_name is not None:
+            good = np.where(_note_match(observations_array, self.survey_name))[0]
+        else:
+            good = np.arange(np.size(observations_array))
+        if good.size > 0:
+            self.feature = observations_array[good[-1]]
+
 
 class LastSequence_observation(BaseSurveyFeature):
     """When was the last observation"""
@@ -311,6 +414,17 @@ class N_observations(BaseSurveyFeature):
                 # to lookup the N closest non-masked pixels, then do weighted average.
                 pass
 
+    def add_observations_array(self, observations_array, indx_csr):
+        indices, indptr = indx_csr
+        good = _filter_match(observations_array, self.filtername)
+        if self.survey_name is not None:
+            good &= np.array(
+                [note in self.survey_name for note in observations_array["note"]],
+                dtype=bool,
+            )
+        good_indx = indices[good[_csr_rows(indptr)]]
+        np.add.at(self.feature, good_indx, 1)
+
 
 class N_observations_season(BaseSurveyFeature):
     """
@@ -373,6 +487,22 @@ class N_observations_season(BaseSurveyFeature):
             if self.filtername is None or observation["filter"][0] in self.filtername:
                 self.feature[indx] += 1
 
+    def add_observations_array(self, observations_array, indx_csr):
+        indices, indptr = indx_csr
+        rows = _csr_rows(indptr)
+        observation_season = utils.season_calc(
+            observations_array["night"][rows],
+            offset=self.offset[indices],
+            modulo=self.modulo,
+            max_season=self.max_season,
+            season_length=self.season_length,
+        )
+        # An observation counts (at all of its healpixels) if any of its healpixels are in the season
+        good = np.zeros(np.size(observations_array), dtype=bool)
+        good[rows[observation_season == self.season]] = True
+        good &= _filter_match(observations_array, self.filtername)
+        np.add.at(self.feature, indices[good[rows]], 1)
+
 
 class Last_N_obs_times(BaseSurveyFeature):
     """Record the last three observations for each healpixel"""
@@ -390,6 +520,30 @@ class Last_N_obs_times(BaseSurveyFeature):
             self.feature[0:-1, indx] = self.feature[1:, indx]
             self.feature[-1, indx] = observation["mjd"]
 
+    def add_observations_array(self, observations_array, indx_csr):
+        indices, indptr = indx_csr
+        rows = _csr_rows(indptr)
+        good = _filter_match(observations_array, self.filtername)[rows]
+        indx = indices[good]
+        mjds = observations_array["mjd"][rows[good]]
+        if indx.size == 0:
+            return
+        # Sort by healpixel, keeping the observations in order
+        order = np.argsort(indx, kind="stable")
+        indx = indx[order]
+        mjds = mjds[order]
+        hpids, first, n_new = np.unique(indx, return_index=True, return_counts=True)
+        # How many of the later observations of the same healpixel follow each observation
+        n_after = np.repeat(first + n_new, n_new) - np.arange(indx.size) - 1
+        # Shift the old times down by the number of new ones
+        n_shift = np.minimum(n_new, self.n_obs)
+        for shift in np.unique(n_shift):
+            if shift < self.n_obs:
+                to_shift = hpids[n_shift == shift]
+                self.feature[0:-shift, to_shift] = self.feature[shift:, to_shift]
+        keep = n_after < self.n_obs
+        self.feature[self.n_obs - 1 - n_after[keep], indx[keep]] = mjds[keep]
+
 
 class N_observations_current_season(BaseSurveyFeature):
     """Track how many observations have been taken in the current season that meet criteria"""
@@ -486,6 +640,30 @@ class Coadded_depth(BaseSurveyFeature):
                     10.0 ** (0.8 * self.feature[indx]) + 10.0 ** (0.8 * m5)
                 )
 
+    def add_observations_array(self, observations_array, indx_csr):
+        indices, indptr = indx_csr
+        good = (observations_array["filter"] == self.filtername) & (
+            rounded(observations_array["FWHMeff"]) <= self.FWHMeff_limit.value
+        )
+        if not np.any(good):
+            return
+        m5 = m5_flat_sed(
+            self.filtername,
+            observations_array["skybrightness"][good],
+            observations_array["FWHMeff"][good],
+            observations_array["exptime"][good],
+            observations_array["airmass"][good],
+        )
+        rows = _csr_rows(indptr)
+        good_pix = good[rows]
+        # Coadd the fluxes, with observations in the same place summed together
+        m5_all = np.zeros(np.size(observations_array))
+        m5_all[good] = m5
+        hpids, inverse = np.unique(indices[good_pix], return_inverse=True)
+        flux = 10.0 ** (0.8 * self.feature[hpids])
+        np.add.at(flux, inverse, 10.0 ** (0.8 * m5_all[rows[good_pix]]))
+        self.feature[hpids] = 1.25 * np.log10(flux)
+
 
 class Last_observed(BaseSurveyFeature):
     """
@@ -506,6 +684,15 @@ class Last_observed(BaseSurveyFeature):
         elif observation["filter"][0] in self.filtername:
             self.feature[indx] = observation["mjd"]
 
+    def add_observations_array(self, observations_array, indx_csr):
+        indices, indptr = indx_csr
+        rows = _csr_rows(indptr)
+        good = _filter_match(observations_array, self.filtername)[rows]
+        # The last observation of each healpixel sets the time
+        indx = indices[good][::-1]
+        hpids, last = np.unique(indx, return_index=True)
+        self.feature[hpids] = observations_array["mjd"][rows[good][::-1][last]]
+
 
 class NoteLastObserved(BaseSurveyFeature):
     """Track the last time an observation with a particular `note` field was
@@ -525,6 +712,11 @@ class NoteLastObserved(BaseSurveyFeature):
         if self.note in observation["note"]:
             self.feature = observation["mjd"]
 
+    def add_observations_array(self, observations_array, indx_csr):
+        good = np.where(_note_match(observations_array, self.note))[0]
+        if good.size > 0:
+            self.feature = observations_array["mjd"][good[-1]]
+
 
 class N_obs_night(BaseSurveyFeature):
     """
@@ -557,6 +749,23 @@ class N_obs_night(BaseSurveyFeature):
         elif observation["filter"][0] in self.filtername:
             self.feature[indx] += 1
 
+    def add_observations_array(self, observations_array, indx_csr):
+        if np.size(observations_array) == 0:
+            return
+        indices, indptr = indx_csr
+        start = _night_start(observations_array, self.night)
+        if start is not None:
+            self.feature *= 0
+            self.night = observations_array["night"][-1]
+        else:
+            start = 0
+        if (self.filtername == "") | (self.filtername is None):
+            good = np.ones(np.size(observations_array), dtype=bool)
+        else:
+            good = _filter_match(observations_array, self.filtername)
+        good[:start] = False
+        np.add.at(self.feature, indices[good[_csr_rows(indptr)]], 1)
+
 
 class Pair_in_night(BaseSurveyFeature):
     """
@@ -1,3 +1,5 @@
+import copy
+import functools
 import numpy as np
 from rubin_sim.utils import (
     _hpid2RaDec,
@@ -47,6 +49,9 @@ class Model_observatory(object):
         sim_ToO=None,
         seeing_db=None,
         park_after=10.0,
+        lazy_conditions=True,
+        sky_model="pre",
+        zernike_order=None,
     ):
         """
         Parameters
@@ -67,6 +72,19 @@ class Model_observatory(object):
             If one would like to use an alternate seeing database
         park_after : float (10)
             Park the telescope after a gap longer than park_after (minutes)
+        lazy_conditions : bool (True)
+            Only compute the expensive conditions (sky brightness, seeing, slewtimes, etc.)
+            when they are first accessed. The conditions' lazy_stats record how often each
+            one was actually used. The observatory state they depend on is copied when the
+            conditions are returned, so the values are the same as with lazy_conditions=False.
+        sky_model : str or object ("pre")
+            The sky brightness model. "pre" interpolates the pre-computed healpix maps
+            (rubin_sim.skybrightness_pre.SkyModelPre), "zernike" evaluates the much smaller
+            Zernike polynomial fits to them (rubin_sim.skybrightness_pre.zernike.SkyModelZernike).
+            An already constructed sky model can also be passed.
+        zernike_order : int (None)
+            The order of the Zernike polynomials, if sky_model is "zernike". Default of None
+            uses the order the coefficients were fit with.
         """
 
         if nside is None:
@@ -84,6 +102,10 @@ class Model_observatory(object):
 
         self.park_after = park_after / 60.0 / 24.0  # To days
 
+        self.lazy_conditions = lazy_conditions
+        self._sun_moon_mjd = None
+        self._sun_moon_info = None
+
         # Create an astropy location
         self.site = Site("LSST")
         self.location = EarthLocation(
@@ -140,7 +162,18 @@ class Model_observatory(object):
 
         self.cloud_data = CloudData(mjd_start_time, offset_year=0)
 
-        self.sky_model = sb.SkyModelPre(speedLoad=quickTest)
+        if sky_model == "pre":
+            self.sky_model = sb.SkyModelPre(speedLoad=quickTest)
+        elif sky_model == "zernike":
+            from rubin_sim.skybrightness_pre.zernike import SkyModelZernike
+
+            self.sky_model = SkyModelZernike(order=zernike_order, nside=self.nside)
+        elif isinstance(sky_model, str):
+            raise ValueError(
+                'sky_model should be "pre" or "zernike", not %s' % sky_model
+            )
+        else:
+            self.sky_model = sky_model
 
         self.observatory = Kinem_model(mjd0=mjd_start)
 
@@ -186,34 +219,24 @@ class Model_observatory(object):
 
         return result
 
-    def return_conditions(self):
-        """
-        Returns
-        -------
-        rubin_sim.scheduler.features.conditions object
-        """
-
-        self.conditions.mjd = self.mjd
-
-        self.conditions.night = self.night
-        # Current time as astropy time
-        current_time = Time(self.mjd, format="mjd")
-
-        # Clouds. XXX--just the raw value
-        self.conditions.bulk_cloud = self.cloud_data(current_time)
+    def _set_condition(self, name, func, *args):
+        """Set a conditions attribute to func(*args), computed on first access if lazy_conditions."""
+        if self.lazy_conditions:
+            self.conditions.set_lazy(name, functools.partial(func, *args))
+        else:
+            setattr(self.conditions, name, func(*args))
 
-        # use conditions object itself to get aprox altitude of each healpx
+    def _airmass(self):
         alts = self.conditions.alt
-        azs = self.conditions.az
-
         good = np.where(alts > self.alt_min)
-
-        # Compute the airmass at each heapix
         airmass = np.zeros(alts.size, dtype=float)
         airmass.fill(np.nan)
         airmass[good] = 1.0 / np.cos(np.pi / 2.0 - alts[good])
-        self.conditions.airmass = airmass
+        return airmass
 
+    def _seeing(self, current_time):
+        airmass = self.conditions.airmass
+        good = np.where(self.conditions.alt > self.alt_min)
         # reset the seeing
         for key in self.seeing_FWHMeff:
             self.seeing_FWHMeff[key].fill(np.nan)
@@ -223,53 +246,102 @@ class Model_observatory(object):
         fwhm_eff = seeing_dict["fwhmEff"]
         for i, key in enumerate(self.seeing_model.filter_list):
             self.seeing_FWHMeff[key][good] = fwhm_eff[i, :]
-        self.conditions.FWHMeff = self.seeing_FWHMeff
+        return self.seeing_FWHMeff
 
-        # sky brightness
-        self.conditions.skybrightness = self.sky_model.returnMags(
-            self.mjd,
+    def _skybrightness(self, mjd):
+        return self.sky_model.returnMags(
+            mjd,
             airmass_mask=False,
             planet_mask=False,
             moon_mask=False,
             zenith_mask=False,
         )
 
-        self.conditions.mounted_filters = self.observatory.mounted_filters
-        self.conditions.current_filter = self.observatory.current_filter[0]
-
-        # Compute the slewtimes
+    def _slewtimes(self, mjd, observatory):
+        alts = self.conditions.alt
+        azs = self.conditions.az
+        good = np.where(alts > self.alt_min)
         slewtimes = np.empty(alts.size, dtype=float)
         slewtimes.fill(np.nan)
-        # If there has been a gap, park the telescope
-        gap = self.mjd - self.observatory.last_mjd
-        if gap > self.park_after:
-            self.observatory.park()
-        slewtimes[good] = self.observatory.slew_times(
+        slewtimes[good] = observatory.slew_times(
             0.0,
             0.0,
-            self.mjd,
+            mjd,
             alt_rad=alts[good],
             az_rad=azs[good],
-            filtername=self.observatory.current_filter,
+            filtername=observatory.current_filter,
             lax_dome=self.lax_dome,
             update_tracking=False,
         )
-        self.conditions.slewtime = slewtimes
+        return slewtimes
+
+    def _sun_moon(self, mjd, key):
+        # All of the sun and moon attributes come from one almanac lookup per mjd
+        if self._sun_moon_mjd != mjd:
+            sun_moon_info = self.almanac.get_sun_moon_positions(mjd)
+            # convert these to scalars
+            for info_key in sun_moon_info:
+                sun_moon_info[info_key] = sun_moon_info[info_key].max()
+            self._sun_moon_info = sun_moon_info
+            self._sun_moon_mjd = mjd
+        return self._sun_moon_info[key]
+
+    def return_conditions(self):
+        """
+        Returns
+        -------
+        rubin_sim.scheduler.features.conditions object
+
+        With lazy_conditions, the clouds, airmass, seeing, sky brightness, slewtimes, sun and
+        moon positions and planet positions are only computed when they are first accessed.
+        They are bound to the current mjd and a copy of the current telescope state, so they
+        can still be accessed after the observatory moves on (e.g., after calling `observe`).
+        """
+
+        self.conditions.mjd = self.mjd
+
+        self.conditions.night = self.night
+        # Current time as astropy time
+        current_time = Time(self.mjd, format="mjd")
+
+        # Clouds. XXX--just the raw value
+        self._set_condition("bulk_cloud", self.cloud_data, current_time)
+
+        # Compute the airmass at each heapix
+        self._set_condition("airmass", self._airmass)
+
+        self._set_condition("FWHMeff", self._seeing, current_time)
+
+        # sky brightness
+        self._set_condition("skybrightness", self._skybrightness, self.mjd)
+
+        self.conditions.mounted_filters = self.observatory.mounted_filters
+        self.conditions.current_filter = self.observatory.current_filter[0]
+
+        # If there has been a gap, park the telescope
+        gap = self.mjd - self.observatory.last_mjd
+        if gap > self.park_after:
+            self.observatory.park()
+        # Compute the slewtimes. The telescope position and filter change with each
+        # observation, so lazy slewtimes need a copy of the current state.
+        if self.lazy_conditions:
+            observatory = copy.copy(self.observatory)
+        else:
+            observatory = self.observatory
+        self._set_condition("slewtime", self._slewtimes, self.mjd, observatory)
 
         # Let's get the sun and moon
-        sun_moon_info = self.almanac.get_sun_moon_positions(self.mjd)
-        # convert these to scalars
-        for key in sun_moon_info:
-            sun_moon_info[key] = sun_moon_info[key].max()
-        self.conditions.moonPhase = sun_moon_info["moon_phase"]
-
-        self.conditions.moonAlt = sun_moon_info["moon_alt"]
-        self.conditions.moonAz = sun_moon_info["moon_az"]
-        self.conditions.moonRA = sun_moon_info["moon_RA"]
-        self.conditions.moonDec = sun_moon_info["moon_dec"]
-        self.conditions.sunAlt = sun_moon_info["sun_alt"]
-        self.conditions.sunRA = sun_moon_info["sun_RA"]
-        self.conditions.sunDec = sun_moon_info["sun_dec"]
+        for name, key in [
+            ("moonPhase", "moon_phase"),
+            ("moonAlt", "moon_alt"),
+            ("moonAz", "moon_az"),
+            ("moonRA", "moon_RA"),
+            ("moonDec", "moon_dec"),
+            ("sunAlt", "sun_alt"),
+            ("sunRA", "sun_RA"),
+            ("sunDec", "sun_dec"),
+        ]:
+            self._set_condition(name, self._sun_moon, self.mjd, key)
 
         self.conditions.lmst, last = calcLmstLast(self.mjd, self.site.longitude_rad)
 
@@ -301,7 +373,9 @@ class Model_observatory(object):
         self.conditions.moonset = self.almanac.sunsets["moonset"][self.almanac_indx]
 
         # Planet positions from almanac
-        self.conditions.planet_positions = self.almanac.get_planet_positions(self.mjd)
+        self._set_condition(
+            "planet_positions", self.almanac.get_planet_positions, self.mjd
+        )
 
         # See if there are any ToOs to include
         if self.sim_ToO is not None:
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 from builtins import object
+import hashlib
 import numpy as np
 import healpy as hp
 from rubin_sim.utils import _hpid2RaDec
@@ -7,14 +8,41 @@ from rubin_sim.scheduler.utils import (
     hp_in_lsst_fov,
     set_default_nside,
     hp_in_comcam_fov,
-    int_rounded,
+    rounded_lt,
+    rounded_gt,
 )
-from rubin_sim.utils import _approx_RaDec2AltAz, _approx_altaz2pa
+from rubin_sim.utils import _approx_RaDec2AltAz, _approx_altaz2pa, updateHash
+from rubin_sim.scheduler.basis_functions import Base_basis_function
 import logging
 
 
 __all__ = ["Core_scheduler"]
 
+# Basis function attributes that change as it is evaluated, rather than being parameters
+_bf_state_attrs = ["value", "mjd_last", "recalc", "survey_features"]
+
+
+def _basis_function_key(bf):
+    """Key identifying basis functions with the same class and parameters"""
+    h = hashlib.sha1()
+    h.update(type(bf).__module__.encode())
+    h.update(type(bf).__name__.encode())
+    for attr in sorted(vars(bf)):
+        if attr not in _bf_state_attrs:
+            h.update(attr.encode())
+            updateHash(h, getattr(bf, attr))
+    return h.hexdigest()
+
+
+def _shareable(bf):
+    """Can the basis function be shared between surveys? Only if it depends on the
+    conditions, but not on the observations each survey has recorded."""
+    if len(getattr(bf, "survey_features", {})) > 0:
+        return False
+    if type(bf).add_observation is not Base_basis_function.add_observation:
+        return not bf.update_on_newobs
+    return True
+
 
 class Core_scheduler(object):
     """Core scheduler that takes completed observations and observatory status and requests observations
@@ -33,10 +61,23 @@ class Core_scheduler(object):
     conditions : a rubin_sim.scheduler.features.Conditions object (None)
         An object that hold the current conditions and derived values (e.g., 5-sigma depth). Will
         generate a default if set to None.
+    batch_rewards : bool (False)
+        If True, basis functions with the same class and parameters that only depend on the
+        conditions (e.g., Slewtime_basis_function, M5_diff_basis_function) are shared between
+        surveys, so they are evaluated once per conditions update. The weighted sums of the basis
+        functions for all the Markov surveys in a tier are then computed together, as matrix
+        products of the stacked basis function values. The rewards can differ from the default
+        survey-by-survey sums by floating point round-off.
     """
 
     def __init__(
-        self, surveys, nside=None, camera="LSST", rotator_limits=[85.0, 275.0], log=None
+        self,
+        surveys,
+        nside=None,
+        camera="LSST",
+        rotator_limits=[85.0, 275.0],
+        log=None,
+        batch_rewards=False,
     ):
         """
         Parameters
@@ -85,6 +126,85 @@ class Core_scheduler(object):
         self.flushed = 0
         self.rotator_limits = np.sort(np.radians(rotator_limits))
 
+        self.batch_rewards = batch_rewards
+        if self.batch_rewards:
+            self._share_basis_functions()
+
+    def _share_basis_functions(self):
+        """Replace identical, conditions-only basis functions in the surveys with a single shared instance."""
+        registry = {}
+        for surveys in self.survey_lists:
+            for survey in surveys:
+                basis_functions = getattr(survey, "basis_functions", [])
+                for i, bf in enumerate(basis_functions):
+                    if _shareable(bf):
+                        key = _basis_function_key(bf)
+                        if key in registry:
+                            basis_functions[i] = registry[key]
+                        else:
+                            registry[key] = bf
+
+    def _batch_basis_rewards(self, surveys):
+        """Compute the weighted basis function sums for the Markov surveys in a tier at once.
+
+        The values of the (unique) basis functions are stacked into an (n_basis_functions, npix)
+        array and multiplied by the (n_surveys, n_basis_functions) weight matrix. Non-finite values
+        are tracked separately, so the results propagate NaN and inf like the survey sums.
+        """
+        # Infeasible surveys do not use their reward, so their basis functions are not evaluated.
+        candidates = [
+            survey
+            for survey in surveys
+            if hasattr(survey, "batched_reward")
+            and survey.nside == self.nside
+            and survey._check_feasibility(self.conditions)
+        ]
+        if len(candidates) < 2:
+            return
+        npix = hp.nside2npix(self.nside)
+        indx = np.arange(npix)
+        unique = {}
+        for survey in candidates:
+            for bf in survey.basis_functions:
+                if id(bf) not in unique:
+                    unique[id(bf)] = len(unique)
+        shape = (len(candidates), len(unique))
+        weights = np.zeros(shape)
+        n_uses = np.zeros(shape)
+        n_zero = np.zeros(shape)
+        n_positive = np.zeros(shape)
+        n_negative = np.zeros(shape)
+        for i, survey in enumerate(candidates):
+            for bf, weight in zip(survey.basis_functions, survey.basis_weights):
+                j = unique[id(bf)]
+                weights[i, j] += weight
+                n_uses[i, j] += 1
+                n_zero[i, j] += weight == 0
+                n_positive[i, j] += weight > 0
+                n_negative[i, j] += weight < 0
+
+        values = np.zeros((len(unique), npix))
+        evaluated = set()
+        for survey in candidates:
+            for bf in survey.basis_functions:
+                j = unique[id(bf)]
+                if j not in evaluated:
+                    values[j, :] = bf(self.conditions, indx=indx)
+                    evaluated.add(j)
+
+        finite = np.isfinite(values)
+        rewards = np.dot(weights, np.where(finite, values, 0))
+        pos_inf = (values == np.inf).astype(float)
+        neg_inf = (values == -np.inf).astype(float)
+        n_nan = np.dot(n_uses, np.isnan(values)) + np.dot(n_zero, pos_inf + neg_inf)
+        n_pos_inf = np.dot(n_positive, pos_inf) + np.dot(n_negative, neg_inf)
+        n_neg_inf = np.dot(n_positive, neg_inf) + np.dot(n_negative, pos_inf)
+        rewards[n_pos_inf > 0] = np.inf
+        rewards[n_neg_inf > 0] = -np.inf
+        rewards[(n_nan > 0) | ((n_pos_inf > 0) & (n_neg_inf > 0))] = np.nan
+        for i, survey in enumerate(candidates):
+            survey.batched_reward = rewards[i]
+
     def flush_queue(self):
         """ "
         Like it sounds, clear any currently queued desired observations.
@@ -98,11 +218,25 @@ class Core_scheduler(object):
 
         Parameters
         ----------
-        observation : dict-like
+        observation : dict-like or np.array
             An object that contains the relevant information about a
-            completed observation (e.g., mjd, ra, dec, filter, rotation angle, etc)
+            completed observation (e.g., mjd, ra, dec, filter, rotation angle, etc).
+            Can also be an array of many observations (in the order they were taken), in
+            which case the healpixels of all the pointings are found in one batch and
+            each survey updates its features with all of the observations at once.
         """
 
+        if isinstance(observation, np.ndarray) and observation.ndim > 0:
+            indices, indptr = self.pointing2hpindx.batch(
+                observation["RA"],
+                observation["dec"],
+                rotSkyPos=observation["rotSkyPos"],
+            )
+            for surveys in self.survey_lists:
+                for survey in surveys:
+                    survey.add_observations_array(observation, (indices, indptr))
+            return
+
         # Find the healpixel centers that are included in an observation
         indx = self.pointing2hpindx(
             observation["RA"], observation["dec"], rotSkyPos=observation["rotSkyPos"]
@@ -152,7 +286,7 @@ class Core_scheduler(object):
         """
         result = False
         if len(self.queue) > 0:
-            if (int_rounded(mjd) < int_rounded(self.queue[0]["flush_by_mjd"])) | (
+            if rounded_lt(mjd, self.queue[0]["flush_by_mjd"]) | (
                 self.queue[0]["flush_by_mjd"] == 0
             ):
                 result = True
@@ -182,7 +316,7 @@ class Core_scheduler(object):
             return None
         else:
             # If the queue has gone stale, flush and refill. Zero means no flush_by was set.
-            if (int_rounded(mjd) > int_rounded(self.queue[0]["flush_by_mjd"])) & (
+            if rounded_gt(mjd, self.queue[0]["flush_by_mjd"]) & (
                 self.queue[0]["flush_by_mjd"] != 0
             ):
                 self.flushed += len(self.queue)
@@ -202,12 +336,8 @@ class Core_scheduler(object):
                 )
                 obs_pa = _approx_altaz2pa(alt, az, self.conditions.site.latitude_rad)
                 rotTelPos_expected = (obs_pa - observation["rotSkyPos"]) % (2.0 * np.pi)
-                if (
-                    int_rounded(rotTelPos_expected)
-                    > int_rounded(self.rotator_limits[0])
-                ) & (
-                    int_rounded(rotTelPos_expected)
-                    < int_rounded(self.rotator_limits[1])
+                if rounded_gt(rotTelPos_expected, self.rotator_limits[0]) & rounded_lt(
+                    rotTelPos_expected, self.rotator_limits[1]
                 ):
                     diff = np.abs(self.rotator_limits - rotTelPos_expected)
                     limit_indx = np.min(np.where(diff == np.min(diff))[0])
@@ -224,9 +354,14 @@ class Core_scheduler(object):
 
         rewards = None
         for ns, surveys in enumerate(self.survey_lists):
+            if self.batch_rewards:
+                self._batch_basis_rewards(surveys)
             rewards = np.zeros(len(surveys))
             for i, survey in enumerate(surveys):
                 rewards[i] = np.nanmax(survey.calc_reward_function(self.conditions))
+                # Don't leave a batched reward the survey did not use around for the next call
+                if hasattr(survey, "batched_reward"):
+                    survey.batched_reward = None
             # If we have a good reward, break out of the loop
             if np.nanmax(rewards) > -np.inf:
                 self.survey_index[0] = ns
@@ -0,0 +1,121 @@
+import os
+import copy
+import time
+import random
+import traceback
+import warnings
+import multiprocessing
+import numpy as np
+import pandas as pd
+from rubin_sim.scheduler.sim_runner import sim_runner
+
+__all__ = ["sim_farm"]
+
+# The state shared with the forked worker processes of sim_farm.
+_farm_state = None
+
+
+def _run_config(i):
+    """Run the i-th configuration of the farm. Called in a freshly forked worker process,
+    so the observatory is a copy-on-write copy of the (pre-initialized) parent observatory.
+    """
+    observatory, configs = _farm_state
+    return _run_single(observatory, configs[i], i)
+
+
+def _run_single(observatory, config, i):
+    config = dict(config)
+    name = config.pop("name", "%i" % i)
+    scheduler = config.pop("scheduler")
+    seed = config.pop("seed", None)
+    config.setdefault("verbose", False)
+    row = {
+        "name": name,
+        "filename": config.get("filename", None),
+        "seed": seed,
+        "pid": os.getpid(),
+        "n_observations": 0,
+        "runtime": 0.0,
+        "error": "",
+    }
+    t0 = time.time()
+    try:
+        # Let configs give a function to build the scheduler, so it is only built in the worker.
+        if isinstance(scheduler, type) or not hasattr(scheduler, "request_observation"):
+            scheduler = scheduler()
+        if seed is not None:
+            np.random.seed(seed)
+            random.seed(seed)
+        observatory, scheduler, observations = sim_runner(
+            observatory, scheduler, **config
+        )
+        row["n_observations"] = np.size(observations)
+    except Exception:
+        row["error"] = traceback.format_exc()
+    row["runtime"] = time.time() - t0
+    return i, row
+
+
+def sim_farm(observatory, configs, n_processes=None, manifest=None):
+    """Run many simulations, with different schedulers or seeds, in parallel
+
+    The observatory is initialized once (loading the sky brightness, almanac, seeing and cloud
+    data) in the parent process, and each configuration is then run in a worker process forked
+    from the parent. The workers share the parent's memory copy-on-write, so the large read-only
+    arrays are neither reloaded nor copied, and each configuration starts from the same
+    observatory state.
+
+    Parameters
+    ----------
+    observatory : rubin_sim.scheduler.modelObservatory.Model_observatory
+        The observatory to start each simulation from.
+    configs : list of dict
+        One dict per simulation. Each must have a 'scheduler' key, with either a Core_scheduler or a
+        function returning one (called in the worker process). Optional keys are 'name' (for the
+        manifest, defaults to the index of the config), 'seed' (seeds the numpy and python random
+        number generators) and any keyword arguments of sim_runner (e.g., 'filename', 'survey_length',
+        'mjd_start', 'filter_scheduler', 'extra_info').
+    n_processes : int (None)
+        The number of simulations to run at once. Defaults to the number of CPUs.
+    manifest : str (None)
+        If present, the manifest is also written to this csv file.
+
+    Returns
+    -------
+    manifest : pandas.DataFrame
+        One row per config, with the name, output filename, seed, worker pid, number of observations,
+        runtime (seconds) and error (the traceback, if the simulation failed).
+    """
+    global _farm_state
+    if n_processes is None:
+        n_processes = os.cpu_count()
+
+    # Make sure everything the observatory loads lazily is loaded before forking
+    observatory.return_conditions().evaluate_lazy()
+
+    rows = [None] * len(configs)
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        context = None
+        warnings.warn(
+            "Cannot fork processes on this platform; running simulations serially."
+        )
+
+    if context is None:
+        for i, config in enumerate(configs):
+            i, rows[i] = _run_single(copy.deepcopy(observatory), config, i)
+    else:
+        _farm_state = (observatory, configs)
+        try:
+            # One task per worker, so every simulation starts from a fresh fork of the parent
+            with context.Pool(processes=n_processes, maxtasksperchild=1) as pool:
+                for i, row in pool.imap_unordered(_run_config, range(len(configs))):
+                    rows[i] = row
+        finally:
+            _farm_state = None
+
+    result = pd.DataFrame(rows)
+    if manifest is not None:
+        result.to_csv(manifest, index=False)
+    return result
@@ -1,13 +1,45 @@
 import warnings
 import sys
+import os
+import pickle
+import random
 import numpy as np
-from rubin_sim.scheduler.utils import run_info_table, schema_converter
+from rubin_sim.scheduler.utils import run_info_table, Observation_buffer
 from rubin_sim.scheduler.schedulers import simple_filter_sched
 import time
 import sqlite3
 import pandas as pd
 
-__all__ = ["sim_runner"]
+__all__ = ["sim_runner", "load_checkpoint"]
+
+
+def _write_checkpoint(filename, state):
+    """Pickle state to filename, via a temporary file so an interrupted write
+    never clobbers the previous checkpoint."""
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """Load a checkpoint written by sim_runner.
+
+    Parameters
+    ----------
+    filename : str
+        The checkpoint file.
+
+    Returns
+    -------
+    state : dict
+        The simulation state, with keys observatory, scheduler, filter_scheduler,
+        observations (the completed observations so far), loop (the sim_runner loop variables),
+        np_random_state and random_state.
+    """
+    with open(filename, "rb") as f:
+        state = pickle.load(f)
+    return state
 
 
 def sim_runner(
@@ -23,6 +55,12 @@ def sim_runner(
     verbose=True,
     extra_info=None,
     event_table=None,
+    profiler=None,
+    checkpoint_file=None,
+    checkpoint_interval=1.0,
+    resume=False,
+    flush_every=None,
+    keep_observations=True,
 ):
     """
     run a simulation
@@ -37,6 +75,26 @@ def sim_runner(
         If present, dict gets added onto the information from the observatory model.
     event_table : np.array (None)
         Any ToO events that were included in the simulation
+    profiler : rubin_sim.scheduler.utils.Scheduler_profiler (None)
+        If present, the profiler is attached to the scheduler for the run, and a report of the
+        time spent in each survey, basis function, feature and detailer is printed at the end.
+    checkpoint_file : str (None)
+        If present, the full state of the simulation (scheduler, observatory, filter scheduler,
+        completed observations, loop variables and random number generator states) is
+        pickled to this file every checkpoint_interval days.
+    checkpoint_interval : float (1.)
+        How often to write the checkpoint (days of simulated time).
+    resume : bool (False)
+        If True and checkpoint_file exists, restart the simulation from the checkpoint rather
+        than from the observatory, scheduler and filter_scheduler passed in (mjd_start and
+        survey_length are also taken from the checkpoint). Because the random number generator
+        states are restored as well, the resumed run continues exactly as the original run would have.
+    flush_every : int (None)
+        If present (and filename is set), append the completed observations to filename every
+        flush_every observations, rather than only at the end of the run.
+    keep_observations : bool (True)
+        If False, observations are dropped from memory once written to filename, and the returned
+        observations array is empty. Requires filename and flush_every.
     """
 
     if extra_info is None:
@@ -44,6 +102,14 @@ def sim_runner(
 
     t0 = time.time()
 
+    state = None
+    if resume and checkpoint_file is not None and os.path.isfile(checkpoint_file):
+        state = load_checkpoint(checkpoint_file)
+        observatory = state["observatory"]
+        scheduler = state["scheduler"]
+        filter_scheduler = state["filter_scheduler"]
+        mjd_start = None
+
     if filter_scheduler is None:
         filter_scheduler = simple_filter_sched()
 
@@ -55,7 +121,12 @@ def sim_runner(
         observatory.mjd = mjd
 
     end_mjd = mjd + survey_length
-    observations = []
+    observations = Observation_buffer(
+        filename=filename,
+        flush_every=flush_every,
+        keep=keep_observations,
+        delete_past=delete_past,
+    )
     mjd_track = mjd + 0
     step = 1.0 / 24.0
     step_none = step_none / 60.0 / 24.0  # to days
@@ -65,64 +136,124 @@ def sim_runner(
 
     mjd_last_flush = -1
 
-    while mjd < end_mjd:
-        if not scheduler._check_queue_mjd_only(observatory.mjd):
-            scheduler.update_conditions(observatory.return_conditions())
-        desired_obs = scheduler.request_observation(mjd=observatory.mjd)
-        if desired_obs is None:
-            # No observation. Just step into the future and try again.
-            warnings.warn("No observation. Step into the future and trying again.")
-            observatory.mjd = observatory.mjd + step_none
-            scheduler.update_conditions(observatory.return_conditions())
-            nskip += 1
-            continue
-        completed_obs, new_night = observatory.observe(desired_obs)
-        if completed_obs is not None:
-            scheduler.add_observation(completed_obs[0])
-            observations.append(completed_obs)
-            filter_scheduler.add_observation(completed_obs[0])
-        else:
-            # An observation failed to execute, usually it was outside the altitude limits.
-            if observatory.mjd == mjd_last_flush:
-                raise RuntimeError(
-                    "Scheduler has failed to provide a valid observation multiple times."
-                )
-            # if this is a first offence, might just be that targets set. Flush queue and get some new targets.
-            scheduler.flush_queue()
-            mjd_last_flush = observatory.mjd + 0
-        if new_night:
-            # find out what filters we want mounted
-            conditions = observatory.return_conditions()
-            filters_needed = filter_scheduler(conditions)
-            observatory.observatory.mount_filters(filters_needed)
-
-        mjd = observatory.mjd + 0
+    if state is not None:
+        observations = state["observations"]
+        # Drop anything flushed to disk after the checkpoint was written
+        observations.rewind()
+        filename = observations.filename
+        mjd_start = state["loop"]["mjd_start"]
+        end_mjd = state["loop"]["end_mjd"]
+        mjd_run = end_mjd - mjd_start
+        mjd = state["loop"]["mjd"]
+        mjd_track = state["loop"]["mjd_track"]
+        nskip = state["loop"]["nskip"]
+        mjd_last_flush = state["loop"]["mjd_last_flush"]
+        np.random.set_state(state["np_random_state"])
+        random.setstate(state["random_state"])
+        del state
         if verbose:
-            if (mjd - mjd_track) > step:
-                progress = float(mjd - mjd_start) / mjd_run * 100
-                text = "\rprogress = %.2f%%" % progress
-                sys.stdout.write(text)
-                sys.stdout.flush()
-                mjd_track = mjd + 0
-        if n_visit_limit is not None:
-            if len(observations) == n_visit_limit:
-                break
-        # XXX--handy place to interupt and debug
-        # if len(observations) > 25:
-        #    import pdb ; pdb.set_trace()
+            print("Resuming from checkpoint %s at mjd %f" % (checkpoint_file, mjd))
+    mjd_last_checkpoint = mjd + 0
+
+    if profiler is not None:
+        profiler.attach(scheduler)
+
+    try:
+        while mjd < end_mjd:
+            if not scheduler._check_queue_mjd_only(observatory.mjd):
+                scheduler.update_conditions(observatory.return_conditions())
+            desired_obs = scheduler.request_observation(mjd=observatory.mjd)
+            if desired_obs is None:
+                # No observation. Just step into the future and try again.
+                warnings.warn("No observation. Step into the future and trying again.")
+                observatory.mjd = observatory.mjd + step_none
+                scheduler.update_conditions(observatory.return_conditions())
+                nskip += 1
+                continue
+            completed_obs, new_night = observatory.observe(desired_obs)
+            if completed_obs is not None:
+                scheduler.add_observation(completed_obs[0])
+                observations.append(completed_obs)
+                filter_scheduler.add_observation(completed_obs[0])
+            else:
+                # An observation failed to execute, usually it was outside the altitude limits.
+                if observatory.mjd == mjd_last_flush:
+                    raise RuntimeError(
+                        "Scheduler has failed to provide a valid observation multiple times."
+                    )
+                # if this is a first offence, might just be that targets set. Flush queue and get some new targets.
+                scheduler.flush_queue()
+                mjd_last_flush = observatory.mjd + 0
+            if new_night:
+                # find out what filters we want mounted
+                conditions = observatory.return_conditions()
+                filters_needed = filter_scheduler(conditions)
+                observatory.observatory.mount_filters(filters_needed)
+
+            mjd = observatory.mjd + 0
+            if verbose:
+                if (mjd - mjd_track) > step:
+                    progress = float(mjd - mjd_start) / mjd_run * 100
+                    text = "\rprogress = %.2f%%" % progress
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+                    mjd_track = mjd + 0
+            if n_visit_limit is not None:
+                if len(observations) == n_visit_limit:
+                    break
+            if checkpoint_file is not None:
+                if (mjd - mjd_last_checkpoint) >= checkpoint_interval:
+                    # The profiler swaps classes of the scheduler objects, put them back before pickling.
+                    if profiler is not None:
+                        profiler.detach()
+                    try:
+                        loop = {
+                            "mjd_start": mjd_start,
+                            "end_mjd": end_mjd,
+                            "mjd": mjd,
+                            "mjd_track": mjd_track,
+                            "nskip": nskip,
+                            "mjd_last_flush": mjd_last_flush,
+                        }
+                        _write_checkpoint(
+                            checkpoint_file,
+                            {
+                                "observatory": observatory,
+                                "scheduler": scheduler,
+                                "filter_scheduler": filter_scheduler,
+                                "observations": observations,
+                                "loop": loop,
+                                "np_random_state": np.random.get_state(),
+                                "random_state": random.getstate(),
+                            },
+                        )
+                    finally:
+                        if profiler is not None:
+                            profiler.attach(scheduler)
+                    mjd_last_checkpoint = mjd + 0
+            # XXX--handy place to interupt and debug
+            # if len(observations) > 25:
+            #    import pdb ; pdb.set_trace()
+    finally:
+        # Always restore the original classes of the scheduler objects
+        if profiler is not None:
+            profiler.detach()
     runtime = time.time() - t0
     print("Skipped %i observations" % nskip)
     print("Flushed %i observations from queue for being stale" % scheduler.flushed)
     print("Completed %i observations" % len(observations))
     print("ran in %i min = %.1f hours" % (runtime / 60.0, runtime / 3600.0))
+    if profiler is not None:
+        print("Scheduler profile (cumulative seconds, sorted by time):")
+        print(profiler.report().to_string())
     print("Writing results to ", filename)
-    observations = np.array(observations)[:, 0]
+    observations.flush()
     if filename is not None:
         info = run_info_table(observatory, extra_info=extra_info)
-        converter = schema_converter()
-        converter.obs2opsim(
-            observations, filename=filename, info=info, delete_past=delete_past
-        )
+        con = sqlite3.connect(filename)
+        pd.DataFrame(info).to_sql("info", con, if_exists="replace")
+        con.close()
+    observations = observations.observations
     if event_table is not None:
         df = pd.DataFrame(event_table)
         con = sqlite3.connect(filename)
@@ -6,6 +6,7 @@ from rubin_sim.scheduler.utils import (
     read_fields,
     hp_in_comcam_fov,
     comcamTessellate,
+    indx_csr_subset,
 )
 import healpy as hp
 from rubin_sim.scheduler.thomson import xyz2thetaphi, thetaphi2xyz
@@ -106,6 +107,49 @@ class BaseSurvey(object):
                 detailer.add_observation(observation, **kwargs)
             self.reward_checked = False
 
+    def add_observations_array(self, observations_array, indx_csr):
+        """Add many observations at once
+
+        Parameters
+        ----------
+        observations_array : np.array
+            The observations, in the order they were taken
+        indx_csr : tuple of np.array
+            The healpixel indices the observations overlap, as (indices, indptr), so
+            observation i overlaps indices[indptr[i]:indptr[i+1]]
+        """
+        if type(self).add_observation is not BaseSurvey.add_observation:
+            # Sub-classes with their own add_observation take the observations one at a time
+            indices, indptr = indx_csr
+            for i, observation in enumerate(observations_array):
+                self.add_observation(
+                    observation, indx=indices[indptr[i] : indptr[i + 1]]
+                )
+            return
+        good = np.ones(np.size(observations_array), dtype=bool)
+        for io in self.ignore_obs:
+            good &= np.array(
+                [io not in str(note) for note in observations_array["note"]], dtype=bool
+            )
+        if not np.any(good):
+            return
+        if not np.all(good):
+            observations_array = observations_array[good]
+            indx_csr = indx_csr_subset(indx_csr, good)
+        for feature in self.extra_features:
+            self.extra_features[feature].add_observations_array(
+                observations_array, indx_csr
+            )
+        for bf in self.extra_basis_functions:
+            self.extra_basis_functions[bf].add_observations_array(
+                observations_array, indx_csr
+            )
+        for bf in self.basis_functions:
+            bf.add_observations_array(observations_array, indx_csr)
+        for detailer in self.detailers:
+            detailer.add_observations_array(observations_array, indx_csr)
+        self.reward_checked = False
+
     def _check_feasibility(self, conditions):
         """
         Check if the survey is feasable in the current conditions
@@ -222,6 +266,8 @@ class BaseMarkovDF_survey(BaseSurvey):
         )
 
         self.basis_weights = basis_weights
+        # Weighted sum of the basis functions, if precomputed by the scheduler
+        self.batched_reward = None
         # Check that weights and basis functions are same length
         if len(basis_functions) != np.size(basis_weights):
             raise ValueError("basis_functions and basis_weights must be same length.")
@@ -289,9 +335,9 @@ class BaseMarkovDF_survey(BaseSurvey):
             pointing2hpindx = hp_in_comcam_fov(nside=self.nside)
 
         self.hp2fields = np.zeros(hp.nside2npix(self.nside), dtype=int)
+        indices, indptr = pointing2hpindx.batch(ra, dec, rotSkyPos=0.0)
         for i in range(len(ra)):
-            hpindx = pointing2hpindx(ra[i], dec[i], rotSkyPos=0.0)
-            self.hp2fields[hpindx] = i
+            self.hp2fields[indices[indptr[i] : indptr[i + 1]]] = i
 
     def _spin_fields(self, conditions, lon=None, lat=None, lon2=None):
         """Spin the field tessellation to generate a random orientation
@@ -352,14 +398,27 @@ class BaseMarkovDF_survey(BaseSurvey):
             # Round off to prevent strange behavior early on
             # self.reward_smooth[good] = np.round(self.reward_smooth[good], decimals=4)
 
+    def _basis_reward(self, conditions):
+        """The weighted sum of the basis functions.
+
+        If the scheduler has already computed the sum (see the batch_rewards option of
+        `Core_scheduler`), batched_reward is used instead of calling the basis functions.
+        """
+        if getattr(self, "batched_reward", None) is not None:
+            reward = self.batched_reward
+            self.batched_reward = None
+            return reward
+        reward = 0
+        indx = np.arange(hp.nside2npix(self.nside))
+        for bf, weight in zip(self.basis_functions, self.basis_weights):
+            basis_value = bf(conditions, indx=indx)
+            reward += basis_value * weight
+        return reward
+
     def calc_reward_function(self, conditions):
         self.reward_checked = True
         if self._check_feasibility(conditions):
-            self.reward = 0
-            indx = np.arange(hp.nside2npix(self.nside))
-            for bf, weight in zip(self.basis_functions, self.basis_weights):
-                basis_value = bf(conditions, indx=indx)
-                self.reward += basis_value * weight
+            self.reward = self._basis_reward(conditions)
 
             if np.any(np.isinf(self.reward)):
                 self.reward = np.inf
@@ -5,9 +5,11 @@ import matplotlib.pylab as plt
 from rubin_sim.scheduler.surveys import BaseMarkovDF_survey
 from rubin_sim.scheduler.utils import (
     int_binned_stat,
-    int_rounded,
+    rounded,
+    rounded_gt,
     gnomonic_project_toxy,
     tsp_convex,
+    tsp_insertion,
 )
 import copy
 from rubin_sim.utils import (
@@ -149,6 +151,9 @@ class Blob_survey(Greedy_survey):
     grow_blob : bool (True)
         If True, try to grow the blob from the global maximum. Otherwise, just use a simple sort.
         Simple sort will not constrain the blob to be contiguous.
+    tsp_solver : str ('convex')
+        How to order the observations in the blob. 'convex' uses `tsp_convex`, 'insertion' uses
+        the much faster `tsp_insertion` (cheapest insertion followed by 2-opt and Or-opt moves).
     """
 
     def __init__(
@@ -183,6 +188,7 @@ class Blob_survey(Greedy_survey):
         min_area=None,
         grow_blob=True,
         area_required=None,
+        tsp_solver="convex",
     ):
 
         if nside is None:
@@ -212,6 +218,11 @@ class Blob_survey(Greedy_survey):
         self.twilight_scale = twilight_scale
         self.in_twilight = in_twilight
         self.grow_blob = grow_blob
+        if tsp_solver not in ["convex", "insertion"]:
+            raise ValueError(
+                "tsp_solver should be 'convex' or 'insertion', not %s" % tsp_solver
+            )
+        self.tsp_solver = tsp_solver
 
         if self.twilight_scale & self.in_twilight:
             warnings.warn(
@@ -359,17 +370,12 @@ class Blob_survey(Greedy_survey):
         self._set_block_size(conditions)
         #  Computing reward like usual with basis functions and weights
         if self._check_feasibility(conditions):
-            self.reward = 0
-            indx = np.arange(hp.nside2npix(self.nside))
-            for bf, weight in zip(self.basis_functions, self.basis_weights):
-                basis_value = bf(conditions, indx=indx)
-                self.reward += basis_value * weight
-                # might be faster to pull this out into the feasabiliity check?
+            self.reward = self._basis_reward(conditions)
             if self.smoothing_kernel is not None:
                 self.smooth_reward()
 
             # Apply max altitude cut
-            too_high = np.where(int_rounded(conditions.alt) > int_rounded(self.alt_max))
+            too_high = np.where(conditions.rounded("alt") > rounded(self.alt_max))
             self.reward[too_high] = np.nan
 
             # Select healpixels within some radius of the max
@@ -383,22 +389,23 @@ class Blob_survey(Greedy_survey):
                 return -np.inf
 
             # Apply radius selection
-            dists = _angularSeparation(
-                self.ra[peak_reward], self.dec[peak_reward], self.ra, self.dec
-            )
-            out_hp = np.where(int_rounded(dists) > int_rounded(self.search_radius))
+            if conditions.nside == self.nside:
+                dists = conditions.distance_from_pixel(peak_reward)
+            else:
+                dists = _angularSeparation(
+                    self.ra[peak_reward], self.dec[peak_reward], self.ra, self.dec
+                )
+            out_hp = np.where(rounded_gt(dists, self.search_radius))
             self.reward[out_hp] = np.nan
 
             # Apply az cut
             az_centered = conditions.az - conditions.az[peak_reward]
             az_centered[np.where(az_centered < 0)] += 2.0 * np.pi
 
+            az_centered = rounded(az_centered)
             az_out = np.where(
-                (int_rounded(az_centered) > int_rounded(self.az_range / 2.0))
-                & (
-                    int_rounded(az_centered)
-                    < int_rounded(2.0 * np.pi - self.az_range / 2.0)
-                )
+                (az_centered > rounded(self.az_range / 2.0))
+                & (az_centered < rounded(2.0 * np.pi - self.az_range / 2.0))
             )
             self.reward[az_out] = np.nan
         else:
@@ -509,8 +516,11 @@ class Blob_survey(Greedy_survey):
         pointing_y = np.round(pointing_y * scale).astype(int)
         # Now I have a bunch of x,y pointings. Drop into TSP solver to get an effiencent route
         towns = np.vstack((pointing_x, pointing_y)).T
-        # Leaving optimize=False for speed. The optimization step doesn't usually improve much.
-        better_order = tsp_convex(towns, optimize=False)
+        if self.tsp_solver == "insertion":
+            better_order = tsp_insertion(towns, optimize=True)
+        else:
+            # Leaving optimize=False for speed. The optimization step doesn't usually improve much.
+            better_order = tsp_convex(towns, optimize=False)
         # XXX-TODO: Could try to roll better_order to start at the nearest/fastest slew from current position.
         observations = []
         counter2 = 0
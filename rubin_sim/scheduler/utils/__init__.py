@@ -4,3 +4,5 @@ from .tsp import *
 from .dithering import *
 from .comcamTessellate import *
 from .sky_area import *
+from .profiler import *
+from .observation_buffer import *
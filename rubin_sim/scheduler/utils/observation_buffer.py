@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import numpy as np
+from .utils import empty_observation, schema_converter
+
+__all__ = ["Observation_buffer"]
+
+
+class Observation_buffer(object):
+    """Preallocated store for the observations completed during a simulation.
+
+    Observations are copied into a structured array which doubles in size whenever it fills up,
+    rather than being kept as a list of one-row arrays. If a filename is set, every flush_every
+    observations the new rows are appended to the observations table of the sqlite file
+    (converted with `schema_converter`), so partial results can be inspected during a long run.
+    With keep=False the flushed rows are also dropped from memory, so memory use stays flat.
+
+    Parameters
+    ----------
+    filename : `str`, opt
+        The sqlite file to flush the observations to. Default None, observations are only
+        kept in memory.
+    flush_every : `int`, opt
+        Write the observations to filename whenever this many new ones have been added.
+        Default None, only write them when `flush` is called.
+    keep : `bool`, opt
+        Keep the observations in memory after they have been written to filename. Default True.
+    initial_size : `int`, opt
+        The number of observations to allocate space for initially. Default 1024.
+    delete_past : `bool`, opt
+        Delete filename, if it already exists, before the first write. Default True.
+    """
+
+    def __init__(
+        self,
+        filename=None,
+        flush_every=None,
+        keep=True,
+        initial_size=1024,
+        delete_past=True,
+    ):
+        if not keep and filename is None:
+            raise ValueError("Need a filename to write observations to if keep=False")
+        self.filename = filename
+        self.flush_every = flush_every
+        self.keep = keep
+        self.delete_past = delete_past
+        self.converter = schema_converter()
+        self._array = np.zeros(initial_size, dtype=empty_observation().dtype)
+        # Number of rows of _array in use
+        self._n = 0
+        # Number of rows of _array already written to filename
+        self._n_unwritten_start = 0
+        # Total number of observations written to filename
+        self.n_written = 0
+        # Total number of observations dropped from memory after being written
+        self._n_dropped = 0
+
+    def __len__(self):
+        return self._n_dropped + self._n
+
+    def append(self, observation):
+        """Add an observation.
+
+        Parameters
+        ----------
+        observation : `np.array`
+            An observation, as returned by the Model_observatory (a single row array
+            with the dtype of `empty_observation`), or a single row of such an array.
+        """
+        if self._n == self._array.size:
+            new_array = np.zeros(2 * self._array.size, dtype=self._array.dtype)
+            new_array[: self._n] = self._array
+            self._array = new_array
+        self._array[self._n] = np.ravel(observation)[0]
+        self._n += 1
+        if self.flush_every is not None:
+            if (self._n - self._n_unwritten_start) >= self.flush_every:
+                self.flush()
+
+    @property
+    def observations(self):
+        """The observations held in memory (all of them, unless keep=False)."""
+        return self._array[: self._n]
+
+    def flush(self):
+        """Append the observations not yet written to the observations table of filename."""
+        if self.filename is None or self._n == self._n_unwritten_start:
+            return
+        self.converter.obs2opsim(
+            self._array[self._n_unwritten_start : self._n],
+            filename=self.filename,
+            delete_past=self.delete_past and self.n_written == 0,
+            append=self.n_written > 0,
+        )
+        self.n_written += self._n - self._n_unwritten_start
+        self._n_unwritten_start = self._n
+        if not self.keep:
+            self._n_dropped += self._n
+            self._n = 0
+            self._n_unwritten_start = 0
+
+    def rewind(self):
+        """Remove any rows of the file beyond the n_written observations this buffer has written.
+
+        Used when restarting from a checkpoint, as the file can contain observations that were
+        flushed after the checkpoint was taken.
+        """
+        if self.filename is None or not os.path.isfile(self.filename):
+            return
+        con = sqlite3.connect(self.filename)
+        tables = [
+            row[0]
+            for row in con.execute("select name from sqlite_master where type='table'")
+        ]
+        if "observations" in tables:
+            con.execute("delete from observations where rowid > ?", (self.n_written,))
+            con.commit()
+        con.close()
@@ -0,0 +1,194 @@
+import time
+import numpy as np
+import pandas as pd
+
+__all__ = ["Scheduler_profiler"]
+
+
+class Scheduler_profiler(object):
+    """Opt-in instrumentation of a scheduler, to find where the time goes in a simulation.
+
+    Once attached to a scheduler, the profiler records the number of calls, the cumulative
+    wall time and the size of the returned arrays (or of the healpix indices passed in, for
+    add_observation) for the methods of the Core_scheduler and of all its surveys, basis functions,
+    features and detailers. For basis functions, the number of calls which reused the cached value
+    (rather than calling _calc_value because of `recalc` or a new `mjd_last`) is tracked as well.
+
+    The instrumentation swaps the class of each object for an instrumented subclass, so there
+    is no overhead at all unless a profiler is attached. Call `detach` to restore the original
+    classes (before pickling the scheduler, for example).
+
+    Examples
+    --------
+    >>> profiler = Scheduler_profiler()
+    >>> observatory, scheduler, observations = sim_runner(observatory, scheduler, profiler=profiler)
+    >>> profiler.report(sort_by="calls")
+    """
+
+    # The methods to instrument, for each kind of object.
+    methods = {
+        "scheduler": ["update_conditions", "_fill_queue", "add_observation"],
+        "survey": ["calc_reward_function", "generate_observations", "add_observation"],
+        "basis_function": [
+            "__call__",
+            "_calc_value",
+            "check_feasibility",
+            "add_observation",
+        ],
+        "feature": ["add_observation"],
+        "detailer": ["__call__", "add_observation"],
+    }
+
+    def __init__(self):
+        self.stats = {}
+        self._labels = {}
+        self._originals = []
+        self._classes = {}
+
+    def attach(self, scheduler):
+        """Instrument the scheduler and all of its surveys, basis functions, features and detailers.
+
+        Parameters
+        ----------
+        scheduler : `rubin_sim.scheduler.schedulers.Core_scheduler`
+            The scheduler to profile.
+        """
+        self._instrument(scheduler, "scheduler", type(scheduler).__name__)
+        for i, surveys in enumerate(scheduler.survey_lists):
+            for j, survey in enumerate(surveys):
+                name = getattr(survey, "survey_name", "")
+                if name == "":
+                    name = type(survey).__name__
+                label = "%i.%i %s" % (i, j, name)
+                self._instrument(survey, "survey", label)
+                for key, feature in getattr(survey, "extra_features", {}).items():
+                    self._instrument(feature, "feature", "%s/%s" % (label, key))
+                basis_functions = list(
+                    enumerate(getattr(survey, "basis_functions", []))
+                )
+                basis_functions += list(
+                    getattr(survey, "extra_basis_functions", {}).items()
+                )
+                for key, bf in basis_functions:
+                    bf_label = "%s/%s[%s]" % (label, type(bf).__name__, key)
+                    self._instrument(bf, "basis_function", bf_label)
+                    self._instrument_features(bf, bf_label)
+                for k, detailer in enumerate(getattr(survey, "detailers", [])):
+                    detailer_label = "%s/%s[%i]" % (label, type(detailer).__name__, k)
+                    self._instrument(detailer, "detailer", detailer_label)
+                    self._instrument_features(detailer, detailer_label)
+
+    def detach(self):
+        """Restore the original classes of all of the instrumented objects."""
+        for obj, cls in self._originals:
+            obj.__class__ = cls
+        self._originals = []
+        self._labels = {}
+
+    def _instrument_features(self, obj, label):
+        for key, feature in getattr(obj, "survey_features", {}).items():
+            self._instrument(feature, "feature", "%s/%s" % (label, key))
+
+    def _instrument(self, obj, kind, label):
+        # Objects can be shared (e.g. the same feature in several basis functions): only instrument once.
+        if id(obj) in self._labels:
+            return
+        self._labels[id(obj)] = (kind, label)
+        cls = type(obj)
+        self._originals.append((obj, cls))
+        obj.__class__ = self._profiled_class(cls, kind)
+
+    def _profiled_class(self, cls, kind):
+        """Return a subclass of cls with timing wrappers around the methods for kind."""
+        if (cls, kind) not in self._classes:
+            namespace = {}
+            for name in self.methods[kind]:
+                if any(name in c.__dict__ for c in cls.__mro__):
+                    namespace[name] = self._wrap(getattr(cls, name), name)
+            self._classes[(cls, kind)] = type(cls.__name__, (cls,), namespace)
+        return self._classes[(cls, kind)]
+
+    def _wrap(self, func, name):
+        profiler = self
+
+        def wrapper(obj, *args, **kwargs):
+            t0 = time.perf_counter()
+            result = func(obj, *args, **kwargs)
+            dt = time.perf_counter() - t0
+            if name == "add_observation":
+                if "indx" in kwargs:
+                    size = np.size(kwargs["indx"])
+                elif len(args) > 1:
+                    size = np.size(args[1])
+                else:
+                    size = 0
+            else:
+                size = np.size(result)
+            profiler._record(obj, name, dt, size)
+            return result
+
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def _record(self, obj, name, dt, size):
+        kind, label = self._labels.get(id(obj), ("", type(obj).__name__))
+        key = (kind, label, name)
+        if key not in self.stats:
+            self.stats[key] = [0, 0.0, 0]
+        stat = self.stats[key]
+        stat[0] += 1
+        stat[1] += dt
+        stat[2] += size
+
+    def report(self, sort_by="time", n_max=None):
+        """Return the profiling results as a table.
+
+        Parameters
+        ----------
+        sort_by : `str`, opt
+            The column to sort by (in descending order), e.g. 'time', 'calls', 'time_per_call',
+            'cache_hits' or 'mean_size'. Default 'time'.
+        n_max : `int`, opt
+            If set, only return the first n_max rows. Default None.
+
+        Returns
+        -------
+        report : `pandas.DataFrame`
+            One row per instrumented method of each object, with columns kind, object, method,
+            calls, time (cumulative seconds, including the time spent in nested calls),
+            time_per_call, cache_hits (basis function __call__ only) and mean_size.
+        """
+        rows = []
+        for (kind, label, name), (calls, total, size) in self.stats.items():
+            cache_hits = 0
+            if kind == "basis_function" and name == "__call__":
+                n_calc = self.stats.get((kind, label, "_calc_value"), [0])[0]
+                cache_hits = max(calls - n_calc, 0)
+            rows.append(
+                {
+                    "kind": kind,
+                    "object": label,
+                    "method": name,
+                    "calls": calls,
+                    "time": total,
+                    "time_per_call": total / calls,
+                    "cache_hits": cache_hits,
+                    "mean_size": size / calls,
+                }
+            )
+        columns = [
+            "kind",
+            "object",
+            "method",
+            "calls",
+            "time",
+            "time_per_call",
+            "cache_hits",
+            "mean_size",
+        ]
+        result = pd.DataFrame(rows, columns=columns)
+        result = result.sort_values(sort_by, ascending=False).reset_index(drop=True)
+        if n_max is not None:
+            result = result[:n_max]
+        return result
@@ -1,3 +1,4 @@
+import time
 import numpy as np
 import scipy.spatial as spatial
 import itertools
@@ -14,6 +15,11 @@ __all__ = [
     "merge_hulls",
     "three_opt",
     "tsp_convex",
+    "cheapest_insertion",
+    "two_opt",
+    "or_opt",
+    "tsp_insertion",
+    "tsp_benchmark",
 ]
 
 
@@ -211,3 +217,287 @@ def tsp_convex(towns, optimize=False, niter=10):
             if iter_count == niter:
                 return route
     return route
+
+
+def cheapest_insertion(dist_matrix, start_route):
+    """Build a route by repeatedly inserting the town that increases the route length the least
+
+    Parameters
+    ----------
+    dist_matrix : np.array
+        The (n,n) matrix of distances between towns
+    start_route : array of int
+        The indices of the towns in the initial route (e.g., the convex hull)
+
+    Returns
+    -------
+    route : np.array of int
+        The indices of all the towns, in route order
+    """
+    n_towns = dist_matrix.shape[0]
+    start_route = np.asarray(start_route, dtype=int)
+    # Route stored as a linked list, next_town[i] is the town after i
+    next_town = np.full(n_towns, -1, dtype=int)
+    next_town[start_route] = np.roll(start_route, -1)
+
+    remaining = np.setdiff1d(np.arange(n_towns), start_route)
+    # For each remaining town, the cheapest cost to insert it and the start of the edge to insert into
+    if remaining.size > 0:
+        best_cost, best_edge = _best_insertions(dist_matrix, next_town, remaining)
+
+    while remaining.size > 0:
+        # Ties go to the lowest index for a deterministic route
+        pick = np.argmin(best_cost)
+        town = remaining[pick]
+        left = best_edge[pick]
+        right = next_town[left]
+        next_town[town] = right
+        next_town[left] = town
+
+        remaining = np.delete(remaining, pick)
+        best_cost = np.delete(best_cost, pick)
+        best_edge = np.delete(best_edge, pick)
+        if remaining.size == 0:
+            break
+        # Towns that wanted the edge we just split need a full re-check
+        stale = best_edge == left
+        if np.any(stale):
+            best_cost[stale], best_edge[stale] = _best_insertions(
+                dist_matrix, next_town, remaining[stale]
+            )
+        # Everything else only needs to check the two new edges
+        for new_left, new_right in ((left, town), (town, right)):
+            cost = (
+                dist_matrix[new_left, remaining]
+                + dist_matrix[remaining, new_right]
+                - dist_matrix[new_left, new_right]
+            )
+            better = (cost < best_cost) & ~stale
+            best_cost[better] = cost[better]
+            best_edge[better] = new_left
+
+    route = np.empty(n_towns, dtype=int)
+    town = start_route[0]
+    for i in range(n_towns):
+        route[i] = town
+        town = next_town[town]
+    return route
+
+
+def _best_insertions(dist_matrix, next_town, towns):
+    """Cheapest insertion cost and edge (start town) for each of towns, given the current route"""
+    lefts = np.where(next_town >= 0)[0]
+    rights = next_town[lefts]
+    costs = (
+        dist_matrix[lefts][:, towns]
+        + dist_matrix[towns][:, rights].T
+        - dist_matrix[lefts, rights][:, np.newaxis]
+    )
+    indx = np.argmin(costs, axis=0)
+    return costs[indx, np.arange(towns.size)], lefts[indx]
+
+
+def two_opt(route, dist_matrix):
+    """Find the best 2-opt move (reversing a section of the route) and apply it
+
+    Parameters
+    ----------
+    route : np.array of int
+        The indices of the route
+    dist_matrix : np.array
+        Distance matrix for the towns
+
+    Returns
+    -------
+    route : np.array of int
+        The new route
+    gain : float
+        The decrease in route length (zero if no move shortens the route)
+    """
+    n_towns = route.size
+    if n_towns < 4:
+        return route, 0
+    town_next = np.roll(route, -1)
+    # Gain from replacing edges (i,i+1) and (j,j+1) with (i,j) and (i+1,j+1)
+    gain = (
+        dist_matrix[route, town_next][:, np.newaxis]
+        + dist_matrix[route, town_next][np.newaxis, :]
+        - dist_matrix[route][:, route]
+        - dist_matrix[town_next][:, town_next]
+    )
+    # Only i < j-1, and the first and last edges are adjacent
+    valid = np.triu(np.ones((n_towns, n_towns), dtype=bool), k=2)
+    valid[0, -1] = False
+    gain = np.where(valid, gain, 0)
+    best = np.argmax(gain)
+    i, j = np.unravel_index(best, gain.shape)
+    if gain[i, j] <= 0:
+        return route, 0
+    route = route.copy()
+    route[i + 1 : j + 1] = route[i + 1 : j + 1][::-1]
+    return route, gain[i, j]
+
+
+def or_opt(route, dist_matrix, max_segment=3):
+    """Find the best Or-opt move (moving a short section of the route elsewhere) and apply it
+
+    Parameters
+    ----------
+    route : np.array of int
+        The indices of the route
+    dist_matrix : np.array
+        Distance matrix for the towns
+    max_segment : int (3)
+        The longest section of the route to try moving
+
+    Returns
+    -------
+    route : np.array of int
+        The new route
+    gain : float
+        The decrease in route length (zero if no move shortens the route)
+    """
+    n_towns = route.size
+    best_gain = 0
+    best_move = None
+    positions = np.arange(n_towns)
+    town_next = np.roll(route, -1)
+    edge_lengths = dist_matrix[route, town_next]
+    for seg_length in range(1, max_segment + 1):
+        if n_towns < seg_length + 3:
+            break
+        # Segment starting at position s runs to position e
+        first = route
+        last = route[(positions + seg_length - 1) % n_towns]
+        before = route[(positions - 1) % n_towns]
+        after = route[(positions + seg_length) % n_towns]
+        removal_gain = (
+            dist_matrix[before, first]
+            + dist_matrix[last, after]
+            - dist_matrix[before, after]
+        )
+        # Cost of inserting the segment into edge t, forwards and reversed
+        forward = (
+            dist_matrix[route][:, first].T
+            + dist_matrix[last][:, town_next]
+            - edge_lengths[np.newaxis, :]
+        )
+        backward = (
+            dist_matrix[route][:, last].T
+            + dist_matrix[first][:, town_next]
+            - edge_lengths[np.newaxis, :]
+        )
+        # Can't insert into an edge that touches the segment
+        offset = (positions[np.newaxis, :] - positions[:, np.newaxis]) % n_towns
+        invalid = (offset < seg_length) | (offset == n_towns - 1)
+        for reverse, insert_cost in enumerate((forward, backward)):
+            gain = np.where(invalid, 0, removal_gain[:, np.newaxis] - insert_cost)
+            best = np.argmax(gain)
+            s, t = np.unravel_index(best, gain.shape)
+            if gain[s, t] > best_gain:
+                best_gain = gain[s, t]
+                best_move = (s, t, seg_length, reverse)
+
+    if best_move is None:
+        return route, 0
+    s, t, seg_length, reverse = best_move
+    segment = route[(s + np.arange(seg_length)) % n_towns]
+    if reverse:
+        segment = segment[::-1]
+    # The rest of the route, starting just after the segment
+    rest = route[(s + seg_length + np.arange(n_towns - seg_length)) % n_towns]
+    insert_after = (t - s - seg_length) % n_towns
+    route = np.concatenate(
+        (rest[: insert_after + 1], segment, rest[insert_after + 1 :])
+    )
+    return route, best_gain
+
+
+def tsp_insertion(towns, optimize=True, niter=1000):
+    """Find a route through towns using cheapest insertion, optionally improved with 2-opt and Or-opt
+
+    A faster alternative to `tsp_convex`. The route starts from the convex hull and the
+    remaining towns are inserted where they add the least to the route length. The
+    distances are rounded to integers, so with integer town positions the route is
+    deterministic and identical across platforms.
+
+    Parameters
+    ----------
+    towns : np.array (shape n,2)
+        The points to find a path through
+    optimize : bool (True)
+        Improve the route with 2-opt and Or-opt moves until neither shortens it
+    niter : int (1000)
+        Max number of improving moves to make.
+
+    Returns
+    -------
+    indices that order towns.
+    """
+    n_towns = towns.shape[0]
+    if n_towns <= 3:
+        return np.arange(n_towns)
+    dist_matrix = np.round(generate_dist_matrix(towns)).astype(np.int64)
+    try:
+        start_route = spatial.ConvexHull(towns).vertices
+    except spatial.QhullError:
+        # Degenerate (collinear) towns, start from the two towns furthest apart
+        start_route = np.unravel_index(np.argmax(dist_matrix), dist_matrix.shape)
+    route = cheapest_insertion(dist_matrix, start_route)
+
+    if optimize:
+        for i in range(niter):
+            route, gain = two_opt(route, dist_matrix)
+            if gain <= 0:
+                route, gain = or_opt(route, dist_matrix)
+            if gain <= 0:
+                break
+    return route
+
+
+def tsp_benchmark(n_towns=[20, 50, 100, 200], n_trials=5, scale=1e4, seed=42):
+    """Compare the route length and run time of the TSP solvers on random towns
+
+    Parameters
+    ----------
+    n_towns : list of int
+        The number of towns to try
+    n_trials : int (5)
+        The number of random sets of towns for each number of towns
+    scale : float (1e4)
+        The towns are random integer positions between 0 and scale
+    seed : int (42)
+        Random number seed
+
+    Returns
+    -------
+    result : np.array
+        Mean route length and time (seconds) for each solver and number of towns
+    """
+    solvers = {
+        "convex": lambda towns: tsp_convex(towns, optimize=False),
+        "insertion": lambda towns: tsp_insertion(towns, optimize=False),
+        "insertion+opt": lambda towns: tsp_insertion(towns, optimize=True),
+    }
+    rng = np.random.default_rng(seed)
+    names = ["solver", "n_towns", "route_length", "time"]
+    types = ["U20", int, float, float]
+    result = np.zeros(len(solvers) * len(n_towns), dtype=list(zip(names, types)))
+    i = 0
+    for n in n_towns:
+        all_towns = [
+            np.round(rng.random((n, 2)) * scale).astype(int)
+            for trial in range(n_trials)
+        ]
+        for name, solver in solvers.items():
+            lengths = []
+            t0 = time.perf_counter()
+            for towns in all_towns:
+                route = solver(towns)
+                lengths.append(route_length(route, generate_dist_matrix(towns)))
+            result[i]["time"] = (time.perf_counter() - t0) / n_trials
+            result[i]["solver"] = name
+            result[i]["n_towns"] = n
+            result[i]["route_length"] = np.mean(lengths)
+            i += 1
+    return result
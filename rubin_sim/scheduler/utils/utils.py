@@ -1,5 +1,6 @@
 import os
 import sqlite3
+from collections import OrderedDict
 import datetime
 import socket
 import numpy as np
@@ -17,11 +18,19 @@ import rubin_sim.version as rsVersion
 
 __all__ = [
     "int_rounded",
+    "rounded",
+    "rounded_eq",
+    "rounded_ne",
+    "rounded_lt",
+    "rounded_le",
+    "rounded_gt",
+    "rounded_ge",
     "int_binned_stat",
     "smallest_signed_angle",
     "schema_converter",
     "hp_in_comcam_fov",
     "hp_in_lsst_fov",
+    "indx_csr_subset",
     "hp_kd_tree",
     "match_hp_resolution",
     "TargetoO",
@@ -116,6 +125,58 @@ class int_rounded(object):
         return result
 
 
+def rounded(inval, scale=1e5):
+    """Scale up and round to integers, the same as int_rounded(inval, scale).value
+
+    Parameters
+    ----------
+    inval : float or np.array
+        The value(s) to round.
+    scale : float (1e5)
+        How much to scale inval before rounding and converting to an int.
+
+    Returns
+    -------
+    The rounded value(s), as int.
+    """
+    if np.ndim(inval) == 0:
+        return np.round(inval * scale).astype(int)
+    result = np.multiply(inval, scale)
+    np.round(result, out=result)
+    return result.astype(int)
+
+
+# Comparisons that match using int_rounded on both sides, without making the wrapper objects.
+def rounded_eq(a, b, scale=1e5):
+    """a == b, compared as int_rounded values"""
+    return rounded(a, scale) == rounded(b, scale)
+
+
+def rounded_ne(a, b, scale=1e5):
+    """a != b, compared as int_rounded values"""
+    return rounded(a, scale) != rounded(b, scale)
+
+
+def rounded_lt(a, b, scale=1e5):
+    """a < b, compared as int_rounded values"""
+    return rounded(a, scale) < rounded(b, scale)
+
+
+def rounded_le(a, b, scale=1e5):
+    """a <= b, compared as int_rounded values"""
+    return rounded(a, scale) <= rounded(b, scale)
+
+
+def rounded_gt(a, b, scale=1e5):
+    """a > b, compared as int_rounded values"""
+    return rounded(a, scale) > rounded(b, scale)
+
+
+def rounded_ge(a, b, scale=1e5):
+    """a >= b, compared as int_rounded values"""
+    return rounded(a, scale) >= rounded(b, scale)
+
+
 def set_default_nside(nside=None):
     """
     Utility function to set a default nside value across the scheduler.
@@ -162,10 +223,11 @@ def restore_scheduler(
     observations = observations[good_obs]
 
     # replay the observations back into the scheduler
-    for obs in observations:
-        scheduler.add_observation(obs)
-        if filter_sched is not None:
+    scheduler.add_observation(observations)
+    if filter_sched is not None:
+        for obs in observations:
             filter_sched.add_observation(obs)
+    obs = observations[-1]
 
     if filter_sched is not None:
         # Make sure we have mounted the right filters for the night
@@ -393,8 +455,13 @@ class schema_converter:
         # Put LMST into degrees too
         self.angles_hours2deg = ["observationStartLST"]
 
-    def obs2opsim(self, obs_array, filename=None, info=None, delete_past=False):
-        """convert an array of observations into a pandas dataframe with Opsim schema"""
+    def obs2opsim(
+        self, obs_array, filename=None, info=None, delete_past=False, append=False
+    ):
+        """convert an array of observations into a pandas dataframe with Opsim schema
+
+        If append is True, the observations are added to an existing observations table in filename.
+        """
         if delete_past:
             try:
                 os.remove(filename)
@@ -410,10 +477,14 @@ class schema_converter:
 
         if filename is not None:
             con = sqlite3.connect(filename)
-            df.to_sql("observations", con, index=False)
+            if append:
+                df.to_sql("observations", con, index=False, if_exists="append")
+            else:
+                df.to_sql("observations", con, index=False)
             if info is not None:
                 df = pd.DataFrame(info)
                 df.to_sql("info", con)
+            con.close()
 
     def opsim2obs(self, filename):
         """convert an opsim schema dataframe into an observation array."""
@@ -699,18 +770,122 @@ def hp_kd_tree(nside=None, leafsize=100, scale=1e5):
     return _buildTree(ra, dec, leafsize, scale=scale)
 
 
-class hp_in_lsst_fov(object):
+class _cached_fov(object):
+    """Base class for the field of view models, with a batched lookup and a least-recently-used
+    cache of the healpixels in each pointing.
+
+    Sub-classes define `_key`, which turns pointings into hashable cache keys, and `_lookup`,
+    which finds the (sorted) healpixels for a list of keys.
+
+    The healpixels are returned in increasing order. With a cache, the arrays returned for
+    single pointings are shared with the cache, and so are read-only: copy them before
+    modifying them in place.
+    """
+
+    def _init_cache(self, cache_size):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _key(self, ra, dec, rotSkyPos):
+        raise NotImplementedError
+
+    def _lookup(self, keys):
+        raise NotImplementedError
+
+    def _cached_lookup(self, keys):
+        """Return the healpixels for each key, only looking up the keys that are not cached."""
+        result = [self._cache.get(key) for key in keys]
+        missing = list(
+            OrderedDict.fromkeys(
+                key for key, indices in zip(keys, result) if indices is None
+            )
+        )
+        if len(missing) > 0:
+            found = dict(zip(missing, self._lookup(missing)))
+            result = [
+                found[key] if indices is None else indices
+                for key, indices in zip(keys, result)
+            ]
+        if self.cache_size > 0:
+            for key, indices in zip(keys, result):
+                # Cached arrays are shared, so protect them from being modified in place
+                indices.flags.writeable = False
+                self._cache[key] = indices
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def __call__(self, ra, dec, rotSkyPos=0.0, **kwargs):
+        """
+        Parameters
+        ----------
+        ra : float
+            RA in radians
+        dec : float
+            Dec in radians
+        rotSkyPos : float (0.)
+            The rotation angle of the camera in radians
+
+        Returns
+        -------
+        indx : numpy array
+            The healpixels that are within the FoV, sorted. Read-only if the cache is used.
+        """
+        key = self._key(np.max(ra), np.max(dec), np.max(rotSkyPos))[0]
+        return self._cached_lookup([key])[0]
+
+    def batch(self, ra, dec, rotSkyPos=0.0):
+        """Find the healpixels within many pointings at once
+
+        Parameters
+        ----------
+        ra : np.array
+            RA of the pointings in radians
+        dec : np.array
+            Dec of the pointings in radians
+        rotSkyPos : float or np.array (0.)
+            The rotation angles of the camera in radians
+
+        Returns
+        -------
+        indices : np.array
+            The healpixels within all of the pointings, concatenated (a new array, with the
+            healpixels of each pointing sorted).
+        indptr : np.array
+            The healpixels within pointing i are indices[indptr[i]:indptr[i+1]]
+            (i.e., the compressed sparse row format).
+        """
+        ra = np.atleast_1d(ra)
+        dec = np.atleast_1d(dec)
+        rotSkyPos = np.broadcast_to(rotSkyPos, ra.shape)
+        result = self._cached_lookup(self._key(ra, dec, rotSkyPos))
+        indptr = np.zeros(ra.size + 1, dtype=int)
+        indptr[1:] = np.cumsum([np.size(indices) for indices in result])
+        if len(result) > 0:
+            indices = np.concatenate(result).astype(int)
+        else:
+            indices = np.array([], dtype=int)
+        return indices, indptr
+
+
+class hp_in_lsst_fov(_cached_fov):
     """
     Return the healpixels within a pointing. A very simple LSST camera model with
     no chip/raft gaps.
+
+    The healpixels in each pointing are cached, keyed by the pointing position rounded
+    to the kd-tree resolution (scale), so revisited fields are only looked up once.
     """
 
-    def __init__(self, nside=None, fov_radius=1.75, scale=1e5):
+    def __init__(self, nside=None, fov_radius=1.75, scale=1e5, cache_size=10000):
         """
         Parameters
         ----------
         fov_radius : float (1.75)
             Radius of the filed of view in degrees
+        cache_size : int (10000)
+            The number of pointings to cache. Set to zero to disable the cache.
         """
         if nside is None:
             nside = set_default_nside()
@@ -718,51 +893,53 @@ class hp_in_lsst_fov(object):
         self.tree = hp_kd_tree(nside=nside, scale=scale)
         self.radius = np.round(xyz_angular_radius(fov_radius) * scale).astype(int)
         self.scale = scale
+        self._init_cache(cache_size)
 
-    def __call__(self, ra, dec, **kwargs):
-        """
-        Parameters
-        ----------
-        ra : float
-            RA in radians
-        dec : float
-            Dec in radians
-
-        Returns
-        -------
-        indx : numpy array
-            The healpixels that are within the FoV
-        """
-
-        x, y, z = _xyz_from_ra_dec(np.max(ra), np.max(dec))
+    def _key(self, ra, dec, rotSkyPos):
+        # The kd-tree is in integer (scaled) coordinates, so the rounded position sets the result
+        x, y, z = _xyz_from_ra_dec(np.atleast_1d(ra), np.atleast_1d(dec))
         x = np.round(x * self.scale).astype(int)
         y = np.round(y * self.scale).astype(int)
         z = np.round(z * self.scale).astype(int)
+        return list(zip(x.tolist(), y.tolist(), z.tolist()))
 
-        indices = self.tree.query_ball_point((x, y, z), self.radius)
-        return np.array(indices)
+    def _lookup(self, keys):
+        result = self.tree.query_ball_point(
+            np.array(keys), self.radius, return_sorted=True
+        )
+        return [np.array(indices, dtype=int) for indices in result]
 
 
-class hp_in_comcam_fov(object):
+class hp_in_comcam_fov(_cached_fov):
     """
     Return the healpixels within a ComCam pointing. Simple camera model
     with no chip gaps.
+
+    The healpixels in each pointing are cached, keyed by the exact pointing position
+    and rotation angle.
     """
 
-    def __init__(self, nside=None, side_length=0.7):
+    def __init__(self, nside=None, side_length=0.7, scale=1e5, cache_size=10000):
         """
         Parameters
         ----------
         side_length : float (0.7)
             The length of one side of the square field of view (degrees).
+        scale : float (1e5)
+            The scale of the (integer) kd-tree coordinates.
+        cache_size : int (10000)
+            The number of pointings to cache. Set to zero to disable the cache.
         """
         if nside is None:
             nside = set_default_nside()
         self.nside = nside
-        self.tree = hp_kd_tree(nside=nside)
+        self.scale = scale
+        self.tree = hp_kd_tree(nside=nside, scale=scale)
         self.side_length = np.radians(side_length)
-        self.inner_radius = xyz_angular_radius(side_length / 2.0)
-        self.outter_radius = xyz_angular_radius(side_length / 2.0 * np.sqrt(2.0))
+        self.inner_radius = xyz_angular_radius(side_length / 2.0) * scale
+        self.outter_radius = (
+            xyz_angular_radius(side_length / 2.0 * np.sqrt(2.0)) * scale
+        )
         # The positions of the raft corners, unrotated
         self.corners_x = np.array(
             [
@@ -780,59 +957,88 @@ class hp_in_comcam_fov(object):
                 self.side_length / 2.0,
             ]
         )
-
-    def __call__(self, ra, dec, rotSkyPos=0.0):
-        """
-        Parameters
-        ----------
-        ra : float
-            RA in radians
-        dec : float
-            Dec in radians
-        rotSkyPos : float
-            The rotation angle of the camera in radians
-        Returns
-        -------
-        indx : numpy array
-            The healpixels that are within the FoV
-        """
-        x, y, z = _xyz_from_ra_dec(np.max(ra), np.max(dec))
+        self._init_cache(cache_size)
+
+    def _key(self, ra, dec, rotSkyPos):
+        ra = np.atleast_1d(ra).astype(float)
+        dec = np.atleast_1d(dec).astype(float)
+        rotSkyPos = np.broadcast_to(rotSkyPos, ra.shape).astype(float)
+        return list(zip(ra.tolist(), dec.tolist(), rotSkyPos.tolist()))
+
+    def _lookup(self, keys):
+        ra, dec, rotSkyPos = np.array(keys).T
+        x, y, z = _xyz_from_ra_dec(ra, dec)
+        # The kd-tree is in integer (scaled) coordinates
+        points = np.round(np.array([x, y, z]).T * self.scale).astype(int)
         # Healpixels within the inner circle
-        indices = self.tree.query_ball_point((x, y, z), self.inner_radius)
+        inner = self.tree.query_ball_point(
+            points, self.inner_radius, return_sorted=False
+        )
         # Healpixels withing the outer circle
-        indices_all = np.array(
-            self.tree.query_ball_point((x, y, z), self.outter_radius)
+        outer = self.tree.query_ball_point(
+            points, self.outter_radius, return_sorted=False
         )
-        indices_to_check = indices_all[np.in1d(indices_all, indices, invert=True)]
-
-        cos_rot = np.cos(rotSkyPos)
-        sin_rot = np.sin(rotSkyPos)
-        x_rotated = self.corners_x * cos_rot - self.corners_y * sin_rot
-        y_rotated = self.corners_x * sin_rot + self.corners_y * cos_rot
-
-        # Draw the square that we want to check if points are in.
-        bbPath = mplPath.Path(
-            np.array(
-                [
-                    [x_rotated[0], y_rotated[0]],
-                    [x_rotated[1], y_rotated[1]],
-                    [x_rotated[2], y_rotated[2]],
-                    [x_rotated[3], y_rotated[3]],
-                    [x_rotated[0], y_rotated[0]],
-                ]
+
+        result = []
+        for i in range(len(keys)):
+            indices = list(inner[i])
+            indices_all = np.array(outer[i], dtype=int)
+            indices_to_check = indices_all[np.in1d(indices_all, indices, invert=True)]
+
+            cos_rot = np.cos(rotSkyPos[i])
+            sin_rot = np.sin(rotSkyPos[i])
+            x_rotated = self.corners_x * cos_rot - self.corners_y * sin_rot
+            y_rotated = self.corners_x * sin_rot + self.corners_y * cos_rot
+
+            # Draw the square that we want to check if points are in.
+            bbPath = mplPath.Path(
+                np.array(
+                    [
+                        [x_rotated[0], y_rotated[0]],
+                        [x_rotated[1], y_rotated[1]],
+                        [x_rotated[2], y_rotated[2]],
+                        [x_rotated[3], y_rotated[3]],
+                        [x_rotated[0], y_rotated[0]],
+                    ]
+                )
             )
-        )
 
-        ra_to_check, dec_to_check = _hpid2RaDec(self.nside, indices_to_check)
+            ra_to_check, dec_to_check = _hpid2RaDec(self.nside, indices_to_check)
+
+            # Project the indices to check to the tangent plane, see if they fall inside the polygon
+            x_check, y_check = gnomonic_project_toxy(
+                ra_to_check, dec_to_check, ra[i], dec[i]
+            )
+            if np.size(x_check) > 0:
+                inside = bbPath.contains_points(np.array([x_check, y_check]).T)
+                indices.extend(indices_to_check[inside])
+
+            result.append(np.sort(np.array(indices, dtype=int)))
+        return result
+
 
-        # Project the indices to check to the tangent plane, see if they fall inside the polygon
-        x, y = gnomonic_project_toxy(ra_to_check, dec_to_check, ra, dec)
-        for i, xcheck in enumerate(x):
-            # I wonder if I can do this all at once rather than a loop?
-            if bbPath.contains_point((x[i], y[i])):
-                indices.append(indices_to_check[i])
+def indx_csr_subset(indx_csr, good):
+    """Select some of the pointings of a CSR list of healpixel indices
 
-        return np.array(indices)
+    Parameters
+    ----------
+    indx_csr : tuple of np.array
+        The healpixel indices of many pointings, as (indices, indptr), so pointing i
+        covers indices[indptr[i]:indptr[i+1]] (e.g., from hp_in_lsst_fov.batch).
+    good : np.array of bool
+        Which pointings to keep.
+
+    Returns
+    -------
+    indx_csr : tuple of np.array
+        The (indices, indptr) of the selected pointings.
+    """
+    indices, indptr = indx_csr
+    counts = np.diff(indptr)
+    rows = np.repeat(np.arange(counts.size), counts)
+    new_indptr = np.zeros(np.sum(good) + 1, dtype=int)
+    new_indptr[1:] = np.cumsum(counts[good])
+    return indices[good[rows]], new_indptr
 
 
 def run_info_table(observatory, extra_info=None):
@@ -895,8 +1101,7 @@ def warm_start(scheduler, observations, mjd_key="mjd"):
 
     # Check that observations are in order
     observations.sort(order=mjd_key)
-    for observation in observations:
-        scheduler.add_observation(observation)
+    scheduler.add_observation(observations)
 
     return scheduler
 
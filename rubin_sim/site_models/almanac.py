@@ -1,11 +1,84 @@
 import numpy as np
-from scipy.interpolate import interp1d
+from scipy.interpolate import make_interp_spline
 import os
 from rubin_sim.data import get_data_dir
 
 __all__ = ["Almanac"]
 
 
+class _Spline_table(object):
+    """Piecewise polynomial interpolation of several quantities sampled at the same times.
+
+    The polynomial coefficients of the interpolating splines (the same splines as
+    scipy's interp1d of the same kind) are computed once, for all of the quantities at
+    the same breakpoints. Evaluating the table then takes a single search for the
+    interval, shared by all of the quantities, and works on arrays of times.
+
+    Parameters
+    ----------
+    x : np.array
+        The (sorted) times the quantities are sampled at.
+    values : dict
+        The sampled quantities, keyed by name.
+    kind : str ('quadratic')
+        The kind of spline, as for interp1d ('linear', 'quadratic' or 'cubic').
+    """
+
+    def __init__(self, x, values, kind="quadratic"):
+        order = {"linear": 1, "quadratic": 2, "cubic": 3}[kind]
+        self.names = list(values.keys())
+        spline = make_interp_spline(
+            x, np.column_stack([values[name] for name in self.names]), k=order
+        )
+        self.breaks = np.unique(spline.t[order : spline.t.size - order])
+        # Taylor coefficients of each interval, highest power first, from the
+        # derivatives at the left edge of the interval.
+        left = self.breaks[:-1]
+        factorial = 1.0
+        coeffs = [spline(left)]
+        for nu in range(1, order + 1):
+            factorial *= nu
+            coeffs.append(spline(left, nu=nu) / factorial)
+        self.coeffs = np.array(coeffs[::-1])
+
+    def __call__(self, x):
+        """Evaluate all of the quantities at x
+
+        Parameters
+        ----------
+        x : float or np.array
+            The time(s) to interpolate to.
+
+        Returns
+        -------
+        result : dict
+            The interpolated values, keyed by name, with the shape of x.
+        """
+        x = np.asarray(x, dtype=float)
+        if np.any(x < self.breaks[0]) | np.any(x > self.breaks[-1]):
+            raise ValueError(
+                "Requested time out of the interpolation range (%f-%f)"
+                % (self.breaks[0], self.breaks[-1])
+            )
+        indx = np.searchsorted(self.breaks, x, side="right") - 1
+        indx = np.clip(indx, 0, self.breaks.size - 2)
+        dx = (x - self.breaks[indx])[..., np.newaxis]
+        coeffs = self.coeffs[:, indx]
+        values = coeffs[0]
+        for coeff in coeffs[1:]:
+            values = values * dx + coeff
+        return {name: values[..., i] for i, name in enumerate(self.names)}
+
+
+def _longitude(x, y):
+    """The angle (radians, between 0 and 2pi) of interpolated cos and sin values"""
+    # Need to wrap in case sent a scalar
+    result = np.array([np.arctan2(y, x)]).ravel()
+    negative_angles = np.where(result < 0.0)[0]
+    result[negative_angles] = 2.0 * np.pi + result[negative_angles]
+    return result
+
+
 class Almanac(object):
     """Class to load and return pre-computed information about the LSST site."""
 
@@ -28,81 +101,33 @@ class Almanac(object):
         self.sun_moon = temp["sun_moon_info"].copy()
         temp.close()
 
-        self.interpolators = {
-            "sun_alt": interp1d(
-                self.sun_moon["mjd"], self.sun_moon["sun_alt"], kind=kind
-            ),
-            "sun_az_x": interp1d(
-                self.sun_moon["mjd"], np.cos(self.sun_moon["sun_az"]), kind=kind
-            ),
-            "sun_az_y": interp1d(
-                self.sun_moon["mjd"], np.sin(self.sun_moon["sun_az"]), kind=kind
-            ),
-            "sun_RA_x": interp1d(
-                self.sun_moon["mjd"], np.cos(self.sun_moon["sun_RA"]), kind=kind
-            ),
-            "sun_RA_y": interp1d(
-                self.sun_moon["mjd"], np.sin(self.sun_moon["sun_RA"]), kind=kind
-            ),
-            "sun_dec": interp1d(
-                self.sun_moon["mjd"], self.sun_moon["sun_dec"], kind=kind
-            ),
-            "moon_alt": interp1d(
-                self.sun_moon["mjd"], self.sun_moon["moon_alt"], kind=kind
-            ),
-            "moon_az_x": interp1d(
-                self.sun_moon["mjd"], np.cos(self.sun_moon["moon_az"]), kind=kind
-            ),
-            "moon_az_y": interp1d(
-                self.sun_moon["mjd"], np.sin(self.sun_moon["moon_az"]), kind=kind
-            ),
-            "moon_RA_x": interp1d(
-                self.sun_moon["mjd"], np.cos(self.sun_moon["moon_RA"]), kind=kind
-            ),
-            "moon_RA_y": interp1d(
-                self.sun_moon["mjd"], np.sin(self.sun_moon["moon_RA"]), kind=kind
-            ),
-            "moon_dec": interp1d(
-                self.sun_moon["mjd"], self.sun_moon["moon_dec"], kind=kind
-            ),
-            "moon_phase": interp1d(
-                self.sun_moon["mjd"], self.sun_moon["moon_phase"], kind=kind
-            ),
-        }
+        # Longitudes are interpolated as x and y, to handle the wrap around
+        values = {}
+        for key in ["sun_alt", "sun_dec", "moon_alt", "moon_dec", "moon_phase"]:
+            values[key] = self.sun_moon[key]
+        for key in ["sun_az", "moon_az", "sun_RA", "moon_RA"]:
+            values[key + "_x"] = np.cos(self.sun_moon[key])
+            values[key + "_y"] = np.sin(self.sun_moon[key])
+        self.sun_moon_table = _Spline_table(self.sun_moon["mjd"], values, kind=kind)
 
         temp = np.load(os.path.join(data_dir, "planet_locations.npz"))
         self.planet_loc = temp["planet_loc"].copy()
         temp.close()
 
         self.planet_names = ["venus", "mars", "jupiter", "saturn"]
-        self.planet_interpolators = {}
+        values = {}
         for pn in self.planet_names:
-            self.planet_interpolators[pn + "_RA_x"] = interp1d(
-                self.planet_loc["mjd"], np.cos(self.planet_loc[pn + "_RA"]), kind=kind
-            )
-            self.planet_interpolators[pn + "_RA_y"] = interp1d(
-                self.planet_loc["mjd"], np.sin(self.planet_loc[pn + "_RA"]), kind=kind
-            )
-            self.planet_interpolators[pn + "_dec"] = interp1d(
-                self.planet_loc["mjd"], self.planet_loc[pn + "_dec"], kind=kind
-            )
+            values[pn + "_RA_x"] = np.cos(self.planet_loc[pn + "_RA"])
+            values[pn + "_RA_y"] = np.sin(self.planet_loc[pn + "_RA"])
+            values[pn + "_dec"] = self.planet_loc[pn + "_dec"]
+        self.planet_table = _Spline_table(self.planet_loc["mjd"], values, kind=kind)
 
     def get_planet_positions(self, mjd):
+        values = self.planet_table(mjd)
         result = {}
         for pn in self.planet_names:
-            result[pn + "_dec"] = self.planet_interpolators[pn + "_dec"](mjd)
-
-            temp_result = np.array(
-                [
-                    np.arctan2(
-                        self.planet_interpolators[pn + "_RA_y"](mjd),
-                        self.planet_interpolators[pn + "_RA_x"](mjd),
-                    )
-                ]
-            ).ravel()
-            negative_angles = np.where(temp_result < 0.0)[0]
-            temp_result[negative_angles] = 2.0 * np.pi + temp_result[negative_angles]
-            result[pn + "_RA"] = temp_result
+            result[pn + "_dec"] = values[pn + "_dec"]
+            result[pn + "_RA"] = _longitude(values[pn + "_RA_x"], values[pn + "_RA_y"])
         return result
 
     def get_sunset_info(self, mjd):
@@ -121,24 +146,14 @@ class Almanac(object):
         """
         All angles in Radians. moonPhase between 0 and 100.
         """
+        values = self.sun_moon_table(mjd)
         simple_calls = ["sun_alt", "sun_dec", "moon_alt", "moon_dec", "moon_phase"]
         result = {}
         for key in simple_calls:
-            result[key] = self.interpolators[key](mjd)
+            result[key] = values[key]
 
         longitude_calls = ["sun_az", "moon_az", "sun_RA", "moon_RA"]
         for key in longitude_calls:
-            # Need to wrap in case sent a scalar
-            temp_result = np.array(
-                [
-                    np.arctan2(
-                        self.interpolators[key + "_y"](mjd),
-                        self.interpolators[key + "_x"](mjd),
-                    )
-                ]
-            ).ravel()
-            negative_angles = np.where(temp_result < 0.0)[0]
-            temp_result[negative_angles] = 2.0 * np.pi + temp_result[negative_angles]
-            result[key] = temp_result
+            result[key] = _longitude(values[key + "_x"], values[key + "_y"])
 
         return result
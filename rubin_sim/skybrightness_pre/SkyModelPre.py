@@ -5,6 +5,7 @@ import healpy as hp
 import warnings
 from rubin_sim.utils import _angularSeparation
 from rubin_sim.data import get_data_dir
+from .sky_store import read_sky_file, load_sky_store
 
 __all__ = ["SkyModelPre", "interp_angle"]
 
@@ -67,7 +68,7 @@ class SkyModelPre(object):
     arbitrary dates.
     """
 
-    def __init__(self, data_path=None, speedLoad=True, verbose=False):
+    def __init__(self, data_path=None, speedLoad=True, verbose=False, use_store=True):
         """
         Parameters
         ----------
@@ -77,6 +78,10 @@ class SkyModelPre(object):
         speedLoad : `bool`, opt
             If True, use the small 3-day file to load found in the usual spot. Default True.
             If False, does not load any skybrightness files until called (with a date).
+        use_store : `bool`, opt
+            If there is a memory-mapped store (see `write_sky_store`) in the 'store' directory
+            of data_path, use it rather than the individual files. The store covers all of the
+            dates at once, and only the timesteps that are used are read from disk. Default True.
         """
 
         self.info = None
@@ -84,21 +89,26 @@ class SkyModelPre(object):
         self.header = None
         self.filter_names = None
         self.verbose = verbose
+        # The files the current sky brightness maps were loaded from
+        self._loaded_files = None
 
         # Look in default location for .npz files to load
-        if "SIMS_SKYBRIGHTNESS_DATA" in os.environ:
-            data_path = os.environ["SIMS_SKYBRIGHTNESS_DATA"]
-        else:
-            data_path = os.path.join(get_data_dir(), "skybrightness_pre")
+        if data_path is None:
+            if "SIMS_SKYBRIGHTNESS_DATA" in os.environ:
+                data_path = os.environ["SIMS_SKYBRIGHTNESS_DATA"]
+            else:
+                data_path = os.path.join(get_data_dir(), "skybrightness_pre")
+        store_dir = os.path.join(data_path, "store")
+        has_store = use_store & os.path.isfile(os.path.join(store_dir, "index.npz"))
 
         # Expect filenames of the form mjd1_mjd2.npz, e.g., 59632.155_59633.2.npz
         self.files = glob.glob(os.path.join(data_path, "*.npz"))
-        if len(self.files) == 0:
+        if (len(self.files) == 0) & (not has_store):
             errmssg = "Failed to find pre-computed .npz files. "
             errmssg += (
                 "Copy data from NCSA with sims_skybrightness_pre/data/data_down.sh \n"
             )
-            errmssg += "or build by running sims_skybrightness_pre/data/generate_sky.py"
+            errmssg += "or build by running rs_generate_sky"
             warnings.warn(errmssg)
         self.filesizes = np.array(
             [os.path.getsize(filename) for filename in self.files]
@@ -118,8 +128,11 @@ class SkyModelPre(object):
         # Set that nothing is loaded at this point
         self.loaded_range = np.array([-1])
 
+        if has_store:
+            # Loading the store is cheap and covers every date, so no need for the small file
+            self._load_data(None, filename=store_dir)
         # Go ahead and load the small one in the repo by default
-        if speedLoad:
+        elif speedLoad:
             self._load_data(
                 60218.0,
                 filename=os.path.join(
@@ -151,6 +164,13 @@ class SkyModelPre(object):
         del self.filter_names
 
         if filename is None:
+            if (self._loaded_files is not None) and os.path.isdir(
+                self._loaded_files[0]
+            ):
+                raise ValueError(
+                    "MJD = %f is out of range for the sky brightness store (%f-%f)"
+                    % (mjd, self.loaded_range.min(), self.loaded_range.max())
+                )
             # Figure out which file to load.
             file_indx = np.where((mjd >= self.mjd_left) & (mjd <= self.mjd_right))[0]
             if np.size(file_indx) == 0:
@@ -169,33 +189,24 @@ class SkyModelPre(object):
         else:
             self.loaded_range = None
 
-        if self.verbose:
-            print("Loading file %s" % filename)
-        # Add encoding kwarg to restore Python 2.7 generated files
-        data = np.load(filename, encoding="bytes", allow_pickle=True)
-        self.info = data["dict_of_lists"][()]
-        self.header = data["header"][()]
-        if "sky_brightness" in data.keys():
-            self.sb = data["sky_brightness"][()]
-            data.close()
-        else:
-            # the sky brightness had to go in it's own npy file
-            data.close()
-            if npyfile is None:
-                npyfile = filename[:-3] + "npy"
-            self.sb = np.load(npyfile)
-            if self.verbose:
-                print("also loading %s" % npyfile)
-
-        # Step to make sure keys are strings not bytes
-        all_dicts = [self.info, self.sb, self.header]
-        all_dicts = [
-            single_dict for single_dict in all_dicts if hasattr(single_dict, "keys")
-        ]
-        for selfDict in all_dicts:
-            for key in list(selfDict.keys()):
-                if type(key) != str:
-                    selfDict[key.decode("utf-8")] = selfDict.pop(key)
+        if os.path.isdir(filename):
+            # A memory-mapped store of all of the dates
+            self._loaded_files = (filename, None)
+            self.info, self.sb, self.header, self.filter_names = load_sky_store(
+                filename
+            )
+            self.nside = hp.npix2nside(self.sb[self.filter_names[0]].shape[1])
+            self.loaded_range = np.array(
+                [self.info["mjds"].min(), self.info["mjds"].max()]
+            )
+            return
+
+        if npyfile is None:
+            npyfile = filename[:-3] + "npy"
+        self._loaded_files = (filename, npyfile)
+        self.info, self.sb, self.header = read_sky_file(
+            filename, npyfile=npyfile, verbose=self.verbose
+        )
 
         # Ugh, different versions of the save files could have dicts or np.array.
         # Let's hope someone fits some Fourier components to the sky brightnesses and gets rid
@@ -215,6 +226,23 @@ class SkyModelPre(object):
                 [self.info["mjds"].min(), self.info["mjds"].max()]
             )
 
+    def __getstate__(self):
+        # The sky brightness maps can be several GB; rather than pickling them,
+        # only remember which files they came from and reload them on unpickling.
+        state = self.__dict__.copy()
+        for key in ["info", "sb", "header", "filter_names"]:
+            state[key] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if getattr(self, "_loaded_files", None) is not None:
+            loaded_range = self.loaded_range
+            self._load_data(
+                None, filename=self._loaded_files[0], npyfile=self._loaded_files[1]
+            )
+            self.loaded_range = loaded_range
+
     def returnSunMoon(self, mjd):
         """
         Parameters
@@ -492,3 +520,123 @@ class SkyModelPre(object):
                         )
 
         return sbs
+
+    def returnMagsArray(
+        self,
+        mjd,
+        indx,
+        airmass_mask=True,
+        planet_mask=True,
+        moon_mask=True,
+        zenith_mask=True,
+        badval=hp.UNSEEN,
+        filters=["u", "g", "r", "i", "z", "y"],
+    ):
+        """
+        Return the sky brightness for many (mjd, healpix) pairs at once, e.g. for every
+        visit of a simulated survey.
+
+        The values match calling `returnMags` for each pair, but the interpolation and
+        masking are done for all of the pairs at once, loading each file only once.
+
+        Parameters
+        ----------
+        mjd : `np.array`
+            Modified Julian Dates to interpolate to.
+        indx : `np.array`
+            The healpix IDs, one per mjd (or broadcastable to mjd).
+        badval : `float` (-1.6375e30)
+            Mask value. Defaults to the healpy mask value.
+        filters : `list`, opt
+            List of strings for the filters that should be returned.
+            Default returns ugrizy.
+
+        Returns
+        -------
+        sbs : `np.array`
+            Structured array with a field for each filter, holding the sky brightness
+            in mag/sq arcsec, with the broadcast shape of mjd and indx.
+        """
+        mjd, indx = np.broadcast_arrays(
+            np.asarray(mjd, dtype=float), np.asarray(indx, dtype=int)
+        )
+        shape = mjd.shape
+        mjd = mjd.ravel()
+        indx = indx.ravel()
+        mask_names = [
+            name
+            for name, rule in zip(
+                ["airmass", "planet", "moon", "zenith"],
+                [airmass_mask, planet_mask, moon_mask, zenith_mask],
+            )
+            if rule
+        ]
+        result = np.empty(mjd.size, dtype=[(name, float) for name in filters])
+
+        todo = np.ones(mjd.size, dtype=bool)
+        sunrise = False
+        while np.any(todo):
+            in_range = (
+                todo
+                & (mjd >= self.loaded_range.min())
+                & (mjd <= self.loaded_range.max())
+            )
+            if not np.any(in_range):
+                self._load_data(mjd[todo][0])
+                continue
+            rows = np.where(in_range)[0]
+            sunrise |= self._mags_array(
+                mjd[rows], indx[rows], mask_names, badval, filters, result, rows
+            )
+            todo[rows] = False
+
+        if sunrise:
+            warnings.warn(
+                "Requested MJD between sunrise and sunset, returning closest maps"
+            )
+        return result.reshape(shape)
+
+    def _mags_array(self, mjd, indx, mask_names, badval, filters, result, rows):
+        """Fill result[rows] with the sky brightness from the currently loaded maps.
+
+        Returns True if any of the mjds are between sunrise and sunset.
+        """
+        mjds = self.info["mjds"]
+        left = np.searchsorted(mjds, mjd) - 1
+        right = left + 1
+
+        # If we are out of bounds, use the edge map
+        high = right >= mjds.size
+        right[high] -= 1
+        low = (left < 0) & ~high
+        left[low] += 1
+        baseline = mjds[right] - mjds[left]
+        baseline[high | low] = 1.0
+        wterm = (mjd - mjds[left]) / baseline
+
+        # Between sunrise and sunset, use the closest map rather than interpolating
+        closest = baseline > self.header["timestep_max"]
+        nearest = np.where(
+            np.abs(mjds[right] - mjd) < np.abs(mjds[left] - mjd), right, left
+        )
+        left = np.where(closest, nearest, left)
+        right = np.where(closest, nearest, right)
+
+        masked = np.zeros(mjd.size, dtype=bool)
+        for mask_name in mask_names:
+            masks = self.info[mask_name + "_masks"]
+            masked |= masks[left, indx] | masks[right, indx]
+        for filter_name in filters:
+            sb_left = self.sb[filter_name][left, indx]
+            values = np.where(
+                closest,
+                sb_left,
+                sb_left * (1.0 - wterm) + self.sb[filter_name][right, indx] * wterm,
+            )
+            if len(mask_names) > 0:
+                bad = masked | np.isinf(values)
+            else:
+                bad = closest & np.isinf(values)
+            values[bad | (values == hp.UNSEEN)] = badval
+            result[filter_name][rows] = values
+        return np.any(closest)
@@ -1,2 +1,4 @@
 from .SkyModelPre import *
 from .m5percentiles import *
+from .sky_store import *
+from .sky_generation import *
@@ -328,20 +328,12 @@ if __name__ == "__main__":
 
     # Make a quick small one for speed loading
     # generate_sky(mjd0=59579, mjd_max=59579+10., outpath='healpix', outfile='small_example.npz_small')
-    # generate_sky(mjd0=59579, mjd_max=59579+10., outpath='opsimFields', fieldID=True)
-
-    nyears = 15.0  # 20  # 13
-    day_pad = 30
-    # Full year
-    # mjds = np.arange(59560, 59560+365.25*nyears+day_pad+366, 366)
-    # 6-months
-    mjds = np.arange(59560, 59560 + 366 * nyears + 366 / 2.0, 366 / 2.0)
-    # Add some time ahead of time for ComCam
-    # nyears = 3
-    # mjds = np.arange(58462, 58462+366*nyears+366/2., 366/2.)
-    count = 0
-    for mjd1, mjd2 in zip(mjds[:-1], mjds[1:]):
-        print("Generating file %i" % count)
-        # generate_sky(mjd0=mjd1, mjd_max=mjd2+day_pad, outpath='opsimFields', fieldID=True)
-        generate_sky(mjd0=mjd1, mjd_max=mjd2 + day_pad, outpath="healpix")
-        count += 1
+
+    # Compute the maps in parallel, in restartable chunks, and write a sky brightness store
+    # (this is also available as the rs_generate_sky command).
+    from rubin_sim.skybrightness_pre import generate_sky_store
+
+    nyears = 15.0
+    generate_sky_store(
+        "healpix", mjd0=59560.7, mjd_max=59560.7 + 366 * nyears, verbose=True
+    )
@@ -0,0 +1,435 @@
+import os
+import glob
+import multiprocessing
+import numpy as np
+import healpy as hp
+import palpy
+import rubin_sim.utils as utils
+from .sky_store import write_sky_store
+
+__all__ = ["generate_sky_chunk", "generate_sky_store"]
+
+# palpy.rdplan body numbers of the planets to mask
+PLANETS = {"venus": 2, "mars": 4, "jupiter": 5, "saturn": 6}
+FILTER_NAMES = ["u", "g", "r", "i", "z", "y"]
+MASK_NAMES = ["moon", "airmass", "planet", "zenith"]
+
+# The sky model of each worker process of generate_sky_store
+_worker_sky_model = None
+
+
+def _sun_altitudes(mjds, site):
+    """Sun altitude (radians) at each of the mjds."""
+    sun_alts = np.zeros(np.size(mjds), dtype=float)
+    for i, mjd in enumerate(mjds):
+        ra, dec, diam = palpy.rdplan(mjd, 0, site.longitude_rad, site.latitude_rad)
+        ha = palpy.gmst(mjd) + site.longitude_rad - ra
+        az, sun_alts[i] = palpy.de2h(ha, dec, site.latitude_rad)
+    return sun_alts
+
+
+class _Decimator(object):
+    """Drop the sky maps that can be interpolated from their neighbors, as a streaming pass.
+
+    Maps are added in time order. A map that is not required is dropped if the (linear)
+    interpolation between the kept maps on either side of it reproduces it, and any
+    previously dropped maps in between, to within dm over the unmasked pixels near
+    zenith. Only the last few maps are held; the rest are final and can be collected
+    with `pop_final`.
+
+    Parameters
+    ----------
+    dm : float
+        The maximum interpolation error (mags) for a map to be dropped.
+    timestep_max : float
+        Maps are not dropped if the kept maps on either side are further apart than
+        this (days).
+    airmass_overhead : float
+        The interpolation error is checked for pixels with airmass less than this.
+    """
+
+    def __init__(self, dm=0.2, timestep_max=15.0 / 60.0 / 24.0, airmass_overhead=1.5):
+        self.dm = dm
+        self.timestep_max = timestep_max
+        self.airmass_overhead = airmass_overhead
+        # The kept maps that could still be dropped or used for interpolation
+        self.kept = []
+        # The last 5 maps added, kept or not
+        self.recent = []
+        self.n_kept = 0
+        self.final = []
+
+    def add(self, entry):
+        """Add a map.
+
+        Parameters
+        ----------
+        entry : dict
+            With keys 'mjd', 'required' (bool), 'mags' (dict of maps per filter),
+            'airmass' (map) and 'full_mask' (map, True where the pixel is masked).
+        """
+        self.kept.append(entry)
+        self.recent.append(entry)
+        self.n_kept += 1
+        if len(self.recent) > 5:
+            del self.recent[0]
+
+        if (self.n_kept > 3) and (not self.kept[-2]["required"]):
+            if self._can_drop():
+                del self.kept[-2]
+                self.n_kept -= 1
+        while len(self.kept) > 3:
+            self.final.append(self.kept.pop(0))
+
+    def _can_drop(self):
+        first, middle, last = self.kept[-3:]
+        overhead = np.where(
+            (last["airmass"] <= self.airmass_overhead)
+            & (middle["airmass"] <= self.airmass_overhead)
+            & (~last["full_mask"])
+            & (~middle["full_mask"])
+        )
+        if (np.size(overhead[0]) == 0) | (
+            last["mjd"] - first["mjd"] >= self.timestep_max
+        ):
+            return False
+        # Linear interpolation weights
+        for entry in self.recent:
+            if (entry["mjd"] > first["mjd"]) & (entry["mjd"] < last["mjd"]):
+                wterm = (entry["mjd"] - first["mjd"]) / (last["mjd"] - first["mjd"])
+                for filter_name in entry["mags"]:
+                    interp_sky = (1.0 - wterm) * first["mags"][filter_name][overhead]
+                    interp_sky += wterm * last["mags"][filter_name][overhead]
+                    diff = np.abs(entry["mags"][filter_name][overhead] - interp_sky)
+                    diff = diff[~np.isnan(diff)]
+                    if np.size(diff) > 0:
+                        if np.max(diff) > self.dm:
+                            return False
+        return True
+
+    def pop_final(self, flush=False):
+        """Return (and forget) the maps that are final.
+
+        Parameters
+        ----------
+        flush : bool (False)
+            If True, all of the kept maps are final (there are no more maps to add).
+        """
+        if flush:
+            self.final.extend(self.kept)
+            self.kept = []
+        result = self.final
+        self.final = []
+        return result
+
+
+def generate_sky_chunk(
+    mjd0,
+    mjd_max,
+    outfile,
+    timestep=5.0,
+    timestep_max=15.0,
+    nside=32,
+    sunLimit=-12.0,
+    airmass_overhead=1.5,
+    dm=0.2,
+    airmass_limit=2.5,
+    moon_dist_limit=10.0,
+    planet_dist_limit=2.0,
+    alt_limit=86.5,
+    requireStride=3,
+    mjd_ref=None,
+    sky_model=None,
+):
+    """Pre-compute the sky brightness maps between two dates and save them.
+
+    The output files are in the same format as the files made by generate_sky.py
+    (outfile .npz with the per-timestep information and header, and a matching .npy with
+    the sky brightness maps), so they can be read by SkyModelPre or combined into a store.
+
+    Parameters
+    ----------
+    mjd0 : float
+        The starting MJD.
+    mjd_max : float
+        The MJD to stop at (not included).
+    outfile : str
+        The .npz file to save the results in. The file only appears once it is complete.
+    timestep : float (5.)
+        The timestep between sky maps (minutes).
+    timestep_max : float (15.)
+        The maximum allowable timestep (minutes) between maps that are kept.
+    nside : int (32)
+        The nside to run the healpixel map at.
+    sunLimit : float (-12)
+        Only compute maps when the sun is below this altitude (degrees).
+    airmass_overhead : float (1.5)
+        The airmass region to demand sky models are well matched before dropping
+        and assuming the timestep can be interpolated.
+    dm : float (0.2)
+        If a skymap can be interpolated from neighboring maps with precision dm,
+        that mjd is dropped.
+    airmass_limit : float (2.5)
+        Pixels with an airmass greater than airmass_limit are masked.
+    moon_dist_limit : float (10.)
+        Pixels closer than moon_dist_limit (degrees) are masked.
+    planet_dist_limit : float (2.)
+        Pixels closer than planet_dist_limit (degrees) to Venus, Mars, Jupiter, or Saturn are masked.
+    alt_limit : float (86.5)
+        Altitude limit of the telescope (degrees). Altitudes higher than this are masked.
+    requireStride : int (3)
+        Require every nth timestep, counted from mjd_ref.
+    mjd_ref : float (None)
+        The time the timesteps are counted from. Default of None uses mjd0. Chunks of a
+        longer run should share mjd_ref, so they use the same time grid.
+    sky_model : rubin_sim.skybrightness.SkyModel (None)
+        The sky model to use. Default of None makes a new one.
+    """
+    if mjd_ref is None:
+        mjd_ref = mjd0
+    if sky_model is None:
+        import rubin_sim.skybrightness as sb
+
+        sky_model = sb.SkyModel(mags=True, airmass_limit=airmass_limit)
+
+    sunLimit_rad = np.radians(sunLimit)
+    alt_limit_rad = np.radians(alt_limit)
+    site = utils.Site("LSST")
+
+    # Set the time steps, on the grid shared by all chunks
+    timestep = timestep / 60.0 / 24.0  # Convert to days
+    timestep_max = timestep_max / 60.0 / 24.0  # Convert to days
+    steps = np.arange(
+        np.ceil((mjd0 - mjd_ref) / timestep), np.ceil((mjd_max - mjd_ref) / timestep)
+    ).astype(int)
+    mjds = mjd_ref + steps * timestep
+    # Toss the mjds where the sun is up
+    night = np.where(_sun_altitudes(mjds, site) <= sunLimit_rad)
+    mjds = mjds[night]
+    steps = steps[night]
+    required_mjds = mjds[steps % requireStride == 0]
+
+    hpindx = np.arange(hp.nside2npix(nside))
+    ra, dec = utils.hpid2RaDec(nside, hpindx)
+    ra_rad = np.radians(ra)
+    dec_rad = np.radians(dec)
+
+    decimator = _Decimator(
+        dm=dm, timestep_max=timestep_max, airmass_overhead=airmass_overhead
+    )
+    kept = []
+    for mjd, step in zip(mjds, steps):
+        sky_model.setRaDecMjd(ra, dec, mjd, degrees=True)
+        if sky_model.sunAlt > sunLimit_rad:
+            continue
+        mags = sky_model.returnMags()
+        masks = {}
+        # Apply airmass masking limit
+        masks["airmass"] = (sky_model.airmass > airmass_limit) | (
+            sky_model.airmass < 1.0
+        )
+        # Apply moon distance limit
+        masks["moon"] = sky_model.moonTargSep <= np.radians(moon_dist_limit)
+        # Apply altitude limit
+        masks["zenith"] = sky_model.alts >= alt_limit_rad
+        # Apply the planet distance limits
+        masks["planet"] = np.zeros(ra.size, dtype=bool)
+        for planet in PLANETS.values():
+            planet_ra, planet_dec, diam = palpy.rdplan(
+                mjd, planet, site.longitude_rad, site.latitude_rad
+            )
+            distances = utils.haversine(ra_rad, dec_rad, planet_ra, planet_dec)
+            masks["planet"] |= distances <= np.radians(planet_dist_limit)
+
+        full_mask = np.zeros(ra.size, dtype=bool)
+        for key in masks:
+            full_mask |= masks[key]
+        decimator.add(
+            {
+                "mjd": mjd,
+                "required": step % requireStride == 0,
+                "mags": {key: mags[key] for key in FILTER_NAMES},
+                "airmass": sky_model.airmass,
+                "full_mask": full_mask,
+                "masks": masks,
+                "sunAlts": sky_model.sunAlt,
+                "sunRAs": sky_model.sunRA,
+                "sunDecs": sky_model.sunDec,
+                "moonRAs": sky_model.moonRA,
+                "moonDecs": sky_model.moonDec,
+                "moonSunSep": sky_model.moonSunSep,
+                "moonAlts": sky_model.moonAlt,
+            }
+        )
+        kept.extend(decimator.pop_final())
+    kept.extend(decimator.pop_final(flush=True))
+
+    dict_of_lists = {
+        "airmass": np.array([entry["airmass"] for entry in kept]).reshape(
+            len(kept), ra.size
+        ),
+        "mjds": np.array([entry["mjd"] for entry in kept]),
+    }
+    for key in [
+        "sunAlts",
+        "moonAlts",
+        "moonRAs",
+        "moonDecs",
+        "sunRAs",
+        "sunDecs",
+        "moonSunSep",
+    ]:
+        dict_of_lists[key] = np.array([entry[key] for entry in kept])
+    for key in MASK_NAMES:
+        dict_of_lists[key + "_masks"] = np.array(
+            [entry["masks"][key] for entry in kept]
+        ).reshape(len(kept), ra.size)
+
+    import rubin_sim
+
+    version = rubin_sim.version.__version__
+    # Generate a header to save all the kwarg info for how this run was computed
+    header = {
+        "mjd0": mjd0,
+        "mjd_max": mjd_max,
+        "mjd_ref": mjd_ref,
+        "timestep": timestep,
+        "timestep_max": timestep_max,
+        "outfile": outfile,
+        "nside": nside,
+        "sunLimit": sunLimit,
+        "fieldID": False,
+        "airmas_overhead": airmass_overhead,
+        "dm": dm,
+        "airmass_limit": airmass_limit,
+        "moon_dist_limit": moon_dist_limit,
+        "planet_dist_limit": planet_dist_limit,
+        "alt_limit": alt_limit,
+        "ra": ra,
+        "dec": dec,
+        "required_mjds": required_mjds,
+        "version": version,
+        "fingerprint": version,
+    }
+
+    sky_brightness = np.zeros(
+        (len(kept), ra.size), dtype=list(zip(FILTER_NAMES, [float] * 6))
+    )
+    for i, entry in enumerate(kept):
+        for key in FILTER_NAMES:
+            sky_brightness[key][i] = entry["mags"][key]
+
+    # Write to temporary files and rename them, so a chunk is either complete or missing.
+    # The .npz goes last, as its presence marks the chunk as done.
+    root = outfile[:-4]
+    with open(root + ".npy.tmp", "wb") as npy:
+        np.save(npy, sky_brightness)
+    with open(root + ".npz.tmp", "wb") as npz:
+        np.savez(npz, dict_of_lists=dict_of_lists, header=header)
+    os.replace(root + ".npy.tmp", root + ".npy")
+    os.replace(root + ".npz.tmp", outfile)
+    return outfile
+
+
+def _init_worker(airmass_limit):
+    # Load the sky model once per worker process
+    global _worker_sky_model
+    import rubin_sim.skybrightness as sb
+
+    _worker_sky_model = sb.SkyModel(mags=True, airmass_limit=airmass_limit)
+
+
+def _run_chunk(args):
+    mjd0, mjd_max, outfile, kwargs = args
+    return generate_sky_chunk(
+        mjd0, mjd_max, outfile, sky_model=_worker_sky_model, **kwargs
+    )
+
+
+def _chunk_filename(chunk_dir, mjd0, mjd_max):
+    return os.path.join(chunk_dir, "%.4f_%.4f.npz" % (mjd0, mjd_max))
+
+
+def generate_sky_store(
+    out_dir,
+    mjd0=60218.7,
+    mjd_max=60218.7 + 366.0,
+    chunk_days=1.0,
+    processes=None,
+    verbose=False,
+    **kwargs,
+):
+    """Pre-compute the sky brightness maps for a range of dates with a pool of processes,
+    and write them to a sky brightness store that SkyModelPre can memory-map.
+
+    The dates are split into chunks, computed in parallel, and each chunk is saved as soon
+    as it is finished. Running again with the same arguments skips the chunks that are
+    already done, so an interrupted run can be resumed. Once all of the chunks are done,
+    they are combined into a store in out_dir/store (use SkyModelPre(data_path=out_dir)).
+
+    Parameters
+    ----------
+    out_dir : str
+        The output directory. The chunks are saved in out_dir/chunks.
+    mjd0 : float (60218.7)
+        The starting MJD. Chunk edges should be during the day at the site (the default
+        is local noon), so no night is split between chunks; the results are then the
+        same whatever the chunk size.
+    mjd_max : float (60584.7)
+        The MJD to stop at.
+    chunk_days : float (1)
+        The length of each chunk (days).
+    processes : int (None)
+        The number of chunks to compute at once. Defaults to the number of CPUs.
+    verbose : bool (False)
+        Print progress.
+    **kwargs
+        Passed to generate_sky_chunk (e.g., timestep, nside, dm, requireStride).
+
+    Returns
+    -------
+    store_dir : str
+        The directory of the sky brightness store.
+    """
+    if processes is None:
+        processes = os.cpu_count()
+    chunk_dir = os.path.join(out_dir, "chunks")
+    if not os.path.isdir(chunk_dir):
+        os.makedirs(chunk_dir)
+    # Remove any partially written chunks from an interrupted run
+    for filename in glob.glob(os.path.join(chunk_dir, "*.tmp")):
+        os.remove(filename)
+
+    edges = np.append(np.arange(mjd0, mjd_max, chunk_days), mjd_max)
+    kwargs["mjd_ref"] = mjd0
+    chunk_files = []
+    todo = []
+    for left, right in zip(edges[:-1], edges[1:]):
+        filename = _chunk_filename(chunk_dir, left, right)
+        chunk_files.append(filename)
+        if not os.path.isfile(filename):
+            todo.append((left, right, filename, kwargs))
+    if verbose:
+        print(
+            "%i of %i chunks already done"
+            % (len(chunk_files) - len(todo), len(edges) - 1)
+        )
+
+    airmass_limit = kwargs.get("airmass_limit", 2.5)
+    if (processes > 1) & (len(todo) > 1):
+        with multiprocessing.Pool(
+            processes=processes, initializer=_init_worker, initargs=(airmass_limit,)
+        ) as pool:
+            for i, filename in enumerate(pool.imap_unordered(_run_chunk, todo)):
+                if verbose:
+                    print("finished %s (%i of %i)" % (filename, i + 1, len(todo)))
+    elif len(todo) > 0:
+        _init_worker(airmass_limit)
+        for i, args in enumerate(todo):
+            filename = _run_chunk(args)
+            if verbose:
+                print("finished %s (%i of %i)" % (filename, i + 1, len(todo)))
+
+    store_dir = os.path.join(out_dir, "store")
+    write_sky_store(store_dir, files=chunk_files, verbose=verbose)
+    return store_dir
@@ -0,0 +1,244 @@
+import os
+import glob
+import numpy as np
+
+__all__ = ["read_sky_file", "write_sky_store", "load_sky_store"]
+
+
+def read_sky_file(filename, npyfile=None, verbose=False):
+    """Read one of the pre-computed sky brightness files.
+
+    After python 3 upgrade, numpy.savez refused to write large .npz files, so data can be
+    split between .npz and .npy files.
+
+    Parameters
+    ----------
+    filename : `str`
+        The .npz file to read.
+    npyfile : `str` (None)
+        If sky brightness data not in npz file, checks the .npy file with same root name.
+    verbose : `bool` (False)
+        Print the files as they are loaded.
+
+    Returns
+    -------
+    info : `dict`
+        The per-timestep information (mjds, sun and moon positions, airmass and mask maps).
+    sb : `dict` or `np.array`
+        The sky brightness maps, keyed by filter name.
+    header : `dict`
+        The parameters the file was generated with.
+    """
+    if npyfile is None:
+        npyfile = filename[:-3] + "npy"
+    if verbose:
+        print("Loading file %s" % filename)
+    # Add encoding kwarg to restore Python 2.7 generated files
+    data = np.load(filename, encoding="bytes", allow_pickle=True)
+    info = data["dict_of_lists"][()]
+    header = data["header"][()]
+    if "sky_brightness" in data.keys():
+        sb = data["sky_brightness"][()]
+        data.close()
+    else:
+        # the sky brightness had to go in it's own npy file
+        data.close()
+        sb = np.load(npyfile)
+        if verbose:
+            print("also loading %s" % npyfile)
+
+    # Step to make sure keys are strings not bytes
+    all_dicts = [info, sb, header]
+    all_dicts = [
+        single_dict for single_dict in all_dicts if hasattr(single_dict, "keys")
+    ]
+    for selfDict in all_dicts:
+        for key in list(selfDict.keys()):
+            if type(key) != str:
+                selfDict[key.decode("utf-8")] = selfDict.pop(key)
+    return info, sb, header
+
+
+class _PackedMask(object):
+    """A read-only 2-D boolean array (timestep, healpix), stored with np.packbits along the
+    healpix axis. Indexing with healpix indices reads only the requested bits; whole rows
+    are only unpacked when all of the healpixels of a row are requested.
+    """
+
+    def __init__(self, bits, npix):
+        self.bits = bits
+        self.npix = npix
+        self.shape = (bits.shape[0], npix)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rows, indx = key
+        else:
+            rows, indx = key, slice(None)
+        if isinstance(rows, slice) or isinstance(indx, slice):
+            rows = np.asarray(rows) if not isinstance(rows, slice) else rows
+            unpacked = np.unpackbits(self.bits[rows], axis=-1, count=self.npix).astype(
+                bool
+            )
+            return unpacked[..., indx]
+        indx = np.asarray(indx)
+        if indx.dtype == bool:
+            indx = np.nonzero(indx)[0]
+        if np.any((indx < -self.npix) | (indx >= self.npix)):
+            raise IndexError("healpix index out of bounds for npix=%i" % self.npix)
+        indx = np.where(indx < 0, indx + self.npix, indx)
+        # Row and healpix indices broadcast together, as for numpy indexing
+        return ((self.bits[rows, indx >> 3] >> (7 - (indx & 7))) & 1).astype(bool)
+
+
+def write_sky_store(out_dir, files=None, verbose=False):
+    """Convert the pre-computed sky brightness files to a memory-mappable store.
+
+    The store is a directory with one contiguous array per filter (and for the airmass), with
+    the timesteps of all of the input files concatenated, the masks as bitsets, and an index
+    with the MJDs and the other per-timestep information. Files are converted one at a time,
+    so only one file needs to fit in memory.
+
+    Parameters
+    ----------
+    out_dir : `str`
+        The directory to write the store to. SkyModelPre looks for a store in the 'store'
+        directory next to the .npz files.
+    files : `list` of `str` (None)
+        The .npz files to convert. Default of None converts all of the files in the
+        skybrightness_pre data directory.
+    verbose : `bool` (False)
+        Print progress.
+    """
+    if files is None:
+        from rubin_sim.data import get_data_dir
+
+        if "SIMS_SKYBRIGHTNESS_DATA" in os.environ:
+            data_path = os.environ["SIMS_SKYBRIGHTNESS_DATA"]
+        else:
+            data_path = os.path.join(get_data_dir(), "skybrightness_pre")
+        files = glob.glob(os.path.join(data_path, "*.npz"))
+    # Put the files in time order
+    files = sorted(
+        files,
+        key=lambda filename: float(
+            os.path.split(filename)[-1].replace(".npz", "").split("_")[0]
+        ),
+    )
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    outfiles = {}
+    dtypes = {}
+    scalars = {}
+    header = None
+    filter_names = None
+    npix = None
+    mjd_last = -np.inf
+    try:
+        for filename in files:
+            info, sb, file_header = read_sky_file(filename, verbose=verbose)
+            # Files can overlap, only keep the timesteps after the ones already written
+            mjds = np.asarray(info["mjds"])
+            keep = np.where(mjds > mjd_last)[0]
+            if keep.size == 0:
+                continue
+            mjd_last = mjds[keep].max()
+            if hasattr(sb, "keys"):
+                file_filters = list(sb.keys())
+            else:
+                file_filters = list(sb.dtype.names)
+            if header is None:
+                header = file_header
+                filter_names = file_filters
+                npix = np.size(sb[filter_names[0]][0, :])
+
+            arrays = {}
+            for filter_name in filter_names:
+                arrays["sb_" + filter_name] = sb[filter_name][keep]
+            for key in info:
+                value = np.asarray(info[key])
+                if value.ndim == 1:
+                    scalars.setdefault(key, []).append(value[keep])
+                elif key.endswith("_masks"):
+                    arrays[key] = np.packbits(value[keep].astype(bool), axis=1)
+                else:
+                    arrays[key] = value[keep]
+            for key in arrays:
+                if key not in outfiles:
+                    dtypes[key] = arrays[key].dtype
+                    outfiles[key] = open(os.path.join(out_dir, key + ".dat"), "wb")
+                outfiles[key].write(
+                    np.ascontiguousarray(arrays[key], dtype=dtypes[key]).tobytes()
+                )
+            del info, sb, arrays
+    finally:
+        for outfile in outfiles.values():
+            outfile.close()
+
+    if header is None:
+        raise ValueError("No sky brightness files to convert")
+    scalars = {key: np.concatenate(value) for key, value in scalars.items()}
+    if "mjd0" in header:
+        header["mjd0"] = scalars["mjds"].min()
+    if "mjd_max" in header:
+        header["mjd_max"] = scalars["mjds"].max()
+    arrays = {key: dtypes[key].str for key in dtypes}
+    np.savez(
+        os.path.join(out_dir, "index.npz"),
+        scalars=scalars,
+        arrays=arrays,
+        header=header,
+        filter_names=np.array(filter_names),
+        npix=npix,
+    )
+
+
+def load_sky_store(store_dir):
+    """Memory-map a sky brightness store written by `write_sky_store`.
+
+    Loading only reads the (small) index, whatever the length of the survey; the maps are
+    read from disk as they are used, and processes using the same store share the pages.
+
+    Parameters
+    ----------
+    store_dir : `str`
+        The store directory.
+
+    Returns
+    -------
+    info : `dict`
+        The per-timestep information. The airmass and masks are memory-mapped (timestep, healpix)
+        arrays.
+    sb : `dict`
+        The memory-mapped (timestep, healpix) sky brightness arrays, keyed by filter name.
+    header : `dict`
+        The parameters the maps were generated with.
+    filter_names : `list` of `str`
+        The filter names.
+    """
+    index = np.load(os.path.join(store_dir, "index.npz"), allow_pickle=True)
+    info = dict(index["scalars"][()])
+    header = index["header"][()]
+    filter_names = [str(name) for name in index["filter_names"]]
+    npix = int(index["npix"])
+    arrays = index["arrays"][()]
+    index.close()
+    n_times = info["mjds"].size
+
+    sb = {}
+    for key, dtype in arrays.items():
+        dtype = np.dtype(dtype)
+        filename = os.path.join(store_dir, key + ".dat")
+        if key.endswith("_masks"):
+            bits = np.memmap(
+                filename, dtype=dtype, mode="r", shape=(n_times, (npix + 7) // 8)
+            )
+            info[key] = _PackedMask(bits, npix)
+        else:
+            array = np.memmap(filename, dtype=dtype, mode="r", shape=(n_times, npix))
+            if key.startswith("sb_"):
+                sb[key[3:]] = array
+            else:
+                info[key] = array
+    return info, sb, header, filter_names
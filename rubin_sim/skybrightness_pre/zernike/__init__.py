@@ -3,3 +3,4 @@ from .zernike import bulk_zernike_fit
 from .zernike import ZernikeSky
 from .zernike import SkyBrightnessPreData
 from .zernike import SkyModelZernike
+from .zernike import compare_sky_models
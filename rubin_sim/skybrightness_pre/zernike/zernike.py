@@ -12,9 +12,12 @@ eyes. J Refract Surg 18, S652-660 (2002).
 from math import factorial
 import logging
 import os
+import time
 import warnings
 from glob import glob
-from functools import lru_cache
+from functools import lru_cache, partial
+from collections import OrderedDict
+import multiprocessing
 import numpy as np
 import pandas as pd
 from numexpr import NumExpr
@@ -41,7 +44,12 @@ BANDS = ("u", "g", "r", "i", "z", "y")
 
 # interface functions
 
-__all__ = ["ZernikeSky", "SkyModelZernike", "SkyBrightnessPreData"]
+__all__ = [
+    "ZernikeSky",
+    "SkyModelZernike",
+    "SkyBrightnessPreData",
+    "compare_sky_models",
+]
 
 
 def fit_pre(npy_fname, npz_fname, *args, **kwargs):
@@ -97,7 +105,7 @@ def fit_pre(npy_fname, npz_fname, *args, **kwargs):
     return zernike_coeffs
 
 
-def bulk_zernike_fit(data_dir, out_fname, *args, **kwargs):
+def bulk_zernike_fit(data_dir, out_fname, *args, processes=1, **kwargs):
     """Fit Zernike coeffs to all SkyBrightnessPre files in a directory.
 
     Parameters
@@ -107,6 +115,9 @@ def bulk_zernike_fit(data_dir, out_fname, *args, **kwargs):
         data files.
     out_fname: `str`
         Name of the file in which to save fit coefficients.
+    processes : `int`, optional
+        The number of files to fit at once, in separate processes.
+        Default is 1.
 
     other arguments are passed to the ZernikeSky constructor.
 
@@ -115,12 +126,19 @@ def bulk_zernike_fit(data_dir, out_fname, *args, **kwargs):
     zernike_coeffs : `pd.DataFrame`
         A DataFrame with the coefficients, indexed by band and mjd.
     """
-    zernike_coeff_batches = []
-    for npz_fname in glob(os.path.join(data_dir, "?????_?????.npz")):
-        LOGGER.info("Processing %s", npz_fname)
+    fit_args = []
+    for npz_fname in sorted(glob(os.path.join(data_dir, "?????_?????.npz"))):
         npy_fname = os.path.splitext(npz_fname)[0] + ".npy"
-        zernike_coeff_batch = fit_pre(npy_fname, npz_fname, *args, **kwargs)
-        zernike_coeff_batches.append(zernike_coeff_batch)
+        fit_args.append((npy_fname, npz_fname) + args)
+
+    if processes > 1:
+        with multiprocessing.Pool(processes=processes) as pool:
+            zernike_coeff_batches = pool.starmap(partial(fit_pre, **kwargs), fit_args)
+    else:
+        zernike_coeff_batches = []
+        for these_args in fit_args:
+            LOGGER.info("Processing %s", these_args[1])
+            zernike_coeff_batches.append(fit_pre(*these_args, **kwargs))
 
     zernike_coeffs = pd.concat(zernike_coeff_batches)
     zernike_coeffs.sort_index(level="mjd", inplace=True)
@@ -155,9 +173,14 @@ class ZernikeSky:
         Default is 67.
     dtype : `type`: optional
         The numpy type to use for all calculations. Default is `np.float64`.
+    basis_cache_size : `int`, optional
+        The number of sidereal time samples for which to keep the Zernike Z terms
+        of all healpixels. Default is 64.
     """
 
-    def __init__(self, order=6, nside=32, max_zd=67, dtype=np.float64):
+    def __init__(
+        self, order=6, nside=32, max_zd=67, dtype=np.float64, basis_cache_size=64
+    ):
         self.order = order
         self.dtype = dtype
         self.nside = nside
@@ -186,12 +209,16 @@ class ZernikeSky:
             self._zern_function = self._compute_sky_by_sum
 
         # big Z values for all m,n at all rho, phi in the
-        # pre-defined healpix coordinate, following eqn 1 of Thibos et
-        # al. (2002) The array returned should be indexed with j,
-        # Should switch to using functools.cached_property in python 3.8
-        self.healpix_z = self._compute_healpix_z()
-        self._interpolate_healpix_z = interp1d(
-            SIDEREAL_TIME_SAMPLES_RAD, self.healpix_z, axis=0, kind="nearest"
+        # pre-defined healpix coordinates, one (npix, nterms) array
+        # for each sidereal time sample. Computing them for all samples
+        # up front takes a lot of time and memory, so they are computed
+        # as needed, and only the most recently used are kept.
+        self.basis_cache_size = basis_cache_size
+        self._healpix_z_cache = OrderedDict()
+        self._nearest_sidereal_sample = interp1d(
+            SIDEREAL_TIME_SAMPLES_RAD,
+            np.arange(len(SIDEREAL_TIME_SAMPLES_RAD)),
+            kind="nearest",
         )
 
         # A pd.DataFrame of zernike coeffs, indexed by mjd, providing the
@@ -213,10 +240,12 @@ class ZernikeSky:
 
         """
         zernike_metadata = pd.read_hdf(fname, "zernike_metadata")
-        assert self.order == zernike_metadata["order"]
+        # A lower order approximation uses the lower order terms of the fit,
+        # which come first in the OSA/ANSI indexing.
+        assert self.order <= zernike_metadata["order"]
         assert self.max_zd == zernike_metadata["max_zd"]
         all_zernike_coeffs = pd.read_hdf(fname, "zernike_coeffs")
-        self._coeffs = all_zernike_coeffs.loc[band]
+        self._coeffs = all_zernike_coeffs.loc[band].iloc[:, : self._number_of_terms]
         self._coeff_calc_func = interp1d(
             self._coeffs.index.values, self._coeffs.values, axis=0
         )
@@ -264,16 +293,71 @@ class ZernikeSky:
         -------
         `np.ndarray` (N) of sky brightnesses (mags/asec^2)
         """
-        interpolate_healpix_z = self._interpolate_healpix_z
         gmst = palpy.gmst(mjd)
-        mjd_healpix_z = interpolate_healpix_z(gmst)
-        # mjd_healpix_z = self.healpix_z[int(np.degrees(gmst))]
+        mjd_healpix_z = self.healpix_basis(int(self._nearest_sidereal_sample(gmst)))
         if hpix is None:
             result = np.sum(self.coeffs(mjd) * mjd_healpix_z, axis=1)
         else:
             result = np.sum(self.coeffs(mjd) * mjd_healpix_z[hpix], axis=1)
         return result
 
+    def compute_healpix_array(self, hpix, mjd):
+        """Estimate sky values for many (healpix, time) pairs
+
+        Parameters
+        ----------
+        hpix : `np.ndarray`, (N)
+            Array of healpix indexes of the desired coordinates.
+        mjd : `np.ndarray`, (N)
+            The times (floating point MJD) at which to estimate the sky,
+            one for each healpix.
+
+        Returns
+        -------
+        `np.ndarray` (N) of sky brightnesses (mags/asec^2)
+        """
+        hpix = np.asarray(hpix, dtype=int)
+        mjd = np.asarray(mjd, dtype=float)
+        st_idx = self._nearest_sidereal_sample(palpy.gmstVector(mjd)).astype(int)
+        coeffs = np.asarray(self.coeffs(mjd))
+        result = np.empty(mjd.size, dtype=self.dtype)
+        for this_st_idx in np.unique(st_idx):
+            rows = np.where(st_idx == this_st_idx)[0]
+            result[rows] = np.einsum(
+                "ij,ij->i", coeffs[rows], self.healpix_basis(this_st_idx)[hpix[rows]]
+            )
+        return result
+
+    def healpix_basis(self, st_idx):
+        """Zernike Z terms of all healpixels at a sidereal time sample
+
+        Parameters
+        ----------
+        st_idx : `int`
+            The index of the sample in SIDEREAL_TIME_SAMPLES_RAD.
+
+        Returns
+        -------
+        `np.ndarray` (npix, nterms) of Z values following the OSA/ANSI
+        indexing convention, NaN for healpixels below the horizon.
+        The sky brightness is this times the coefficient vector.
+        """
+        if st_idx in self._healpix_z_cache:
+            self._healpix_z_cache.move_to_end(st_idx)
+            return self._healpix_z_cache[st_idx]
+        healpix_z = self._compute_healpix_z_sample(SIDEREAL_TIME_SAMPLES_RAD[st_idx])
+        healpix_z.flags.writeable = False
+        self._healpix_z_cache[st_idx] = healpix_z
+        if len(self._healpix_z_cache) > self.basis_cache_size:
+            self._healpix_z_cache.popitem(last=False)
+        return healpix_z
+
+    @property
+    def healpix_z(self):
+        """Zernike Z terms of all healpixels at all sidereal time samples,
+        (n_samples, npix, nterms)."""
+        return self._compute_healpix_z()
+
     def coeffs(self, mjd):
         """Zerinke coefficients at a time
 
@@ -378,26 +462,35 @@ class ZernikeSky:
         # pre-defined healpix coordinate, following eqn 1 of Thibos et
         # al. (2002) The array returned should be indexed with j,
         # following the conventions of eqn 4.
+        healpix_z = np.array(
+            [
+                self._compute_healpix_z_sample(gmst_rad)
+                for gmst_rad in SIDEREAL_TIME_SAMPLES_RAD
+            ]
+        )
+        return healpix_z
+
+    def _compute_healpix_z_sample(self, gmst_rad):
+        # Compute big Z values for all m,n in the pre-defined healpix
+        # coordinates at one sidereal time.
         sphere_npix = healpy.nside2npix(self.nside)
         sphere_ipix = np.arange(sphere_npix)
         ra, decl = healpy.pix2ang(self.nside, sphere_ipix, lonlat=True)
 
-        num_st = len(SIDEREAL_TIME_SAMPLES_RAD)
-        healpix_z = np.full([num_st, sphere_npix, self._number_of_terms], np.nan)
-        for st_idx, gmst_rad in enumerate(SIDEREAL_TIME_SAMPLES_RAD):
-            lst_rad = gmst_rad + TELESCOPE.longitude_rad
-            ha_rad = lst_rad - np.radians(ra)
-            az_rad, alt_rad = palpy.de2hVector(
-                ha_rad, np.radians(decl), TELESCOPE.latitude_rad
-            )
-            sphere_az, sphere_alt = np.degrees(az_rad), np.degrees(alt_rad)
+        healpix_z = np.full([sphere_npix, self._number_of_terms], np.nan)
+        lst_rad = gmst_rad + TELESCOPE.longitude_rad
+        ha_rad = lst_rad - np.radians(ra)
+        az_rad, alt_rad = palpy.de2hVector(
+            ha_rad, np.radians(decl), TELESCOPE.latitude_rad
+        )
+        sphere_az, sphere_alt = np.degrees(az_rad), np.degrees(alt_rad)
 
-            # We only need the half sphere above the horizen
-            visible_ipix = sphere_ipix[sphere_alt > 0]
-            alt, az = sphere_alt[visible_ipix], sphere_az[visible_ipix]
-            rho = self._calc_rho(alt)
-            phi = self._calc_phi(az)
-            healpix_z[st_idx, visible_ipix] = self._compute_z(rho, phi)
+        # We only need the half sphere above the horizen
+        visible_ipix = sphere_ipix[sphere_alt > 0]
+        alt, az = sphere_alt[visible_ipix], sphere_az[visible_ipix]
+        rho = self._calc_rho(alt)
+        phi = self._calc_phi(az)
+        healpix_z[visible_ipix] = self._compute_z(rho, phi)
 
         return healpix_z
 
@@ -728,6 +821,8 @@ class SkyModelZernike:
     data_file : `str`, optional
         File name from which to load Zernike coefficients. Default None uses default data directory.
 
+    other arguments are passed to the ZernikeSky constructor. The order defaults to
+    the order the coefficients were fit with; a lower order uses only the lower order terms.
     """
 
     def __init__(self, data_file=None, **kwargs):
@@ -739,26 +834,30 @@ class SkyModelZernike:
 
             data_file = os.path.join(data_dir, "zernike", "zernike.h5")
 
-            zernike_metadata = pd.read_hdf(data_file, "zernike_metadata")
+        zernike_metadata = pd.read_hdf(data_file, "zernike_metadata")
 
-            order = int(zernike_metadata["order"])
-            if "order" in kwargs:
-                assert order == kwargs["order"]
-            else:
-                kwargs["order"] = order
+        order = int(zernike_metadata["order"])
+        if kwargs.get("order") is not None:
+            assert kwargs["order"] <= order
+        else:
+            kwargs["order"] = order
 
-            max_zd = zernike_metadata["max_zd"]
-            if "max_zd" in kwargs:
-                assert max_zd == kwargs["max_zd"]
-            else:
-                kwargs["max_zd"] = max_zd
+        max_zd = zernike_metadata["max_zd"]
+        if "max_zd" in kwargs:
+            assert max_zd == kwargs["max_zd"]
+        else:
+            kwargs["max_zd"] = max_zd
 
         self.zernike_model = {}
         for band in BANDS:
             sky = ZernikeSky(**kwargs)
             sky.load_coeffs(data_file, band)
+            if len(self.zernike_model) > 0:
+                # The Z terms depend only on position, so all bands can share them
+                sky._healpix_z_cache = self.zernike_model[BANDS[0]]._healpix_z_cache
             self.zernike_model[band] = sky
         self.nside = sky.nside
+        self.order = sky.order
 
     def returnMags(
         self,
@@ -767,6 +866,10 @@ class SkyModelZernike:
         badval=healpy.UNSEEN,
         filters=["u", "g", "r", "i", "z", "y"],
         extrapolate=False,
+        airmass_mask=False,
+        planet_mask=False,
+        moon_mask=False,
+        zenith_mask=False,
     ):
         """
         Return a full sky map or individual pixels for the input mjd
@@ -785,6 +888,9 @@ class SkyModelZernike:
         extrapolate : bool (False)
             In indx is set, extrapolate any masked pixels to be the same as the nearest non-masked
             value from the full sky map.
+        airmass_mask, planet_mask, moon_mask, zenith_mask : bool (False)
+            The Zernike model has no masks; these are accepted so the model can be used
+            in place of SkyModelPre.
 
         Returns
         -------
@@ -808,17 +914,157 @@ class SkyModelZernike:
 
             return sky_brightness
 
-        if extrapolate:
-            raise NotImplementedError
-
         for band in filters:
             band_brightness = self.zernike_model[band].compute_healpix(indx, mjd)
-            badval_idxs = np.where(~np.isfinite(band_brightness))
-            band_brightness[badval_idxs] = badval
             sky_brightness[band] = band_brightness
 
+        # If requested a certain pixel(s), and want to extrapolate.
+        if (indx is not None) & extrapolate:
+            masked_indx = np.where(~np.isfinite(sky_brightness[filters[0]]))[0]
+            if masked_indx.size > 0:
+                full_sky = self.returnMags(mjd, filters=filters, badval=np.nan)
+                good = np.where(np.isfinite(full_sky[filters[0]]))[0]
+                ra, dec = healpy.pix2ang(
+                    self.nside, np.arange(healpy.nside2npix(self.nside)), lonlat=True
+                )
+                ra, dec = np.radians(ra), np.radians(dec)
+                for mi in masked_indx:
+                    dist = utils._angularSeparation(
+                        ra[indx[mi]], dec[indx[mi]], ra[good], dec[good]
+                    )
+                    closest = good[np.argmin(dist)]
+                    for band in filters:
+                        sky_brightness[band][mi] = full_sky[band][closest]
+
+        for band in filters:
+            badval_idxs = np.where(~np.isfinite(sky_brightness[band]))
+            sky_brightness[band][badval_idxs] = badval
+
         return sky_brightness
 
+    def returnMagsArray(
+        self,
+        mjd,
+        indx,
+        badval=healpy.UNSEEN,
+        filters=["u", "g", "r", "i", "z", "y"],
+    ):
+        """
+        Return the sky brightness for many (mjd, healpix) pairs at once
+
+        Parameters
+        ----------
+        mjd : np.array
+            Modified Julian Dates to interpolate to.
+        indx : np.array
+            The healpix IDs, one per mjd (or broadcastable to mjd).
+        badval : float (-1.6375e30)
+            Mask value. Defaults to the healpy mask value.
+        filters : list
+            List of strings for the filters that should be returned.
+
+        Returns
+        -------
+        sbs : np.array
+            Structured array with a field for each filter, holding the sky brightness
+            in mag/sq arcsec, with the broadcast shape of mjd and indx.
+        """
+        mjd, indx = np.broadcast_arrays(
+            np.asarray(mjd, dtype=float), np.asarray(indx, dtype=int)
+        )
+        shape = mjd.shape
+        mjd = mjd.ravel()
+        indx = indx.ravel()
+        result = np.empty(mjd.size, dtype=[(band, float) for band in filters])
+
+        unique_mjds, mjd_idx = np.unique(mjd, return_inverse=True)
+        sun_el = np.array([_calc_sun_el(this_mjd) for this_mjd in unique_mjds])
+        daytime = (sun_el > 0)[mjd_idx]
+        if np.any(daytime):
+            warnings.warn("Requested MJD between sunrise and sunset")
+
+        night = np.where(~daytime)[0]
+        for band in filters:
+            band_brightness = self.zernike_model[band].compute_healpix_array(
+                indx[night], mjd[night]
+            )
+            band_brightness[~np.isfinite(band_brightness)] = badval
+            result[band] = badval
+            result[band][night] = band_brightness
+
+        return result.reshape(shape)
+
+
+def compare_sky_models(mjds, sky_model, reference_model=None, filters=BANDS):
+    """Compare the accuracy and speed of a sky model with a reference model
+
+    Parameters
+    ----------
+    mjds : `np.ndarray`
+        The times (floating point MJD) at which to compare full sky maps.
+    sky_model : `SkyModelZernike`
+        The sky model to test.
+    reference_model : `rubin_sim.skybrightness_pre.SkyModelPre`, optional
+        The sky model to compare with. Default None uses a SkyModelPre
+        with the default data directory.
+    filters : `list`, optional
+        The bands to compare. Default is all of them.
+
+    Returns
+    -------
+    comparison : `pd.DataFrame`
+        Indexed by band, with the number of healpix values compared (those
+        not masked in either model), the mean, RMS and maximum absolute
+        differences (mags/asec^2), and the mean time (seconds) each model
+        takes to return the maps of all of the bands at one time.
+    """
+    if reference_model is None:
+        from rubin_sim.skybrightness_pre import SkyModelPre
+
+        reference_model = SkyModelPre(speedLoad=False)
+
+    diffs = {band: [] for band in filters}
+    times = {"time": [], "reference_time": []}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for mjd in mjds:
+            t0 = time.perf_counter()
+            sky = sky_model.returnMags(mjd, filters=filters, badval=np.nan)
+            t1 = time.perf_counter()
+            ref_sky = reference_model.returnMags(mjd, filters=filters, badval=np.nan)
+            t2 = time.perf_counter()
+            times["time"].append(t1 - t0)
+            times["reference_time"].append(t2 - t1)
+            for band in filters:
+                if np.size(sky[band]) != np.size(ref_sky[band]):
+                    # Compare at the resolution of the model being tested
+                    ref_sky[band] = healpy.ud_grade(
+                        np.where(
+                            np.isfinite(ref_sky[band]), ref_sky[band], healpy.UNSEEN
+                        ),
+                        healpy.npix2nside(np.size(sky[band])),
+                    )
+                    ref_sky[band][ref_sky[band] == healpy.UNSEEN] = np.nan
+                diff = sky[band] - ref_sky[band]
+                diffs[band].append(diff[np.isfinite(diff)])
+
+    rows = []
+    for band in filters:
+        diff = np.concatenate(diffs[band]) if len(diffs[band]) > 0 else np.array([])
+        rows.append(
+            {
+                "band": band,
+                "n_compared": diff.size,
+                "mean_diff": np.mean(diff) if diff.size > 0 else np.nan,
+                "rms_diff": np.sqrt(np.mean(diff**2)) if diff.size > 0 else np.nan,
+                "max_abs_diff": np.max(np.abs(diff)) if diff.size > 0 else np.nan,
+                "time": np.mean(times["time"]),
+                "reference_time": np.mean(times["reference_time"]),
+            }
+        )
+    comparison = pd.DataFrame(rows).set_index("band")
+    return comparison
+
 
 def cut_pre_dataset(
     fname_base="59823_60191",
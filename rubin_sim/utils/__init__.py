@@ -25,3 +25,4 @@ from .season_utils import *
 from .ddf_locations import *
 from .cameraFootprint import *
 from .bearing import *
+from .hashUtils import *
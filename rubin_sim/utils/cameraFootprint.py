@@ -1,5 +1,6 @@
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 from rubin_sim.data import get_data_dir
 from rubin_sim.utils import gnomonic_project_toxy
 
@@ -69,38 +70,108 @@ class LsstCameraFootprint(object):
             Applying this to the input array (e.g. obj_ra[indices]) indicates the positions of
             the objects which fell onto active silicon.
         """
-        if self.units == "degrees":
-            x_proj, y_proj = gnomonic_project_toxy(
-                np.radians(obj_ra),
-                np.radians(obj_dec),
-                np.radians(boresight_ra),
-                np.radians(boresight_dec),
-            )
-            # rotate them by rotskypos
-            # TODO: look up whether this is a positive or negative rotation
-            #  in the observatory documentation
-            x_proj, y_proj = rotate(x_proj, y_proj, np.radians(boresight_rotSkyPos))
+        on_silicon = self.on_silicon(
+            obj_ra, obj_dec, boresight_ra, boresight_dec, boresight_rotSkyPos
+        )
+        return np.where(np.atleast_1d(on_silicon))[0]
+
+    def on_silicon(
+        self,
+        obj_ra,
+        obj_dec,
+        boresight_ra,
+        boresight_dec,
+        boresight_rotSkyPos,
+        n_threads=1,
+        chunk_size=1000000,
+    ):
+        """Determine whether each (object, pointing) pair lands on active silicon.
+
+        All of the inputs are broadcast against each other, so this can be used to test many
+        objects against one pointing, one object against many pointings, or arrays of
+        (object, pointing) pairs, with a single vectorized projection and footprint lookup.
+
+        Parameters
+        ----------
+        obj_ra : `np.ndarray` or `float`
+            RA values for the objects.
+        obj_dec : `np.ndarray` or `float`
+            Dec values for the objects.
+        boresight_ra : `np.ndarray` or `float`
+            RA values for the pointings.
+        boresight_dec : `np.ndarray` or `float`
+            Dec values for the pointings.
+        boresight_rotSkyPos : `np.ndarray` or `float`
+            RotSkyPos values for the pointings.
+        n_threads : `int`, opt
+            Number of threads to use. Large inputs are split into chunks of chunk_size pairs,
+            which are evaluated in parallel (numpy releases the GIL for these calculations).
+            Default 1.
+        chunk_size : `int`, opt
+            Number of pairs to evaluate at once; this limits the size of the temporary arrays.
+            Default 1000000.
+
+        Returns
+        -------
+        on_silicon : `np.ndarray`
+            Boolean array (with the broadcast shape of the inputs), True where
+            the object falls on a science chip of the pointing.
+        """
+        arrays = np.broadcast_arrays(
+            obj_ra, obj_dec, boresight_ra, boresight_dec, boresight_rotSkyPos
+        )
+        shape = arrays[0].shape
+        arrays = [np.ravel(a) for a in arrays]
+        npairs = arrays[0].size
+        if npairs <= chunk_size:
+            return self._on_silicon(*arrays).reshape(shape)
+        result = np.zeros(npairs, bool)
+        starts = range(0, npairs, chunk_size)
+
+        def _run_chunk(start):
+            end = start + chunk_size
+            result[start:end] = self._on_silicon(*[a[start:end] for a in arrays])
 
+        if n_threads > 1:
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                # Consume the iterator so that exceptions in the threads are raised.
+                list(executor.map(_run_chunk, starts))
         else:
-            x_proj, y_proj = gnomonic_project_toxy(
-                obj_ra, obj_dec, boresight_ra, boresight_dec
-            )
-            x_proj, y_proj = rotate(x_proj, y_proj, boresight_rotSkyPos)
+            for start in starts:
+                _run_chunk(start)
+        return result.reshape(shape)
+
+    def _on_silicon(
+        self, obj_ra, obj_dec, boresight_ra, boresight_dec, boresight_rotSkyPos
+    ):
+        """Evaluate on_silicon for flat arrays of (object, pointing) pairs."""
+        if self.units == "degrees":
+            obj_ra = np.radians(obj_ra)
+            obj_dec = np.radians(obj_dec)
+            boresight_ra = np.radians(boresight_ra)
+            boresight_dec = np.radians(boresight_dec)
+            boresight_rotSkyPos = np.radians(boresight_rotSkyPos)
+        x_proj, y_proj = gnomonic_project_toxy(
+            obj_ra, obj_dec, boresight_ra, boresight_dec
+        )
+        # rotate them by rotskypos
+        # TODO: look up whether this is a positive or negative rotation
+        #  in the observatory documentation
+        x_proj, y_proj = rotate(x_proj, y_proj, boresight_rotSkyPos)
 
         # look up which points are good
-        x_indx = np.round((x_proj - self.x_camera[0]) / self.plate_scale).astype(int)
-        y_indx = np.round((y_proj - self.x_camera[0]) / self.plate_scale).astype(int)
-        in_range = np.where(
+        x_indx = np.round((x_proj - self.x_camera[0]) / self.plate_scale)
+        y_indx = np.round((y_proj - self.x_camera[0]) / self.plate_scale)
+        in_range = (
             (x_indx >= 0)
             & (x_indx < self.indx_max)
             & (y_indx >= 0)
             & (y_indx < self.indx_max)
-        )[0]
-        x_indx = x_indx[in_range]
-        y_indx = y_indx[in_range]
-        indices = in_range
+        )
         # reduce the indices down to only the ones that fall on silicon.
         # self.camera_fov is an array of `bool` values
-        map_val = self.camera_fov[x_indx, y_indx]
-        indices = indices[map_val]
-        return indices
+        on_silicon = np.zeros(len(in_range), bool)
+        on_silicon[in_range] = self.camera_fov[
+            x_indx[in_range].astype(int), y_indx[in_range].astype(int)
+        ]
+        return on_silicon
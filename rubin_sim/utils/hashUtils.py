@@ -0,0 +1,57 @@
+import numpy as np
+
+__all__ = ["updateHash"]
+
+
+def updateHash(h, value, _depth=0):
+    """
+    Update a hashlib object with a reproducible representation of value.
+
+    Numpy arrays are hashed by their dtype, shape and contents, containers are hashed element by
+    element, functions and methods by their qualified name, and objects which do not define a repr
+    (the default repr includes the memory address) by their class and public attributes.
+    Objects with an _initArgs attribute (e.g. MAF metrics and stackers, see
+    `rubin_sim.maf.utils.bindInitArgs`) are hashed by their class and constructor arguments only.
+
+    Parameters
+    ----------
+    h : hashlib hash object
+        The hash to update (e.g. hashlib.sha1()).
+    value : any
+        The value to add to the hash.
+    """
+    if isinstance(value, np.ndarray):
+        h.update(("%s%s" % (value.dtype, value.shape)).encode())
+        if value.dtype.hasobject:
+            for v in value.ravel():
+                updateHash(h, v, _depth + 1)
+        else:
+            h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b"dict")
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode())
+            updateHash(h, value[key], _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        h.update(type(value).__name__.encode())
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value, key=repr)
+        for v in value:
+            updateHash(h, v, _depth + 1)
+    elif hasattr(value, "_initArgs"):
+        # Objects which recorded their constructor arguments (metrics and stackers) are
+        # hashed by these, as their other attributes can change when they are used.
+        h.update(("%s.%s" % (type(value).__module__, type(value).__name__)).encode())
+        updateHash(h, value._initArgs, _depth + 1)
+    elif callable(value) and hasattr(value, "__qualname__"):
+        h.update(("%s.%s" % (value.__module__, value.__qualname__)).encode())
+    elif hasattr(value, "__dict__") and type(value).__repr__ is object.__repr__:
+        h.update(("%s.%s" % (type(value).__module__, type(value).__name__)).encode())
+        # Limit the recursion into (possibly self-referencing) attributes.
+        if _depth < 5:
+            for attr in sorted(vars(value)):
+                if not attr.startswith("_"):
+                    h.update(attr.encode())
+                    updateHash(h, getattr(value, attr), _depth + 1)
+    else:
+        h.update(repr(value).encode())
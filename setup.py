@@ -30,6 +30,8 @@ setup(
         "bin/movingObjects/makeLSSTobs",
         "bin/rs_download_data",
         "bin/rs_download_sky",
+        "bin/rs_zernike_fit",
+        "bin/rs_generate_sky",
     ],
     packages=find_packages(),
 )
@@ -7,8 +7,11 @@ import numpy.lib.recfunctions as rfn
 import numpy.ma as ma
 import unittest
 import healpy as hp
+import tempfile
+import shutil
 from rubin_sim.data import get_data_dir
 from rubin_sim.maf.slicers.healpixSlicer import HealpixSlicer
+from rubin_sim.maf.slicers.overlapIndex import OverlapIndex
 
 
 def makeDataValues(
@@ -255,6 +258,53 @@ class TestHealpixSlicerSlicing(unittest.TestCase):
                 )
 
 
+class TestHealpixSlicerOverlapIndex(unittest.TestCase):
+    def setUp(self):
+        self.nside = 8
+        self.testslicer = HealpixSlicer(
+            nside=self.nside,
+            verbose=False,
+            lonCol="ra",
+            latCol="dec",
+            latLonDeg=False,
+            radius=1.8,
+            useCamera=False,
+        )
+        self.dv = makeDataValues(size=5000, decmin=-np.pi, decmax=0, random=66)
+        self.dv = rfn.append_fields(
+            self.dv,
+            "observationId",
+            np.arange(len(self.dv)) * 2 + 1,
+            usemask=False,
+        )
+        self.outDir = tempfile.mkdtemp(prefix="OVI")
+
+    def tearDown(self):
+        shutil.rmtree(self.outDir)
+
+    def testSubset(self):
+        """Test slicing with a (subset) overlap index matches slicing with the kdtree."""
+        overlapIndex = OverlapIndex.fromCache(self.testslicer, self.dv, self.outDir)
+        # Second call should read the index back from disk.
+        reread = OverlapIndex.fromCache(self.testslicer, self.dv, self.outDir)
+        self.assertEqual(len(os.listdir(self.outDir)), 1)
+        self.assertEqual(overlapIndex.key, reread.key)
+        np.testing.assert_equal(overlapIndex.indices, reread.indices)
+        # Slice a subset of the data with and without the overlap index.
+        subset = self.dv[::3]
+        self.testslicer.setupSlicer(subset)
+        expected = [np.sort(s["idxs"]) for s in self.testslicer]
+        self.testslicer.overlapIndex = reread
+        self.testslicer.setupSlicer(subset)
+        self.assertIsNotNone(self.testslicer._overlap)
+        for s, e in zip(self.testslicer, expected):
+            np.testing.assert_equal(np.sort(s["idxs"]), e)
+        # Visits which are not in the index mean it cannot be used.
+        other = subset.copy()
+        other["observationId"][0] = -1
+        self.assertIsNone(reread.subset(other))
+
+
 class TestHealpixChipGap(unittest.TestCase):
     # Note that this is really testing baseSpatialSlicer, as slicing is done there for healpix grid
 
@@ -1,5 +1,9 @@
 import unittest
+from unittest import mock
 import matplotlib
+import numpy as np
+import pandas as pd
+import sqlite3
 
 matplotlib.use("Agg")
 
@@ -64,6 +68,377 @@ class TestMetricBundle(unittest.TestCase):
         assert len(outPdf) == 2
         assert len(outNpz) == 1
 
+    def testParallel(self):
+        """
+        Check that running the slicePoints in parallel matches a serial run
+        """
+        rng = np.random.default_rng(42)
+        nvisits = 5000
+        names = ["fieldRA", "fieldDec", "airmass", "night", "observationStartMJD"]
+        simData = np.zeros(nvisits, dtype=list(zip(names, [float] * len(names))))
+        simData["fieldRA"] = rng.uniform(0, 360, nvisits)
+        simData["fieldDec"] = np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits)))
+        simData["airmass"] = rng.uniform(1, 2, nvisits)
+        simData["night"] = rng.integers(0, 365, nvisits)
+        simData["observationStartMJD"] = (
+            60000 + simData["night"] + rng.uniform(0, 0.3, nvisits)
+        )
+
+        def runBundles(nProcesses, indexMemoryBudget=None):
+            bundleDict = {}
+            # RmsMetric and VisitGroupsMetric have no runBatch, so they are run
+            # slicePoint by slicePoint (in the worker processes when nProcesses > 1).
+            for key, metric in [
+                ("mean", metrics.MeanMetric(col="airmass")),
+                ("count", metrics.CountMetric(col="night")),
+                ("rms", metrics.RmsMetric(col="airmass")),
+                ("groups", metrics.VisitGroupsMetric()),
+            ]:
+                slicer = slicers.HealpixSlicer(nside=8, useCamera=False, verbose=False)
+                bundleDict[key] = metricBundles.MetricBundle(metric, slicer, "")
+            bgroup = metricBundles.MetricBundleGroup(
+                bundleDict,
+                None,
+                outDir=os.path.join(
+                    self.outDir, "%i_%s" % (nProcesses, indexMemoryBudget)
+                ),
+                verbose=False,
+                saveEarly=False,
+                indexMemoryBudget=indexMemoryBudget,
+            )
+            bgroup.runCurrent("", simData=simData, nProcesses=nProcesses)
+            return bgroup
+
+        def compare(serial, parallel):
+            self.assertEqual(set(serial.bundleDict), set(parallel.bundleDict))
+            for key in serial.bundleDict:
+                sValues = serial.bundleDict[key].metricValues
+                pValues = parallel.bundleDict[key].metricValues
+                np.testing.assert_array_equal(sValues.mask, pValues.mask)
+                # Some points are outside the footprint of the visits.
+                self.assertTrue(np.any(sValues.mask))
+                np.testing.assert_array_equal(
+                    sValues.compressed(), pValues.compressed()
+                )
+
+        serial = runBundles(1)
+        parallel = runBundles(3)
+        compare(serial, parallel)
+
+        # In streaming mode, one pool of workers is used for all of the tiles.
+        pools = []
+        getPool = metricBundles.MetricBundleGroup._getPool
+
+        def countPools(bgroup, *args):
+            pool = getPool(bgroup, *args)
+            if pool not in pools:
+                pools.append(pool)
+            return pool
+
+        with mock.patch.object(metricBundles.MetricBundleGroup, "_getPool", countPools):
+            streamed = runBundles(3, indexMemoryBudget=0.001)
+        self.assertEqual(len(pools), 1)
+        self.assertIsNone(streamed._pool)
+        for b in streamed.bundleDict.values():
+            b.read(os.path.join(streamed.outDir, b.fileRoot + ".npz"))
+        compare(serial, streamed)
+
+    def testIncremental(self):
+        """
+        Check that unchanged metric bundles are read back from disk in incremental mode
+        """
+        rng = np.random.default_rng(42)
+        nvisits = 1000
+        simData = np.zeros(
+            nvisits, dtype=list(zip(["fieldRA", "fieldDec", "airmass"], [float] * 3))
+        )
+        simData["fieldRA"] = rng.uniform(0, 360, nvisits)
+        simData["fieldDec"] = np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits)))
+        simData["airmass"] = rng.uniform(1, 2, nvisits)
+        resultsDb = db.ResultsDb(outDir=self.outDir)
+
+        def runBundles(metricName):
+            bundleDict = {}
+            for key, metric in [
+                ("mean", metrics.MeanMetric(col="airmass", metricName=metricName)),
+                ("max", metrics.MaxMetric(col="airmass")),
+            ]:
+                slicer = slicers.HealpixSlicer(nside=4, useCamera=False, verbose=False)
+                bundleDict[key] = metricBundles.MetricBundle(metric, slicer, "")
+            bgroup = metricBundles.MetricBundleGroup(
+                bundleDict,
+                None,
+                outDir=self.outDir,
+                resultsDb=resultsDb,
+                verbose=False,
+                incremental=True,
+            )
+            bgroup.runCurrent("", simData=simData)
+            return bgroup
+
+        first = runBundles("Mean airmass")
+        self.assertEqual(first.skipped, set())
+        # Nothing changed: both bundles are read from disk.
+        second = runBundles("Mean airmass")
+        self.assertEqual(second.skipped, set(["mean", "max"]))
+        for key in ["mean", "max"]:
+            np.testing.assert_array_equal(
+                first.bundleDict[key].metricValues.filled(),
+                second.bundleDict[key].metricValues.filled(),
+            )
+        # A changed metric is calculated again.
+        third = runBundles("Mean airmass again")
+        self.assertEqual(third.skipped, set(["max"]))
+        # Changed simData means everything is calculated again.
+        simData["airmass"] += 0.1
+        fourth = runBundles("Mean airmass again")
+        self.assertEqual(fourth.skipped, set())
+        np.testing.assert_allclose(
+            fourth.bundleDict["max"].metricValues.compressed(),
+            first.bundleDict["max"].metricValues.compressed() + 0.1,
+        )
+
+    def testIncrementalStackers(self):
+        """
+        Check that incremental mode skips every unchanged bundle, with stackers shared between constraints
+        """
+        rng = np.random.default_rng(42)
+        nvisits = 500
+        visits = pd.DataFrame(
+            {
+                "night": rng.integers(0, 10, nvisits),
+                "airmass": rng.uniform(1, 2, nvisits),
+                "fieldDec": np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits))),
+            }
+        )
+        dbFile = os.path.join(self.outDir, "opsim.db")
+        con = sqlite3.connect(dbFile)
+        visits.to_sql("observations", con, index=False)
+        con.close()
+
+        def runBundles():
+            stacker = stackers.NormAirmassStacker()
+            bundleList = [
+                metricBundles.MetricBundle(
+                    metrics.MeanMetric(col="normairmass", metricName="x_m%i" % i),
+                    slicers.UniSlicer(),
+                    "night < %i" % (i + 5),
+                    stackerList=[stacker],
+                )
+                for i in range(3)
+            ]
+            bgroup = metricBundles.MetricBundleGroup(
+                metricBundles.makeBundlesDictFromList(bundleList),
+                dbFile,
+                outDir=self.outDir,
+                verbose=False,
+                incremental=True,
+            )
+            bgroup.runAll()
+            return bgroup
+
+        first = runBundles()
+        self.assertEqual(first.skipped, set())
+        for i in range(2):
+            rerun = runBundles()
+            self.assertEqual(rerun.skipped, set(rerun.bundleDict.keys()))
+
+    def testStackerCacheConstraints(self):
+        """
+        Check that stacker columns are calculated once per visit, across constraints
+        """
+        rng = np.random.default_rng(42)
+        nvisits = 500
+        visits = pd.DataFrame(
+            {
+                "observationId": np.arange(nvisits),
+                "night": rng.integers(0, 10, nvisits),
+                "airmass": rng.uniform(1, 2, nvisits),
+                "fieldDec": np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits))),
+            }
+        )
+        dbFile = os.path.join(self.outDir, "opsim.db")
+        con = sqlite3.connect(dbFile)
+        visits.to_sql("observations", con, index=False)
+        con.close()
+
+        constraints = ["night < 5", "night < 8", "night > 2 and night < 7"]
+        bundleList = [
+            metricBundles.MetricBundle(
+                metrics.MeanMetric(col="normairmass", metricName="x_m%i" % i),
+                slicers.UniSlicer(),
+                constraint,
+                stackerList=[stackers.NormAirmassStacker()],
+            )
+            for i, constraint in enumerate(constraints)
+        ]
+        bgroup = metricBundles.MetricBundleGroup(
+            bundleList, dbFile, outDir=self.outDir, verbose=False, saveEarly=False
+        )
+        stackerRun = stackers.NormAirmassStacker._run
+        with mock.patch.object(
+            stackers.NormAirmassStacker,
+            "_run",
+            autospec=True,
+            side_effect=stackerRun,
+        ) as run:
+            bgroup.runAll()
+        # Each visit in any of the constraints was only calculated once.
+        nCalculated = sum(len(call.args[1]) for call in run.call_args_list)
+        self.assertEqual(nCalculated, np.sum(visits["night"] < 8))
+        # And the metric values match the stacker run on each constraint.
+        for b in bundleList:
+            sel = visits.query(b.constraint).to_records(index=False)
+            expected = stackers.NormAirmassStacker().run(sel)["normairmass"].mean()
+            self.assertAlmostEqual(b.metricValues[0], expected)
+
+    def testOverlapIndex(self):
+        """
+        Check that overlap indexes are only built for slicers which use them
+        """
+        rng = np.random.default_rng(42)
+        nvisits = 500
+        visits = pd.DataFrame(
+            {
+                "observationId": np.arange(nvisits),
+                "fieldRA": rng.uniform(0, 360, nvisits),
+                "fieldDec": np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits))),
+                "rotSkyPos": rng.uniform(0, 360, nvisits),
+            }
+        )
+        dbFile = os.path.join(self.outDir, "opsim.db")
+        con = sqlite3.connect(dbFile)
+        visits.to_sql("observations", con, index=False)
+        con.close()
+
+        results = []
+        for overlapIndexDir in [None, os.path.join(self.outDir, "overlap")]:
+            bundleDict = {
+                "healpix": metricBundles.MetricBundle(
+                    metrics.CountMetric(col="fieldRA"),
+                    slicers.HealpixSlicer(nside=4, useCamera=False, verbose=False),
+                    "",
+                ),
+                "noindex": metricBundles.MetricBundle(
+                    metrics.CountMetric(col="rotSkyPos"),
+                    slicers.HealpixSlicer(nside=8, useCamera=False, verbose=False),
+                    "",
+                ),
+            }
+            # As for slicers with their own setupSlicer, e.g. HealpixComCamSlicer
+            bundleDict["noindex"].slicer.useOverlapIndex = False
+            bgroup = metricBundles.MetricBundleGroup(
+                bundleDict,
+                dbFile,
+                outDir=self.outDir,
+                verbose=False,
+                overlapIndexDir=overlapIndexDir,
+            )
+            bgroup.runCurrent("")
+            results.append(bundleDict)
+        self.assertEqual(len(bgroup.overlapIndexes), 1)
+        self.assertIsNotNone(results[1]["healpix"].slicer.overlapIndex)
+        self.assertIsNone(results[1]["noindex"].slicer.overlapIndex)
+        self.assertFalse(slicers.HealpixComCamSlicer.useOverlapIndex)
+        self.assertFalse(slicers.HealpixSDSSSlicer.useOverlapIndex)
+        for key in results[0]:
+            np.testing.assert_array_equal(
+                results[0][key].metricValues.filled(),
+                results[1][key].metricValues.filled(),
+            )
+
+    def testStreaming(self):
+        """
+        Check that the streaming mode matches a normal run
+        """
+        rng = np.random.default_rng(42)
+        nvisits = 2000
+        simData = np.zeros(
+            nvisits,
+            dtype=list(zip(["fieldRA", "fieldDec", "airmass", "night"], [float] * 4)),
+        )
+        simData["fieldRA"] = rng.uniform(0, 360, nvisits)
+        simData["fieldDec"] = np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits)))
+        simData["airmass"] = rng.uniform(1, 2, nvisits)
+        simData["night"] = rng.integers(0, 365, nvisits)
+
+        results = []
+        for indexMemoryBudget in [None, 0.001]:
+            outDir = os.path.join(self.outDir, str(indexMemoryBudget))
+            bundleDict = {}
+            for key, metric in [
+                ("mean", metrics.MeanMetric(col="airmass")),
+                ("rms", metrics.RmsMetric(col="airmass")),
+                ("nights", metrics.CountUniqueMetric(col="night")),
+                ("normairmass", metrics.MeanMetric(col="normairmass")),
+            ]:
+                slicer = slicers.HealpixSlicer(nside=16, useCamera=False, verbose=False)
+                bundleDict[key] = metricBundles.MetricBundle(metric, slicer, "")
+            bgroup = metricBundles.MetricBundleGroup(
+                bundleDict,
+                None,
+                outDir=outDir,
+                verbose=False,
+                indexMemoryBudget=indexMemoryBudget,
+            )
+            bgroup.runCurrent("", simData=simData)
+            if indexMemoryBudget is not None:
+                # Stacker columns are not cached in streaming mode.
+                self.assertEqual(len(bgroup.stackerCache), 0)
+                # The metric values were written to disk and released from memory.
+                self.assertTrue(
+                    all(b.metricValues is None for b in bundleDict.values())
+                )
+                bgroup.readAll()
+            results.append({k: b.metricValues for k, b in bundleDict.items()})
+
+        for key in results[0]:
+            np.testing.assert_array_equal(results[0][key].mask, results[1][key].mask)
+            np.testing.assert_allclose(
+                results[0][key].compressed(), results[1][key].compressed()
+            )
+
+    def testSliceCache(self):
+        """
+        Check that metric values reused from the slice cache match uncached values
+        """
+        cache = metricBundles.SliceCache(2)
+        key1 = cache.key(np.array([3, 1, 2]))
+        self.assertEqual(key1, cache.key([1, 2, 3, 3]))
+        cache.add(key1, 0)
+        cache.add(cache.key([4]), 1)
+        self.assertEqual(cache.get(key1), 0)
+        # Adding a third entry evicts the least recently used one ([4]).
+        cache.add(cache.key([5]), 2)
+        self.assertIsNone(cache.get(cache.key([4])))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        rng = np.random.default_rng(42)
+        nvisits = 200
+        simData = np.zeros(
+            nvisits, dtype=list(zip(["fieldRA", "fieldDec", "airmass"], [float] * 3))
+        )
+        simData["fieldRA"] = rng.uniform(0, 360, nvisits)
+        simData["fieldDec"] = np.degrees(np.arcsin(rng.uniform(-1, 0.2, nvisits)))
+        simData["airmass"] = rng.uniform(1, 2, nvisits)
+        results = []
+        for useCache in [False, True]:
+            slicer = slicers.HealpixSlicer(
+                nside=32, useCamera=False, useCache=useCache, verbose=False
+            )
+            bundle = metricBundles.MetricBundle(
+                metrics.RmsMetric(col="airmass"), slicer, ""
+            )
+            bgroup = metricBundles.MetricBundleGroup(
+                [bundle], None, outDir=self.outDir, verbose=False, saveEarly=False
+            )
+            bgroup.runCurrent("", simData=simData)
+            results.append(bundle.metricValues)
+        self.assertGreater(bgroup.sliceCacheHits, 0)
+        np.testing.assert_array_equal(results[0].mask, results[1].mask)
+        np.testing.assert_array_equal(results[0].compressed(), results[1].compressed())
+
     def tearDown(self):
         if os.path.isdir(self.outDir):
             shutil.rmtree(self.outDir)
@@ -6,7 +6,10 @@ import rubin_sim.maf.utils.opsimUtils as opsimUtils
 import os
 from rubin_sim.data import get_data_dir
 import numpy as np
+import pandas as pd
 import sqlite3
+import tempfile
+import shutil
 
 
 class TestOpsimUtils(unittest.TestCase):
@@ -76,6 +79,98 @@ class TestOpsimUtils(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             opsimUtils.getSimData("not_a_file.db", sql, ["nocol"])
 
+    def testColumnCache(self):
+        """Test that the columnar cache returns the same data as a direct query"""
+        tempDir = tempfile.mkdtemp(prefix="OCC")
+        database_file = os.path.join(tempDir, "test.db")
+        rng = np.random.default_rng(12)
+        nvisits = 500
+        visits = pd.DataFrame(
+            {
+                "observationId": np.arange(nvisits),
+                "night": rng.integers(0, 30, nvisits),
+                "fieldRA": rng.uniform(0, 360, nvisits),
+                "filter": rng.choice(list("ugrizy"), nvisits),
+            }
+        )
+        con = sqlite3.connect(database_file)
+        visits.to_sql("observations", con, index=False)
+        con.close()
+
+        cache = opsimUtils.OpsimColumnCache(database_file)
+        dbcols = ["observationId", "fieldRA", "filter"]
+        for sql in ["", "night < 10", 'filter = "r" and night > 5']:
+            data = opsimUtils.getSimData(database_file, sql, dbcols)
+            cached = opsimUtils.getSimData(cache, sql, dbcols)
+            for col in dbcols:
+                np.testing.assert_array_equal(data[col], cached[col])
+        self.assertTrue(
+            os.path.isfile(os.path.join(cache.cacheDir, "observationId.npy"))
+        )
+        # No matching visits
+        with self.assertRaises(UserWarning):
+            opsimUtils.getSimData(cache, "night > 100", dbcols)
+        shutil.rmtree(tempDir)
+
+    def testColumnCacheTables(self):
+        """Test that the columnar cache keeps the tables apart, and NULL text values"""
+        tempDir = tempfile.mkdtemp(prefix="OCC")
+        database_file = os.path.join(tempDir, "test.db")
+        con = sqlite3.connect(database_file)
+        pd.DataFrame(
+            {"night": [1, 2, 3], "note": ["a", None, "c"], "seeing": [0.7, None, 0.9]}
+        ).to_sql("observations", con, index=False)
+        pd.DataFrame({"night": [4, 5]}).to_sql("other", con, index=False)
+        con.close()
+
+        cache = opsimUtils.OpsimColumnCache(database_file)
+        other = opsimUtils.OpsimColumnCache(database_file, tableName="other")
+        self.assertNotEqual(cache.cacheDir, other.cacheDir)
+        np.testing.assert_array_equal(
+            opsimUtils.getSimData(cache, "", ["night"])["night"], [1, 2, 3]
+        )
+        np.testing.assert_array_equal(
+            opsimUtils.getSimData(other, "", ["night"])["night"], [4, 5]
+        )
+        # Opening the cache again (for either table) reuses the cached columns.
+        cache = opsimUtils.OpsimColumnCache(database_file)
+        self.assertTrue(os.path.isfile(os.path.join(cache.cacheDir, "night.npy")))
+        np.testing.assert_array_equal(
+            opsimUtils.getSimData(cache, "night > 1", ["night"])["night"], [2, 3]
+        )
+
+        # NULL values are NaN, not the string "None".
+        for i in range(2):
+            data = opsimUtils.getSimData(
+                opsimUtils.OpsimColumnCache(database_file), "", ["note", "seeing"]
+            )
+            self.assertEqual(list(data["note"][[0, 2]]), ["a", "c"])
+            self.assertTrue(np.isnan(data["note"][1]))
+            self.assertTrue(np.isnan(data["seeing"][1]))
+        data = opsimUtils.getSimData(
+            opsimUtils.OpsimColumnCache(database_file), "night != 2", ["note"]
+        )
+        self.assertEqual(list(data["note"]), ["a", "c"])
+        shutil.rmtree(tempDir)
+
+    def testGuessTableName(self):
+        """Test that an unknown schema raises an error"""
+        tempDir = tempfile.mkdtemp(prefix="OGT")
+        database_file = os.path.join(tempDir, "test.db")
+        con = sqlite3.connect(database_file)
+        pd.DataFrame({"night": [1, 2]}).to_sql("visits", con, index=False)
+        pd.DataFrame({"night": [1, 2]}).to_sql("summary", con, index=False)
+        con.close()
+        self.assertEqual(opsimUtils._guessTableName(database_file), "summary")
+        con = sqlite3.connect(database_file)
+        con.execute("DROP TABLE summary")
+        con.close()
+        with self.assertRaises(ValueError):
+            opsimUtils._guessTableName(database_file)
+        with self.assertRaises(ValueError):
+            opsimUtils.getSimData(database_file, "", ["night"])
+        shutil.rmtree(tempDir)
+
 
 if __name__ == "__main__":
     unittest.main()
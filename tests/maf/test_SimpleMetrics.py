@@ -209,6 +209,66 @@ class TestSimpleMetrics(unittest.TestCase):
         data["filter"] = "r"
         result = testmetric.run(data, None)
 
+    def testRunBatch(self):
+        """Test runBatch matches run at each slicePoint, including empty slicePoints."""
+        rng = np.random.default_rng(42)
+        data = np.array(
+            list(zip(rng.normal(24, 1, 100))), dtype=[("testdata", "float")]
+        )
+        idxList = [rng.choice(100, size=n) for n in [5, 0, 1, 10, 2, 0, 50]]
+        indptr = np.concatenate([[0], np.cumsum([len(idxs) for idxs in idxList])])
+        indices = np.concatenate(idxList)
+        for testmetric in [
+            metrics.MaxMetric("testdata"),
+            metrics.MinMetric("testdata"),
+            metrics.MeanMetric("testdata"),
+            metrics.MedianMetric("testdata"),
+            metrics.SumMetric("testdata"),
+            metrics.CountMetric("testdata"),
+            metrics.CountRatioMetric("testdata", normVal=2.0),
+            metrics.Coaddm5Metric(m5Col="testdata"),
+        ]:
+            self.assertTrue(testmetric.canRunBatch())
+            result = testmetric.runBatch(data, indptr, indices)
+            self.assertEqual(len(result), len(idxList))
+            for i, idxs in enumerate(idxList):
+                if len(idxs) > 0:
+                    self.assertAlmostEqual(result[i], testmetric.run(data[idxs]))
+        # A metric which does not implement runBatch.
+        self.assertFalse(metrics.RmsMetric("testdata").canRunBatch())
+
+        # A subclass overriding run should not use the parent runBatch.
+        class NewMeanMetric(metrics.MeanMetric):
+            def run(self, dataSlice, slicePoint=None):
+                return 0
+
+        self.assertFalse(NewMeanMetric("testdata").canRunBatch())
+
+    def testRunBatchNaN(self):
+        """Test runBatch matches run at slicePoints with nan values."""
+        rng = np.random.default_rng(42)
+        data = np.array(
+            list(zip(rng.normal(24, 1, 100))), dtype=[("testdata", "float")]
+        )
+        data["testdata"][[3, 17, 40]] = np.nan
+        # Slices with a nan at the start, middle and end of the sorted values, and none
+        idxList = [[3, 0, 1], [5, 17, 6, 7], [40], [8, 9, 10, 11], [17, 17], []]
+        indptr = np.concatenate([[0], np.cumsum([len(idxs) for idxs in idxList])])
+        indices = np.concatenate(idxList).astype(int)
+        for testmetric in [
+            metrics.MaxMetric("testdata"),
+            metrics.MinMetric("testdata"),
+            metrics.MeanMetric("testdata"),
+            metrics.MedianMetric("testdata"),
+            metrics.SumMetric("testdata"),
+        ]:
+            result = testmetric.runBatch(data, indptr, indices)
+            for i, idxs in enumerate(idxList):
+                if len(idxs) > 0:
+                    np.testing.assert_equal(
+                        result[i], testmetric.run(data[idxs]), err_msg=testmetric.name
+                    )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -58,6 +58,94 @@ class TestStackerClasses(unittest.TestCase):
         s2 = stackers.RandomDitherFieldPerVisitStacker(decCol="blah")
         assert s1 != s2
 
+    def testOrderStackers(self):
+        """Test that stackers are ordered by their column dependencies."""
+        zd = stackers.ZenithDistStacker(altCol="HA")
+        ha = stackers.HourAngleStacker()
+        dither = stackers.RandomDitherFieldPerVisitStacker()
+        ordered = stackers.orderStackers([zd, ha, dither])
+        self.assertEqual(ordered, [dither, ha, zd])
+        ordered = stackers.orderStackers([ha, zd])
+        self.assertEqual(ordered, [ha, zd])
+
+    def testStackerCache(self):
+        """Test that stacker columns are reused for the same stacker and data."""
+        data = np.zeros(600, dtype=list(zip(["airmass", "fieldDec"], [float, float])))
+        data["airmass"] = np.random.rand(600) + 1.0
+        data["fieldDec"] = np.random.rand(600) * -90.0
+        cache = stackers.StackerCache()
+        stacker = stackers.NormAirmassStacker(degrees=True)
+        expected = stacker.run(data)
+        result = cache.run(stacker, data)
+        self.assertEqual(cache.misses, 1)
+        # An identical stacker on the same data should come from the cache.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            result = cache.run(stackers.NormAirmassStacker(degrees=True), result)
+        self.assertEqual(cache.hits, 1)
+        np.testing.assert_array_equal(result["normairmass"], expected["normairmass"])
+        # Different data or parameters should be recalculated.
+        data["airmass"] += 0.1
+        cache.run(stacker, data)
+        cache.run(stackers.NormAirmassStacker(decCol="fieldDec", degrees=False), data)
+        self.assertEqual(cache.misses, 3)
+        # A cache with maxSize 0 always runs the stacker and keeps nothing.
+        cache = stackers.StackerCache(maxSize=0)
+        for i in range(2):
+            result = cache.run(stacker, data)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 2)
+        np.testing.assert_array_equal(
+            result["normairmass"], stacker.run(data)["normairmass"]
+        )
+
+    def testStackerCacheVisits(self):
+        """Test that stacker columns are sliced from the cache by visit id."""
+        names = ["observationId", "airmass", "fieldDec", "night", "fieldRA"]
+        data = np.zeros(600, dtype=list(zip(names, [float] * len(names))))
+        data["observationId"] = np.arange(600)
+        data["airmass"] = np.random.rand(600) + 1.0
+        data["fieldDec"] = np.random.rand(600) * -90.0
+        data["night"] = np.arange(600) // 20
+        cache = stackers.StackerCache()
+        stacker = stackers.NormAirmassStacker()
+        first = data[::2]
+        cache.run(stacker, first, dataKey="db")
+        self.assertEqual(cache.misses, 1)
+        # A subset of the visits already calculated, in a different order, comes from the cache.
+        subset = first[::-3]
+        result = cache.run(stacker, subset, dataKey="db")
+        self.assertEqual(cache.hits, 1)
+        np.testing.assert_array_equal(
+            result["normairmass"], stacker.run(subset)["normairmass"]
+        )
+        # New visits are calculated, and added to the cache.
+        result = cache.run(stacker, data, dataKey="db")
+        self.assertEqual(cache.misses, 2)
+        np.testing.assert_array_equal(
+            result["normairmass"], stacker.run(data)["normairmass"]
+        )
+        cache.run(stacker, data[1::2], dataKey="db")
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(len(cache), 1)
+        # A different database is calculated again.
+        cache.run(stacker, data, dataKey="otherdb")
+        self.assertEqual(cache.misses, 3)
+        # Dither stackers are only reused for the same visits, and so are the stackers using
+        # their columns.
+        dither = stackers.RandomDitherPerNightStacker(randomSeed=42)
+        ha = stackers.HourAngleStacker(raCol="randomDitherPerNightRa")
+        keys = cache.dataKeys([dither, stacker, ha], "db")
+        self.assertIsNotNone(keys[1])
+        self.assertIsNone(keys[2])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cache.run(dither, data, dataKey=keys[0])
+            cache.run(dither, data[::2], dataKey=keys[0])
+            self.assertEqual(cache.misses, 5)
+            cache.run(dither, data[::2], dataKey=keys[0])
+            self.assertEqual(cache.hits, 3)
+
     def testNormAirmass(self):
         """
         Test the normalized airmass stacker.
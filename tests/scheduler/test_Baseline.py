@@ -1,4 +1,6 @@
 import os
+import shutil
+import tempfile
 import numpy as np
 import unittest
 from rubin_sim.data import get_data_dir
@@ -11,7 +13,8 @@ from rubin_sim.scheduler.surveys import (
     Pairs_survey_scripted,
 )
 from rubin_sim.scheduler.schedulers import Core_scheduler
-from rubin_sim.scheduler import sim_runner
+from rubin_sim.scheduler import sim_runner, sim_farm
+from rubin_sim.scheduler.utils import schema_converter
 from rubin_sim.scheduler.modelObservatory import Model_observatory
 import rubin_sim.scheduler.detailers as detailers
 
@@ -216,6 +219,101 @@ class TestFeatures(unittest.TestCase):
         # Make sure nothing tried to look through the earth
         assert np.min(observations["alt"]) > 0
 
+    def testCheckpoint(self):
+        """
+        Check a run resumed from a checkpoint matches the uninterrupted run
+        """
+        nside = 32
+        survey_length = 2.0  # days
+        temp_dir = tempfile.mkdtemp()
+        checkpoint_file = os.path.join(temp_dir, "checkpoint.pkl")
+
+        scheduler = Core_scheduler(gen_greedy_surveys(nside), nside=nside)
+        observatory = Model_observatory(nside=nside, mjd_start=59853.5)
+        observatory, scheduler, observations = sim_runner(
+            observatory,
+            scheduler,
+            survey_length=survey_length,
+            filename=None,
+            checkpoint_file=checkpoint_file,
+            checkpoint_interval=0.5,
+        )
+        assert os.path.isfile(checkpoint_file)
+
+        # Resume from the last checkpoint, the passed scheduler and observatory are ignored
+        observatory, scheduler, resumed = sim_runner(
+            None,
+            None,
+            filename=None,
+            checkpoint_file=checkpoint_file,
+            resume=True,
+        )
+        np.testing.assert_array_equal(observations, resumed)
+        shutil.rmtree(temp_dir)
+
+    def testFarm(self):
+        """
+        Run several simulations from one observatory in parallel
+        """
+        nside = 32
+        temp_dir = tempfile.mkdtemp()
+
+        def make_scheduler():
+            return Core_scheduler(gen_greedy_surveys(nside), nside=nside)
+
+        observatory = Model_observatory(nside=nside, mjd_start=59853.5)
+        configs = [
+            {
+                "name": "run%i" % i,
+                "scheduler": make_scheduler,
+                "seed": seed,
+                "survey_length": 1.0,
+                "filename": os.path.join(temp_dir, "run%i.db" % i),
+            }
+            for i, seed in enumerate([42, 42, 7])
+        ]
+        manifest = sim_farm(
+            observatory,
+            configs,
+            n_processes=2,
+            manifest=os.path.join(temp_dir, "manifest.csv"),
+        )
+        assert np.all(manifest["error"] == "")
+        assert np.all(manifest["n_observations"] > 100)
+        assert os.path.isfile(os.path.join(temp_dir, "manifest.csv"))
+        # The same seed gives the same simulation
+        converter = schema_converter()
+        run0 = converter.opsim2obs(configs[0]["filename"])
+        run1 = converter.opsim2obs(configs[1]["filename"])
+        np.testing.assert_array_equal(run0, run1)
+        shutil.rmtree(temp_dir)
+
+    def testLazyConditions(self):
+        """
+        Check lazy conditions read after observing match the eager ones
+        """
+        nside = 32
+        lazy = Model_observatory(nside=nside, mjd_start=59853.5)
+        eager = Model_observatory(nside=nside, mjd_start=59853.5, lazy_conditions=False)
+        scheduler = Core_scheduler(gen_greedy_surveys(nside), nside=nside)
+        for i in range(3):
+            lazy_conditions = lazy.return_conditions()
+            eager_conditions = eager.return_conditions()
+            expected = {
+                "slewtime": eager_conditions.slewtime.copy(),
+                "airmass": eager_conditions.airmass.copy(),
+                "moonAlt": eager_conditions.moonAlt,
+            }
+            scheduler.update_conditions(eager_conditions)
+            observation = scheduler.request_observation()
+            # Move the observatory on before the lazy conditions are read
+            lazy.observe(observation)
+            eager.observe(observation)
+            for key in expected:
+                np.testing.assert_array_equal(
+                    getattr(lazy_conditions, key), expected[key]
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,39 @@
 import os
 import numpy as np
+import healpy as hp
 import unittest
 from rubin_sim.data import get_data_dir
 from rubin_sim.scheduler.schedulers import Core_scheduler
+from rubin_sim.scheduler import sim_runner
 import rubin_sim.scheduler.basis_functions as basis_functions
 import rubin_sim.scheduler.surveys as surveys
-from rubin_sim.scheduler.utils import standard_goals
+from rubin_sim.scheduler.utils import (
+    standard_goals,
+    Scheduler_profiler,
+    empty_observation,
+)
 from rubin_sim.scheduler.modelObservatory import Model_observatory
+from rubin_sim.scheduler.features import Conditions
+
+
+class Map_basis_function(basis_functions.Base_basis_function):
+    """Return a fixed map, counting the evaluations"""
+
+    def __init__(self, value_map, nside=None):
+        super(Map_basis_function, self).__init__(nside=nside)
+        self.value_map = value_map
+        self.n_evaluated = 0
+
+    def _calc_value(self, conditions, indx=None):
+        self.n_evaluated += 1
+        return self.value_map
+
+
+class Infeasible_survey(surveys.BaseMarkovDF_survey):
+    """A survey which is never feasible"""
+
+    def _check_feasibility(self, conditions):
+        return False
 
 
 class TestCoreSched(unittest.TestCase):
@@ -39,6 +66,155 @@ class TestCoreSched(unittest.TestCase):
         # Check that we can add an observation
         scheduler.add_observation(obs)
 
+    def test_profiler(self):
+        bfs = [
+            basis_functions.Constant_basis_function(),
+            basis_functions.Visit_repeat_basis_function(),
+        ]
+        survey = surveys.BaseSurvey(bfs, survey_name="test")
+        scheduler = Core_scheduler([survey], nside=32)
+        original_class = type(bfs[1])
+
+        profiler = Scheduler_profiler()
+        profiler.attach(scheduler)
+        obs = empty_observation()
+        obs["RA"] = 1.0
+        obs["dec"] = -0.5
+        obs["filter"] = "r"
+        scheduler.add_observation(obs[0])
+        survey.calc_reward_function(None)
+        profiler.detach()
+
+        # The original classes are restored
+        assert type(bfs[1]) is original_class
+        report = profiler.report(sort_by="calls")
+        assert np.all(np.diff(report["calls"].values) <= 0)
+        methods = set(zip(report["object"], report["method"]))
+        assert ("Core_scheduler", "add_observation") in methods
+        assert ("0.0 test", "calc_reward_function") in methods
+        assert (
+            "0.0 test/Visit_repeat_basis_function[1]/Pair_in_night",
+            "add_observation",
+        ) in methods
+
+    def test_profiler_detached_on_error(self):
+        """The profiler is detached even if the simulation fails"""
+
+        class Failing_observatory(object):
+            mjd = 59853.5
+
+            def return_conditions(self):
+                raise RuntimeError("No conditions")
+
+        bfs = [basis_functions.Constant_basis_function()]
+        scheduler = Core_scheduler(
+            [surveys.BaseSurvey(bfs, survey_name="test")], nside=32
+        )
+        original_class = type(bfs[0])
+        profiler = Scheduler_profiler()
+        with self.assertRaises(RuntimeError):
+            sim_runner(Failing_observatory(), scheduler, profiler=profiler)
+        assert type(bfs[0]) is original_class
+        assert type(scheduler) is Core_scheduler
+
+    def test_batch_rewards(self):
+        """Batched reward evaluation shares basis functions and matches the default rewards"""
+        nside = 16
+        target_maps = standard_goals(nside=nside)
+        observatory = Model_observatory(
+            nside=nside,
+            mjd_start=59853.5,
+            seeing_db=os.path.join(get_data_dir(), "tests", "seeing.db"),
+        )
+        conditions = observatory.return_conditions()
+
+        rewards = {}
+        for batch in [False, True]:
+            survey_list = []
+            for filtername in ["g", "r", "i"]:
+                bfs = [
+                    basis_functions.M5_diff_basis_function(
+                        filtername=filtername, nside=nside
+                    ),
+                    basis_functions.Target_map_basis_function(
+                        filtername=filtername,
+                        target_map=target_maps[filtername],
+                        nside=nside,
+                    ),
+                    basis_functions.Zenith_shadow_mask_basis_function(nside=nside),
+                    basis_functions.Moon_avoidance_basis_function(nside=nside),
+                ]
+                survey_list.append(
+                    surveys.Greedy_survey(
+                        bfs,
+                        np.array([1.0, 0.5, 0.0, 0.0]),
+                        filtername=filtername,
+                        nside=nside,
+                    )
+                )
+            scheduler = Core_scheduler(survey_list, nside=nside, batch_rewards=batch)
+            scheduler.update_conditions(conditions)
+            if batch:
+                # The masks are shared by all three surveys
+                n_unique = len(
+                    set(
+                        id(bf)
+                        for survey in survey_list
+                        for bf in survey.basis_functions
+                    )
+                )
+                assert n_unique == 8
+                scheduler._batch_basis_rewards(survey_list)
+            rewards[batch] = [
+                survey.calc_reward_function(scheduler.conditions)
+                for survey in survey_list
+            ]
+        for default, batched in zip(rewards[False], rewards[True]):
+            np.testing.assert_allclose(default, batched)
+
+    def test_batch_rewards_infeasible(self):
+        """Batched rewards match the default rewards, and skip infeasible surveys"""
+        nside = 16
+        conditions = Conditions(nside=nside)
+        conditions.mjd = 59853.5
+        rng = np.random.default_rng(42)
+        npix = hp.nside2npix(nside)
+        maps = [rng.uniform(0, 1, npix) for i in range(4)]
+
+        rewards = {}
+        evaluated = {}
+        for batch in [False, True]:
+            survey_list = []
+            # The last survey is infeasible, although its basis functions are all feasible
+            for i, survey_class in enumerate(
+                [
+                    surveys.BaseMarkovDF_survey,
+                    surveys.BaseMarkovDF_survey,
+                    Infeasible_survey,
+                ]
+            ):
+                bfs = [
+                    Map_basis_function(maps[i], nside=nside),
+                    Map_basis_function(maps[-1], nside=nside),
+                ]
+                survey_list.append(survey_class(bfs, np.array([1.0, 0.5]), nside=nside))
+            scheduler = Core_scheduler(survey_list, nside=nside, batch_rewards=batch)
+            scheduler.conditions = conditions
+            if batch:
+                scheduler._batch_basis_rewards(survey_list)
+                assert survey_list[0].batched_reward is not None
+                assert survey_list[2].batched_reward is None
+            rewards[batch] = [
+                survey.calc_reward_function(conditions) for survey in survey_list
+            ]
+            evaluated[batch] = survey_list[2].basis_functions[0].n_evaluated
+        for default, batched in zip(rewards[False], rewards[True]):
+            np.testing.assert_allclose(default, batched)
+        assert rewards[True][2] == -np.inf
+        # The basis functions of the infeasible survey are not evaluated.
+        assert evaluated[False] == 0
+        assert evaluated[True] == 0
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,9 @@
+import copy
 import numpy as np
 import unittest
 import rubin_sim.scheduler.features as features
-from rubin_sim.scheduler.utils import empty_observation
+from rubin_sim.scheduler.utils import empty_observation, hp_in_lsst_fov
+from rubin_sim.utils import _angularSeparation
 
 
 class TestFeatures(unittest.TestCase):
@@ -29,6 +31,121 @@ class TestFeatures(unittest.TestCase):
         pin.add_observation(obs, indx=indx)
         self.assertEqual(np.max(pin.feature), 2.0)
 
+    def testAdd_observations_array(self):
+        """Adding an array of observations matches adding them one at a time"""
+        rng = np.random.default_rng(42)
+        n_obs = 200
+        observations = np.concatenate([empty_observation() for i in range(n_obs)])
+        observations["RA"] = rng.uniform(0, 0.5, n_obs)
+        observations["dec"] = rng.uniform(-0.5, -0.2, n_obs)
+        observations["mjd"] = np.sort(rng.uniform(59000, 59400, n_obs))
+        observations["night"] = np.floor(observations["mjd"] - 59000).astype(int)
+        observations["filter"] = rng.choice(list("ugrizy"), n_obs)
+        observations["note"] = rng.choice(["DD:x", "blob", "greedy"], n_obs)
+        observations["FWHMeff"] = rng.uniform(0.5, 2.0, n_obs)
+        observations["skybrightness"] = 21.0
+        observations["exptime"] = 30.0
+        observations["airmass"] = 1.2
+        indices, indptr = hp_in_lsst_fov(nside=32).batch(
+            observations["RA"], observations["dec"]
+        )
+
+        feature_list = [
+            features.N_obs_count(filtername="gr"),
+            features.N_obs_survey(note="DD"),
+            features.Last_observation(survey_name="blob"),
+            features.N_observations(nside=32, filtername="gr"),
+            features.N_observations_season(
+                1, nside=32, offset=np.zeros(12288, dtype=int)
+            ),
+            features.Last_N_obs_times(nside=32, n_obs=3),
+            features.Coadded_depth(nside=32, filtername="g", FWHMeff_limit=1.2),
+            features.Last_observed(nside=32, filtername="ri"),
+            features.N_obs_night(nside=32),
+            features.Pair_in_night(nside=32, filtername="gr"),
+        ]
+        for feature in feature_list:
+            feature_array = copy.deepcopy(feature)
+            for i, observation in enumerate(observations):
+                feature.add_observation(
+                    observation, indx=indices[indptr[i] : indptr[i + 1]]
+                )
+            feature_array.add_observations_array(observations, (indices, indptr))
+            if isinstance(feature.feature, np.ndarray):
+                np.testing.assert_allclose(feature.feature, feature_array.feature)
+            else:
+                self.assertEqual(feature.feature, feature_array.feature)
+
+    def testConditions_lazy(self):
+        """Lazy conditions are only computed when accessed, and only once"""
+        conditions = features.Conditions(nside=8)
+        conditions.mjd = 59853.5
+        calls = []
+
+        def sky():
+            calls.append("sky")
+            return {"r": np.zeros(conditions.ra.size) + 20.0}
+
+        conditions.set_lazy("skybrightness", sky)
+        conditions.set_lazy("FWHMeff", lambda: {"r": np.ones(conditions.ra.size)})
+        conditions.set_lazy("airmass", lambda: np.ones(conditions.ra.size))
+        conditions.set_lazy("moonAlt", lambda: 0.5)
+        self.assertEqual(len(calls), 0)
+        self.assertEqual(conditions.moonAlt, 0.5)
+        # The depth computes the sky brightness it needs
+        m5 = conditions.M5Depth["r"]
+        assert np.all(np.isfinite(m5))
+        np.testing.assert_array_equal(conditions.skybrightness["r"], 20.0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(conditions.lazy_stats["skybrightness"], [1, 1])
+
+        # A new provider replaces the old value
+        conditions.set_lazy("moonAlt", lambda: 0.2)
+        conditions.set_lazy("skybrightness", sky)
+        self.assertEqual(conditions.moonAlt, 0.2)
+        self.assertEqual(conditions.lazy_stats["skybrightness"], [2, 1])
+        self.assertEqual(len(calls), 1)
+        with self.assertRaises(AttributeError):
+            conditions.not_an_attribute
+
+    def testConditions_geometry(self):
+        """The shared geometry maps match direct calculation and are cached"""
+        conditions = features.Conditions(nside=16)
+        conditions.mjd = 59853.5
+        conditions.moonAz = 1.0
+        conditions.moonAlt = 0.5
+
+        moon_distance = conditions.moon_distance
+        np.testing.assert_array_equal(
+            moon_distance,
+            _angularSeparation(conditions.az, conditions.alt, 1.0, 0.5),
+        )
+        assert conditions.moon_distance is moon_distance
+        assert not moon_distance.flags.writeable
+        # Moving the moon or the time recalculates the map
+        conditions.moonAlt = 0.6
+        assert conditions.moon_distance is not moon_distance
+        zd = conditions.zenith_distance
+        conditions.mjd = 59853.6
+        assert conditions.zenith_distance is not zd
+        np.testing.assert_array_equal(
+            conditions.zenith_distance, np.pi / 2.0 - conditions.alt
+        )
+
+        conditions.pixel_distance_cache_size = 2
+        dists = conditions.distance_from_pixel(10)
+        np.testing.assert_array_equal(
+            dists,
+            _angularSeparation(
+                conditions.ra[10], conditions.dec[10], conditions.ra, conditions.dec
+            ),
+        )
+        assert conditions.distance_from_pixel(10) is dists
+        conditions.distance_from_pixel(11)
+        conditions.distance_from_pixel(12)
+        # Least recently used is dropped
+        assert conditions.distance_from_pixel(10) is not dists
+
 
 if __name__ == "__main__":
     unittest.main()
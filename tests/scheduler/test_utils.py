@@ -1,9 +1,31 @@
 import unittest
 import os
+import shutil
+import tempfile
+import numpy as np
 from rubin_sim.data import get_data_dir
 from rubin_sim.scheduler.utils import season_calc
 from rubin_sim.scheduler.modelObservatory import Model_observatory
 from rubin_sim.scheduler.utils import run_info_table
+from rubin_sim.scheduler.utils import (
+    Observation_buffer,
+    empty_observation,
+    schema_converter,
+    tsp_insertion,
+    tsp_convex,
+    route_length,
+    generate_dist_matrix,
+    int_rounded,
+    rounded,
+    rounded_gt,
+    rounded_le,
+    hp_in_lsst_fov,
+    hp_in_comcam_fov,
+    warm_start,
+)
+from rubin_sim.scheduler.features import Conditions, N_observations
+from rubin_sim.scheduler.surveys import BaseSurvey
+from rubin_sim.scheduler.schedulers import Core_scheduler
 
 
 class TestFeatures(unittest.TestCase):
@@ -54,6 +76,133 @@ class TestFeatures(unittest.TestCase):
         for k in need_keys:
             self.assertTrue(k in have_keys)
 
+    def test_observation_buffer(self):
+        """Test the observation buffer grows and flushes to disk"""
+        temp_dir = tempfile.mkdtemp()
+        filename = os.path.join(temp_dir, "obs.db")
+        n_obs = 25
+        buffer = Observation_buffer(filename=filename, flush_every=10, initial_size=4)
+        for i in range(n_obs):
+            obs = empty_observation()
+            obs["mjd"] = 60000.0 + i
+            obs["RA"] = 0.01 * i
+            buffer.append(obs)
+        assert len(buffer) == n_obs
+        np.testing.assert_array_equal(
+            buffer.observations["mjd"], 60000.0 + np.arange(n_obs)
+        )
+        # Only complete chunks have been written so far
+        assert buffer.n_written == 20
+        assert schema_converter().opsim2obs(filename).size == 20
+        buffer.flush()
+        restored = schema_converter().opsim2obs(filename)
+        np.testing.assert_array_equal(restored["mjd"], buffer.observations["mjd"])
+        np.testing.assert_allclose(restored["RA"], buffer.observations["RA"])
+
+        # Observations can be dropped from memory once written
+        buffer = Observation_buffer(filename=filename, flush_every=10, keep=False)
+        for i in range(n_obs):
+            buffer.append(empty_observation())
+        assert len(buffer) == n_obs
+        assert buffer.observations.size == 5
+        shutil.rmtree(temp_dir)
+
+    def test_tsp_insertion(self):
+        """Test the insertion TSP solver finds good, repeatable routes"""
+        rng = np.random.default_rng(42)
+        for i in range(5):
+            towns = np.round(rng.random((60, 2)) * 1e4).astype(int)
+            dist_matrix = generate_dist_matrix(towns)
+            route = tsp_insertion(towns)
+            # Every town visited once
+            np.testing.assert_array_equal(np.sort(route), np.arange(60))
+            np.testing.assert_array_equal(route, tsp_insertion(towns))
+            assert route_length(route, dist_matrix) <= route_length(
+                tsp_convex(towns), dist_matrix
+            )
+        # Collinear towns
+        towns = np.vstack([np.arange(10), np.arange(10)]).T
+        route = tsp_insertion(towns)
+        np.testing.assert_array_equal(np.sort(route), np.arange(10))
+
+    def test_rounded(self):
+        """Test the rounded comparisons match int_rounded"""
+        values = np.array([np.nan, 0.1 + 0.2, 0.3, -1.0, 2.5e-6, 3.5e-6])
+        np.testing.assert_array_equal(rounded(values), int_rounded(values).value)
+        assert rounded(0.1 + 0.2) == int_rounded(0.3).value
+        np.testing.assert_array_equal(
+            rounded_gt(values, 0.3), int_rounded(values) > int_rounded(0.3)
+        )
+        np.testing.assert_array_equal(
+            rounded_le(values, 0.3), int_rounded(values) <= int_rounded(0.3)
+        )
+
+        conditions = Conditions(nside=8)
+        conditions.mjd = 59853.5
+        alt_rounded = conditions.rounded("alt")
+        np.testing.assert_array_equal(alt_rounded, int_rounded(conditions.alt).value)
+        assert conditions.rounded("alt") is alt_rounded
+        conditions.mjd = 59853.6
+        np.testing.assert_array_equal(
+            conditions.rounded("alt"), int_rounded(conditions.alt).value
+        )
+
+    def test_fov_batch(self):
+        """Test the batched field of view lookups match the single pointing ones"""
+        rng = np.random.default_rng(42)
+        n_obs = 50
+        ra = rng.uniform(0, 2.0 * np.pi, n_obs)
+        dec = np.arcsin(rng.uniform(-1, 1, n_obs))
+        rot = rng.uniform(0, 2.0 * np.pi, n_obs)
+        # Revisit some of the pointings
+        ra[25:] = ra[:25]
+        dec[25:] = dec[:25]
+        for fov_class, nside in [(hp_in_lsst_fov, 32), (hp_in_comcam_fov, 256)]:
+            fov = fov_class(nside=nside)
+            uncached = fov_class(nside=nside, cache_size=0)
+            indices, indptr = fov.batch(ra, dec, rotSkyPos=rot)
+            assert indptr.size == n_obs + 1
+            for i in range(n_obs):
+                indx = uncached(ra[i], dec[i], rotSkyPos=rot[i])
+                assert np.size(indx) > 0
+                np.testing.assert_array_equal(indices[indptr[i] : indptr[i + 1]], indx)
+                np.testing.assert_array_equal(
+                    fov(ra[i], dec[i], rotSkyPos=rot[i]), indx
+                )
+
+            # The healpixels are sorted, and the cached arrays can not be modified in place
+            indx = fov(ra[0], dec[0], rotSkyPos=rot[0])
+            assert np.all(np.diff(indx) > 0)
+            assert np.all(np.diff(indices[indptr[1] : indptr[2]]) > 0)
+            with self.assertRaises(ValueError):
+                indx[0] = -1
+            np.testing.assert_array_equal(
+                fov(ra[0], dec[0], rotSkyPos=rot[0]),
+                uncached(ra[0], dec[0], rotSkyPos=rot[0]),
+            )
+            # The batched indices are a new array
+            assert indices.flags.writeable
+
+        # Replaying a batch of observations matches adding them one at a time
+        observations = np.concatenate([empty_observation() for i in range(n_obs)])
+        observations["RA"] = ra
+        observations["dec"] = dec
+        observations["mjd"] = np.arange(n_obs)
+        observations["filter"] = "r"
+        schedulers = []
+        for i in range(2):
+            survey = BaseSurvey([], extra_features={"nobs": N_observations(nside=32)})
+            schedulers.append(Core_scheduler([survey], nside=32))
+        warm_start(schedulers[0], observations)
+        for obs in observations:
+            schedulers[1].add_observation(obs)
+        nobs = [
+            scheduler.survey_lists[0][0].extra_features["nobs"].feature
+            for scheduler in schedulers
+        ]
+        np.testing.assert_array_equal(nobs[0], nobs[1])
+        assert nobs[0].sum() > 0
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,8 @@
 import unittest
+import numpy as np
+from scipy.interpolate import interp1d
 from rubin_sim.site_models import Almanac
+from rubin_sim.site_models.almanac import _Spline_table
 
 
 class TestAlmanac(unittest.TestCase):
@@ -14,6 +17,23 @@ class TestAlmanac(unittest.TestCase):
         moon = alma.get_sun_moon_positions(mjd)
         indx = alma.mjd_indx(mjd)
 
+    def test_spline_table(self):
+        rng = np.random.default_rng(42)
+        mjd = 59853.0 + np.cumsum(rng.uniform(0.003, 0.005, 1000))
+        values = {"alt": np.sin(mjd * 3.0), "dec": rng.normal(size=mjd.size)}
+        mjds = np.concatenate([rng.uniform(mjd[0], mjd[-1], 100), mjd[:3], mjd[-3:]])
+        for kind in ["linear", "quadratic", "cubic"]:
+            table = _Spline_table(mjd, values, kind=kind)
+            result = table(mjds)
+            for key in values:
+                np.testing.assert_allclose(
+                    result[key], interp1d(mjd, values[key], kind=kind)(mjds), atol=1e-12
+                )
+            # Scalars give scalars
+            self.assertEqual(table(mjds[0])["alt"].shape, ())
+        with self.assertRaises(ValueError):
+            table(mjd[-1] + 1.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,7 @@
+import os
+import pickle
+import tempfile
+import shutil
 import unittest
 import rubin_sim.skybrightness as sb
 import rubin_sim.skybrightness_pre as sbp
@@ -12,6 +16,49 @@ from astropy import units as u
 from astropy.time import Time
 
 
+def write_fake_sky_files(data_dir):
+    """Write two overlapping files of fake sky maps to data_dir.
+
+    Returns the mjds of the maps and the .npz filenames.
+    """
+    nside = 4
+    npix = hp.nside2npix(nside)
+    ra, dec = utils.hpid2RaDec(nside, np.arange(npix))
+    rng = np.random.default_rng(42)
+    # Fake sky maps every 5 minutes, for two 12 hour nights
+    night = np.arange(144) * 5.0 / 60.0 / 24.0
+    mjds = np.concatenate([60000.0 + night, 60001.0 + night])
+    info = {"mjds": mjds, "airmass": rng.uniform(1.0, 3.0, (mjds.size, npix))}
+    for key in [
+        "sunAlts",
+        "moonAlts",
+        "moonRAs",
+        "moonDecs",
+        "sunRAs",
+        "sunDecs",
+        "moonSunSep",
+    ]:
+        info[key] = rng.uniform(0.0, 1.0, mjds.size)
+    for key in ["airmass", "planet", "moon", "zenith"]:
+        info[key + "_masks"] = rng.uniform(size=(mjds.size, npix)) < 0.2
+    header = {"timestep_max": 0.01, "ra": ra, "dec": dec, "nside": nside}
+    sky = np.zeros((mjds.size, npix), dtype=[(f, float) for f in "ugrizy"])
+    for f in "ugrizy":
+        sky[f] = rng.uniform(18.0, 22.0, (mjds.size, npix))
+    sky["g"][0, 3] = np.inf
+
+    # Split the maps into two overlapping files
+    files = []
+    for mjd_left, mjd_right in [(60000.0, 60001.2), (60000.25, 60002.0)]:
+        good = (mjds >= mjd_left) & (mjds < mjd_right)
+        root = os.path.join(data_dir, "%g_%g" % (mjd_left, mjd_right))
+        file_info = {key: info[key][good] for key in info}
+        np.savez(root + ".npz", dict_of_lists=file_info, header=header)
+        np.save(root + ".npy", sky[good])
+        files.append(root + ".npz")
+    return mjds, files
+
+
 class TestSkyPre(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -205,6 +252,108 @@ class TestSkyPre(unittest.TestCase):
         mjd = self.sm.info["mjds"][10] + 0.1
         mags = sm.returnMags(mjd)
 
+    def test_store(self):
+        """
+        Test that the memory-mapped store matches the individual files
+        """
+        data_dir = tempfile.mkdtemp()
+        try:
+            mjds, files = write_fake_sky_files(data_dir)
+            sbp.write_sky_store(os.path.join(data_dir, "store"), files=files[::-1])
+
+            sm_files = sbp.SkyModelPre(
+                data_path=data_dir, speedLoad=False, use_store=False
+            )
+            sm_store = sbp.SkyModelPre(data_path=data_dir)
+            assert isinstance(sm_store.sb["r"], np.memmap)
+            np.testing.assert_array_equal(sm_store.info["mjds"], mjds)
+            indx = np.array([5, 3, 100])
+            for mjd in [60000.1, 60000.4, 60000.71, 60001.1]:
+                for kwargs in [{}, {"indx": indx}]:
+                    mags1 = sm_files.returnMags(mjd, **kwargs)
+                    mags2 = sm_store.returnMags(mjd, **kwargs)
+                    for f in mags1:
+                        np.testing.assert_array_equal(mags1[f], mags2[f])
+                    np.testing.assert_array_equal(
+                        sm_files.returnAirmass(mjd, **kwargs),
+                        sm_store.returnAirmass(mjd, **kwargs),
+                    )
+                assert sm_files.returnSunMoon(mjd) == sm_store.returnSunMoon(mjd)
+
+            # Unpickling maps the store again
+            sm_new = pickle.loads(pickle.dumps(sm_store))
+            np.testing.assert_array_equal(
+                sm_new.returnMags(60000.4)["g"], sm_store.returnMags(60000.4)["g"]
+            )
+            with self.assertRaises(ValueError):
+                sm_store.returnMags(60002.0)
+        finally:
+            shutil.rmtree(data_dir)
+
+    def test_mags_array(self):
+        """
+        Test that returnMagsArray matches returnMags
+        """
+        data_dir = tempfile.mkdtemp()
+        try:
+            mjds, files = write_fake_sky_files(data_dir)
+            sbp.write_sky_store(os.path.join(data_dir, "store"), files=files)
+            sm = sbp.SkyModelPre(data_path=data_dir, speedLoad=False, use_store=False)
+            sm_store = sbp.SkyModelPre(data_path=data_dir)
+            rng = np.random.default_rng(7)
+            # Includes times between the nights, after the last map, and in both files
+            mjd = np.concatenate(
+                [
+                    rng.uniform(mjds.min(), 60002.0, 200),
+                    mjds[:3],
+                    [mjds.max()],
+                ]
+            )
+            npix = hp.nside2npix(4)
+            indx = rng.integers(0, npix, mjd.size)
+            indx[-4] = 3
+            for kwargs in [{}, {"moon_mask": False}, {"filters": ["g", "z"]}]:
+                # The store has no maps after the last one to extrapolate from
+                for model, good in [(sm, mjd > 0), (sm_store, mjd <= mjds.max())]:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore")
+                        mags = model.returnMagsArray(mjd[good], indx[good], **kwargs)
+                        for i, j in enumerate(np.where(good)[0]):
+                            mags1 = model.returnMags(mjd[j], indx=[indx[j]], **kwargs)
+                            for f in mags1:
+                                assert mags[f][i] == mags1[f][0]
+            # Broadcasting a single mjd to all of the healpixels
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                mags = sm.returnMagsArray(mjds[10], np.arange(npix))
+                mags1 = sm.returnMags(mjds[10])
+            for f in mags1:
+                np.testing.assert_array_equal(mags[f], mags1[f])
+            assert mags.dtype.names == ("u", "g", "r", "i", "z", "y")
+        finally:
+            shutil.rmtree(data_dir)
+
+    def test_packed_mask(self):
+        """
+        Test that indexing the packed masks matches indexing the boolean array
+        """
+        rng = np.random.default_rng(3)
+        npix = 21
+        masks = rng.random((6, npix)) > 0.5
+        packed = sbp.sky_store._PackedMask(np.packbits(masks, axis=1), npix)
+        rows = rng.integers(0, 6, 50)
+        indx = rng.integers(0, npix, 50)
+        np.testing.assert_array_equal(packed[rows, indx], masks[rows, indx])
+        np.testing.assert_array_equal(packed[2, indx], masks[2, indx])
+        np.testing.assert_array_equal(packed[2, -1], masks[2, -1])
+        np.testing.assert_array_equal(packed[2], masks[2])
+        np.testing.assert_array_equal(packed[1:4, indx], masks[1:4, indx])
+        np.testing.assert_array_equal(
+            packed[rows[:, None], indx], masks[rows[:, None], indx]
+        )
+        with self.assertRaises(IndexError):
+            packed[2, npix]
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import warnings
 import numpy as np
 import os
 import pandas as pd
@@ -12,6 +13,21 @@ from rubin_sim.skybrightness_pre.zernike.zernike import TELESCOPE
 from rubin_sim.data import get_data_dir
 
 
+def write_fake_coeffs(fname, order=6):
+    """Write fake Zernike coefficients to fname, returning their mjds"""
+    mjds = 59823.9 + np.arange(5) * 0.05
+    n_terms = np.sum(np.arange(order) + 1)
+    rng = np.random.default_rng(42)
+    index = pd.MultiIndex.from_product(
+        [("u", "g", "r", "i", "z", "y"), mjds], names=("band", "mjd")
+    )
+    coeffs = pd.DataFrame(rng.uniform(-1.0, 1.0, (len(index), n_terms)), index=index)
+    coeffs[0] += 20.0
+    coeffs.to_hdf(fname, "zernike_coeffs")
+    pd.Series({"order": order, "max_zd": 67}).to_hdf(fname, "zernike_metadata")
+    return mjds
+
+
 class TestZenikeFitDrivers(unittest.TestCase):
     test_data_base_fname = "59823_59823"
 
@@ -80,6 +96,14 @@ class TestZernikeSky(unittest.TestCase):
         sample_hpix = pd.Series(visible_ipix).sample(5)
         hp_brightnesses = zsky.compute_healpix(sample_hpix, mjd)
 
+    def test_healpix_basis(self):
+        zsky = zernike.ZernikeSky(order=4, nside=4, basis_cache_size=2)
+        healpix_z = zsky.healpix_z
+        self.assertEqual(healpix_z.shape, (361, healpy.nside2npix(4), 10))
+        for st_idx in [0, 100, 200, 100]:
+            np.testing.assert_array_equal(zsky.healpix_basis(st_idx), healpix_z[st_idx])
+        self.assertEqual(list(zsky._healpix_z_cache.keys()), [200, 100])
+
 
 class TestSkyBrightnessPreData(unittest.TestCase):
     test_data_base_fname = "59823_59823"
@@ -101,6 +125,7 @@ class TestSkyBrightnessPreData(unittest.TestCase):
 
 class TestSkyModelZernike(unittest.TestCase):
     def setUp(self):
+        self.cut_pre_data_dir = os.path.join(get_data_dir(), "tests")
         self.fname = os.path.join(self.cut_pre_data_dir, "zernsky.h5")
 
     @unittest.skip("skipping because slow")
@@ -133,6 +158,78 @@ class TestSkyModelZernike(unittest.TestCase):
             self.assertEqual(sky[band].shape, (npix,))
             self.assertEqual(np.count_nonzero(np.isnan(sky[band])), npix)
 
+    def test_getMagsArray(self):
+        test_out_dir = TemporaryDirectory()
+        fname = os.path.join(test_out_dir.name, "zernike.h5")
+        mjds = write_fake_coeffs(fname)
+        rng = np.random.default_rng(42)
+        sky_model_zern = zernike.SkyModelZernike(data_file=fname, nside=4)
+        npix = healpy.nside2npix(4)
+        mjd = np.concatenate([rng.uniform(mjds.min(), mjds.max(), 50), [59824.8]])
+        indx = rng.integers(0, npix, mjd.size)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            sky = sky_model_zern.returnMagsArray(mjd, indx, filters=["g", "r"])
+            for i in range(mjd.size):
+                sky1 = sky_model_zern.returnMags(
+                    mjd[i], indx=[indx[i]], filters=["g", "r"]
+                )
+                for band in sky1:
+                    self.assertAlmostEqual(sky[band][i], sky1[band][0])
+        self.assertEqual(sky.dtype.names, ("g", "r"))
+        # During the day, everything is masked
+        self.assertEqual(sky["g"][-1], healpy.UNSEEN)
+        self.assertGreater(np.sum(sky["g"] != healpy.UNSEEN), 0)
+        test_out_dir.cleanup()
+
+    def test_order_and_extrapolate(self):
+        test_out_dir = TemporaryDirectory()
+        fname = os.path.join(test_out_dir.name, "zernike.h5")
+        mjds = write_fake_coeffs(fname)
+        mjd = mjds[1] + 0.01
+
+        sky_model_zern = zernike.SkyModelZernike(data_file=fname, nside=4)
+        self.assertEqual(sky_model_zern.order, 6)
+        low_order = zernike.SkyModelZernike(data_file=fname, nside=4, order=3)
+        self.assertEqual(low_order.order, 3)
+        self.assertEqual(low_order.zernike_model["r"]._coeffs.shape[1], 6)
+        with self.assertRaises(AssertionError):
+            zernike.SkyModelZernike(data_file=fname, nside=4, order=7)
+
+        # The low order model only uses the low order terms
+        full = sky_model_zern.returnMags(mjd, badval=np.nan)["r"]
+        low = low_order.returnMags(mjd, badval=np.nan)["r"]
+        visible = np.isfinite(full)
+        self.assertTrue(np.any(visible))
+        np.testing.assert_array_equal(np.isfinite(low), visible)
+        zsky = sky_model_zern.zernike_model["r"]
+        st_idx = int(zsky._nearest_sidereal_sample(palpy.gmst(mjd)))
+        basis = zsky.healpix_basis(st_idx)[visible]
+        coeffs = zsky.coeffs(mjd)
+        np.testing.assert_allclose(full[visible], basis @ coeffs)
+        np.testing.assert_allclose(low[visible], basis[:, :6] @ coeffs[:6])
+        # All of the bands share the Z terms
+        self.assertIs(
+            sky_model_zern.zernike_model["g"].healpix_basis(st_idx),
+            zsky.healpix_basis(st_idx),
+        )
+
+        # Pixels below the horizon get the value of the nearest visible one
+        below = np.where(~visible)[0][:3]
+        sky = sky_model_zern.returnMags(mjd, indx=below, extrapolate=True)
+        self.assertTrue(np.all(np.isin(sky["r"], full[visible])))
+        sky = sky_model_zern.returnMags(mjd, indx=below)
+        self.assertTrue(np.all(sky["r"] == healpy.UNSEEN))
+
+        # A model compared with itself is perfect
+        comparison = zernike.compare_sky_models(
+            [mjd], sky_model_zern, sky_model_zern, filters=["g", "r"]
+        )
+        self.assertEqual(list(comparison.index), ["g", "r"])
+        self.assertEqual(comparison.loc["r", "n_compared"], np.sum(visible))
+        self.assertEqual(comparison.loc["r", "max_abs_diff"], 0)
+        test_out_dir.cleanup()
+
 
 if __name__ == "__main__":
     unittest.main()
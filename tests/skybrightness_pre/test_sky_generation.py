@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+import rubin_sim.utils as utils
+from rubin_sim.skybrightness_pre.sky_generation import _Decimator, _sun_altitudes
+
+
+class TestSkyGeneration(unittest.TestCase):
+    def make_entry(self, mjd, mag, required=False, npix=10):
+        return {
+            "mjd": mjd,
+            "required": required,
+            "mags": {"r": np.full(npix, mag), "g": np.full(npix, mag + 1.0)},
+            "airmass": np.ones(npix),
+            "full_mask": np.zeros(npix, dtype=bool),
+        }
+
+    def run_decimator(self, mjds, mags, required=None, dm=0.2):
+        if required is None:
+            required = np.zeros(mjds.size, dtype=bool)
+        timestep = 5.0 / 60.0 / 24.0
+        decimator = _Decimator(dm=dm, timestep_max=3.5 * timestep)
+        kept = []
+        for mjd, mag, req in zip(mjds, mags, required):
+            decimator.add(self.make_entry(mjd, mag, req))
+            kept.extend(decimator.pop_final())
+        kept.extend(decimator.pop_final(flush=True))
+        return np.array([entry["mjd"] for entry in kept])
+
+    def test_decimator(self):
+        timestep = 5.0 / 60.0 / 24.0
+        mjds = 60000.0 + np.arange(12) * timestep
+
+        # A sky that changes linearly is dropped down to the maximum timestep
+        kept = self.run_decimator(mjds, np.arange(12) * 0.1)
+        self.assertEqual(kept[0], mjds[0])
+        self.assertEqual(kept[-1], mjds[-1])
+        self.assertLess(kept.size, mjds.size)
+        self.assertTrue(np.all(np.diff(kept) < 3.5 * timestep))
+
+        # Required maps are never dropped
+        required = np.arange(12) % 3 == 0
+        kept = self.run_decimator(mjds, np.arange(12) * 0.1, required=required)
+        self.assertTrue(np.all(np.isin(mjds[required], kept)))
+
+        # Nothing is dropped if the sky can not be interpolated
+        mags = np.where(np.arange(12) % 2 == 0, 0.0, 1.0)
+        kept = self.run_decimator(mjds, mags)
+        np.testing.assert_array_equal(kept, mjds)
+
+        # or if the maps are too far apart
+        kept = self.run_decimator(60000.0 + np.arange(12.0), np.zeros(12))
+        self.assertEqual(kept.size, 12)
+
+    def test_sun_altitudes(self):
+        site = utils.Site("LSST")
+        # Local midnight and noon
+        sun_alts = _sun_altitudes(np.array([60218.2, 60218.7]), site)
+        self.assertLess(sun_alts[0], np.radians(-12.0))
+        self.assertGreater(sun_alts[1], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,32 @@ import unittest
 import os
 import numpy as np
 from rubin_sim.data import get_data_dir
-from rubin_sim.utils import LsstCameraFootprint
+from rubin_sim.utils import LsstCameraFootprint, gnomonic_project_toxy
+
+
+def footprint_lookup(camera, obj_ra, obj_dec, obs_ra, obs_dec, obs_rotSkyPos):
+    """The indexes of the objects on silicon for one pointing (degrees), computed
+    as LsstCameraFootprint did before it was vectorized over pointings."""
+    x_proj, y_proj = gnomonic_project_toxy(
+        np.radians(obj_ra),
+        np.radians(obj_dec),
+        np.radians(obs_ra),
+        np.radians(obs_dec),
+    )
+    rot = np.radians(obs_rotSkyPos)
+    x_proj, y_proj = (
+        np.cos(rot) * x_proj - np.sin(rot) * y_proj,
+        np.sin(rot) * x_proj + np.cos(rot) * y_proj,
+    )
+    x_indx = np.round((x_proj - camera.x_camera[0]) / camera.plate_scale).astype(int)
+    y_indx = np.round((y_proj - camera.x_camera[0]) / camera.plate_scale).astype(int)
+    in_range = np.where(
+        (x_indx >= 0)
+        & (x_indx < camera.indx_max)
+        & (y_indx >= 0)
+        & (y_indx < camera.indx_max)
+    )[0]
+    return in_range[camera.camera_fov[x_indx[in_range], y_indx[in_range]]]
 
 
 class Test_LsstCameraFootprint(unittest.TestCase):
@@ -24,6 +49,47 @@ class Test_LsstCameraFootprint(unittest.TestCase):
         # The first of these objects should be in the middle of the FOV, while the second is outside
         self.assertEqual(idxObs, [0])
 
+    def test_on_silicon(self):
+        camera = LsstCameraFootprint(
+            units="degrees",
+            footprint_file=os.path.join(get_data_dir(), "tests", "fov_map.npz"),
+        )
+        on_silicon = camera.on_silicon(
+            self.obj_ra, self.obj_dec, self.obs_ra, self.obs_dec, self.obs_rotSkyPos
+        )
+        np.testing.assert_array_equal(on_silicon, [True, False])
+        # Many (object, pointing) pairs, evaluated in chunks on several threads
+        rng = np.random.default_rng(42)
+        npairs = 1000
+        obj_ra = 10.0 + rng.uniform(-3, 3, npairs)
+        obj_dec = -30.0 + rng.uniform(-3, 3, npairs)
+        obs_ra = 10.0 + rng.uniform(-1, 1, npairs)
+        obs_dec = -30.0 + rng.uniform(-1, 1, npairs)
+        obs_rot = rng.uniform(0, 360, npairs)
+        expected = np.array(
+            [
+                len(
+                    footprint_lookup(
+                        camera,
+                        obj_ra[i : i + 1],
+                        obj_dec[i : i + 1],
+                        obs_ra[i],
+                        obs_dec[i],
+                        obs_rot[i],
+                    )
+                )
+                > 0
+                for i in range(npairs)
+            ]
+        )
+        # Objects far outside the field of view are never on silicon
+        far = np.hypot(obj_ra - obs_ra, obj_dec - obs_dec) > 3.0
+        assert np.any(far) and not np.any(expected[far])
+        on_silicon = camera.on_silicon(
+            obj_ra, obj_dec, obs_ra, obs_dec, obs_rot, n_threads=3, chunk_size=100
+        )
+        np.testing.assert_array_equal(on_silicon, expected)
+
 
 if __name__ == "__main__":
     unittest.main()